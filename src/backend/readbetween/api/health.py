@@ -2,7 +2,10 @@ from fastapi import HTTPException, APIRouter, Depends
 from redis import Redis
 from readbetween.config import Settings
 from readbetween.core.dependencies import get_settings
+from readbetween.utils.embedding_cache import embedding_cache
 from readbetween.utils.logger_util import logger_util
+from readbetween.utils.milvus_load_manager import MilvusLoadManager
+from readbetween.utils.retrieval_cache import retrieval_cache
 from readbetween.core.context import session_getter
 from sqlalchemy import text
 
@@ -49,3 +52,15 @@ async def get_app_info(settings: Settings = Depends(get_settings)):
     except Exception as e:
         logger_util.exception(str(e))
         raise HTTPException(status_code=500, detail="获取应用信息失败") from e
+
+
+@router.get("/retrieval_stats", summary="检索缓存统计")
+async def get_retrieval_stats():
+    """
+    获取查询向量缓存、检索结果缓存命中率及当前进程 Milvus 集合加载状态
+    """
+    return {
+        "embedding_cache": embedding_cache.stats(),
+        "retrieval_cache": retrieval_cache.stats(),
+        "milvus_load": MilvusLoadManager().stats(),
+    }
@@ -1,11 +1,15 @@
-from fastapi import APIRouter
+from fastapi import APIRouter, HTTPException
+from fastapi.responses import StreamingResponse
 
 from readbetween.models.dao.conversation_knowledge_link import ConversationKnowledgeLinkDao
 from readbetween.services.knowledge import KnowledgeService
 from readbetween.models.schemas.response import resp_200, resp_500
 from readbetween.services.knowledge_file import KnowledgeFileService
+from readbetween.services.knowledge_migration import KnowledgeMigrationService
+from readbetween.services.knowledge_search import KnowledgeSearchService
 from readbetween.utils.logger_util import logger_util
-from readbetween.models.v1.knowledge import KnowledgeCreate, KnowledgeUpdate
+from readbetween.models.v1.knowledge import KnowledgeCreate, KnowledgeUpdate, KnowledgeEmbeddingMigrate, \
+    KnowledgeSharedMigrate, KnowledgeSearch
 
 router = APIRouter(tags=["知识库管理"])
 
@@ -58,3 +62,52 @@ async def list_knowledge_by_page(page: int = None, size: int = None):
     except Exception as e:
         logger_util.error(f"list_knowledge error: {e}")
         return resp_500(message=str(e))
+
+
+@router.post("/knowledge/migrate_embedding")
+async def migrate_knowledge_embedding(knowledge_migrate: KnowledgeEmbeddingMigrate):
+    try:
+        return resp_200(await KnowledgeMigrationService.start_embedding_migration(knowledge_migrate.id,
+                                                                                  knowledge_migrate.available_model_id))
+    except Exception as e:
+        logger_util.error(f"migrate_knowledge_embedding error: {e}")
+        return resp_500(message=str(e))
+
+
+@router.post("/knowledge/migrate_es_shared")
+async def migrate_knowledge_es_shared(knowledge_migrate: KnowledgeSharedMigrate):
+    try:
+        return resp_200(await KnowledgeMigrationService.start_es_shared_index_migration(knowledge_migrate.kb_ids))
+    except Exception as e:
+        logger_util.error(f"migrate_knowledge_es_shared error: {e}")
+        return resp_500(message=str(e))
+
+
+@router.post("/knowledge/migrate_milvus_shared")
+async def migrate_knowledge_milvus_shared(knowledge_migrate: KnowledgeSharedMigrate):
+    try:
+        return resp_200(
+            await KnowledgeMigrationService.start_milvus_shared_collection_migration(knowledge_migrate.kb_ids))
+    except Exception as e:
+        logger_util.error(f"migrate_knowledge_milvus_shared error: {e}")
+        return resp_500(message=str(e))
+
+
+@router.post("/knowledge/search")
+async def batch_search_knowledge(knowledge_search: KnowledgeSearch):
+    try:
+        # 每行一个查询的检索结果 按批返回
+        return StreamingResponse(
+            await KnowledgeSearchService.batch_search(knowledge_search),
+            media_type="application/x-ndjson",
+            headers={
+                "X-Accel-Buffering": "no",  # 防止Nginx等代理缓冲
+                "Cache-Control": "no-cache",
+            }
+        )
+    except HTTPException:
+        # 参数校验/知识库不存在等错误保持原状态码
+        raise
+    except Exception as e:
+        logger_util.error(f"batch_search_knowledge error: {e}")
+        return resp_500(message=str(e))
@@ -139,6 +139,13 @@ async def execute_knowledge_file(knowledge_file_execute: KnowledgeFileExecute,
             knowledge_info: KnowledgeInfo = await KnowledgeService.get_knowledge_info(target_kb_id)
             embedding_cfg_info = knowledge_info.model_cfg
 
+            # 嵌入模型迁移中 新入库文件同时写入新 Collection
+            shadow_collection_name, shadow_embedding_cfg_info = None, None
+            if target_knowledge.migrate_status == 1 and target_knowledge.pending_collection_name:
+                shadow_collection_name = target_knowledge.pending_collection_name
+                shadow_embedding_cfg_info = KnowledgeService.resolve_model_cfg(
+                    target_knowledge.pending_available_model_id)
+
             # 构建后台任务所需参数
             new_task = KnowledgeFileVectorizeTasks(target_kb_id=target_kb_id,
                                                    index_name=target_index_name,
@@ -148,7 +155,9 @@ async def execute_knowledge_file(knowledge_file_execute: KnowledgeFileExecute,
                                                    repeat_size=knowledge_file_execute.repeat_size,
                                                    separator=knowledge_file_execute.separator,
                                                    enable_layout=enable_layout_flag,
-                                                   embedding_cfg_info=embedding_cfg_info)
+                                                   embedding_cfg_info=embedding_cfg_info,
+                                                   shadow_collection_name=shadow_collection_name,
+                                                   shadow_embedding_cfg_info=shadow_embedding_cfg_info)
 
             # Desperate 后台执行任务
             # background_tasks.add_task(bg_text_vectorize, new_task)
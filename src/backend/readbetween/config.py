@@ -39,18 +39,71 @@ class StorageConfig(BaseModel):
         secret_key: str = ""
         default_bucket: str = "readbetween"
 
-    class MilvusConfig(BaseModel): uri: str = ""
+    class MilvusConfig(BaseModel):
+        uri: str = ""
+        # 共享集合模式 全部知识库写入同一集合并以 knowledge_id 作为分区键
+        shared_collection: bool = False
+        # 集合加载管理 空闲超过 load_idle_ttl 秒或超出内存预算时释放最久未使用的集合
+        load_idle_ttl: int = 1800
+        load_memory_budget_mb: int = 4096
+        load_sweep_interval: int = 60
+        # 启动时预加载的热点集合数量
+        preload_top_n: int = 10
+        # 新建集合时增加 BM25 稀疏向量字段(需 Milvus >= 2.5), 混合检索在 Milvus 内完成, 无需 ES
+        enable_bm25: bool = False
+        # 量化存储(float16/bfloat16/sq8/binary)的知识库召回 top_k * rescore_factor 条候选后按存储向量精排
+        # binary 不保存原始向量 以 scale * sign(v) 近似精排 可适当调大倍数
+        rescore_factor: int = 4
+        # IVF_SQ8 / BIN_IVF_FLAT 检索的聚类探查数量
+        quantized_nprobe: int = 16
+        # 索引自动选择 float 存储的集合按行数及内存预算选择 FLAT / HNSW / IVF_PQ / DISKANN, 数据增长后后台在新集合中建索引并切换
+        auto_index: bool = True
+        # 行数不超过该值时使用 FLAT 精确检索
+        flat_max_rows: int = 10000
+        # 单个集合 HNSW 索引(含原始向量)的内存预算, 超出后使用 IVF_PQ 或 DISKANN
+        index_memory_budget_mb: int = 1024
+        # 超出内存预算时使用 DISKANN(需 Milvus 部署本地 NVMe 磁盘), 否则使用 IVF_PQ
+        enable_diskann: bool = False
+        # 检索延迟目标(毫秒) 决定 ef / nprobe / search_list 的取值
+        search_latency_slo_ms: int = 50
+
+    class VectorStoreConfig(BaseModel):
+        # 向量存储后端 milvus | local(进程内索引, 适用于小规模私有化部署)
+        backend: str = "milvus"
+        # 本地后端数据目录
+        local_path: str = "./static/vector_store"
+        # 本地后端集合行数达到该值且已安装 hnswlib 时使用 HNSW 近似检索, 否则精确检索
+        local_hnsw_threshold: int = 20000
+        # 知识库降维投影(PCA)拟合样本上限 从知识库全部切片中随机抽样
+        projection_sample_size: int = 4096
+        # 新建集合仅保留向量及过滤键(file_id/knowledge_id/chunk_index), 切片内容存于 MySQL knowledge_chunk 表
+        lean_collections: bool = True
+
+    class KeywordStoreConfig(BaseModel):
+        # 关键词检索后端 es | local(进程内 BM25 倒排索引, 适用于边缘/小规模部署)
+        backend: str = "es"
+        # 本地后端数据目录
+        local_path: str = "./static/keyword_store"
 
     class ESConfig(BaseModel):
         hosts: List[str] = []
         timeout: int = 200
         http_auth: Optional[str] = None
+        # 知识库索引设置
+        number_of_shards: int = 1
+        number_of_replicas: int = 0
+        refresh_interval: str = "5s"
+        # 共享索引模式 全部知识库写入同一索引并按 knowledge_id 路由
+        shared_index: bool = False
+        shared_number_of_shards: int = 3
 
     mysql: MySQLConfig = MySQLConfig()
     redis: RedisConfig = RedisConfig()
     minio: MinioConfig = MinioConfig()
     milvus: MilvusConfig = MilvusConfig()
+    vector_store: VectorStoreConfig = VectorStoreConfig()
     es: ESConfig = ESConfig()
+    keyword_store: KeywordStoreConfig = KeywordStoreConfig()
 
 
 # MemoryConfig
@@ -89,6 +142,44 @@ class LiveKitConfig(BaseModel):
     api_secret: str = "secret"
 
 
+class RetrievalConfig(BaseModel):
+    # 查询向量缓存 条目数上限及过期时间(秒)
+    embedding_cache_size: int = 2048
+    embedding_cache_ttl: int = 3600
+    # 开启后使用 Redis 作为二级缓存 多进程共享
+    embedding_cache_redis: bool = False
+    # 混合检索融合 rrf | minmax | zscore
+    fusion_method: str = "rrf"
+    rrf_k: int = 60
+    # 每个检索后端召回候选数 及 融合后进入提示词的切片数
+    fusion_candidate_k: int = 10
+    fusion_top_n: int = 5
+    # 交叉编码器重排序(默认关闭, 开启后启动时下载内置重排序模型) 候选池大小/重排后保留切片数/批大小/时间预算(毫秒)/推理线程数
+    rerank_enabled: bool = False
+    rerank_candidate_pool: int = 20
+    rerank_top_n: int = 4
+    rerank_batch_size: int = 16
+    rerank_latency_budget_ms: int = 300
+    rerank_max_length: int = 512
+    rerank_num_threads: int = 4
+    # 上下文装填 各来源 token 预算及 MMR 相关性权重
+    context_kb_tokens: int = 2000
+    context_web_tokens: int = 1500
+    context_memory_tokens: int = 500
+    context_webpage_tokens: int = 3000
+    context_mmr_lambda: float = 0.7
+    # 检索结果语义缓存 查询向量余弦相似度阈值/内存上限(MB)/过期时间(秒)
+    result_cache_enabled: bool = True
+    result_cache_threshold: float = 0.95
+    result_cache_max_mb: int = 64
+    result_cache_ttl: int = 600
+    # 检索完成后即推送来源事件(不等待模型回答结束), 回答结束时不再重复推送
+    early_source_event: bool = False
+    # 批量检索接口 每批查询数量(一次嵌入计算及多向量检索)/单次请求查询数量上限
+    batch_search_size: int = 32
+    batch_search_max_queries: int = 10000
+
+
 # Deprecated
 class SystemConfig(BaseModel):
     class ModelsConfig(BaseModel):
@@ -110,6 +201,7 @@ class Settings(BaseConfig):
     memory: MemoryConfig = MemoryConfig()
     logger: LoggerConfig = LoggerConfig()
     livekit: LiveKitConfig = LiveKitConfig()
+    retrieval: RetrievalConfig = RetrievalConfig()
     # system: SystemConfig = SystemConfig()
 
     model_config = SettingsConfigDict(
@@ -1,5 +1,6 @@
-from readbetween.services.constant import BUILT_IN_EMBEDDING_NAME, MODEL_SAVE_PATH
+from readbetween.services.constant import BUILT_IN_EMBEDDING_NAME, BUILT_IN_RERANK_NAME, MODEL_SAVE_PATH
 from readbetween.utils.local_embedding_manager import LocalEmbedManager
+from readbetween.utils.local_rerank_manager import LocalRerankManager
 from functools import lru_cache
 from readbetween.config import Settings
 from readbetween.utils.logger_util import logger_util
@@ -22,3 +23,16 @@ def get_local_embed_manager():
     )
 
     return lem
+
+
+def get_local_rerank_manager():
+    settings = get_settings()
+    lrm = LocalRerankManager()
+    lrm.initialize(
+        model_name=BUILT_IN_RERANK_NAME,
+        model_dir=MODEL_SAVE_PATH,
+        num_threads=settings.retrieval.rerank_num_threads,
+        max_length=settings.retrieval.rerank_max_length
+    )
+
+    return lrm
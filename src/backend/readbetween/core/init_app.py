@@ -8,12 +8,16 @@ from readbetween.utils.local_embedding_manager import LocalEmbedManager
 from readbetween.models.dao.model_provider_cfg import ModelProviderCfg
 from readbetween.services.model_provider_cfg import ModelProviderCfgService
 from readbetween.utils.local_tts_manager import LocalTTSManager
+from readbetween.utils.local_rerank_manager import LocalRerankManager
+from readbetween.utils.milvus_load_manager import MilvusLoadManager
+from readbetween.utils.vector_store import get_vector_store, VECTOR_STORE_BACKEND_MILVUS
 from readbetween.utils.redis_util import RedisUtil
 from readbetween.utils.database_client import DatabaseClient
 from readbetween.utils.logger_util import logger_util
 from readbetween.config import settings, Settings
 from readbetween.services.constant import (MODEL_SAVE_PATH,
                                            BUILT_IN_EMBEDDING_NAME, BUILT_IN_STT_NAME, BUILT_IN_TTS_NAME,
+                                           BUILT_IN_RERANK_NAME,
                                            SYSTEM_MODEL_PROVIDER, RedisMCPServerKey)
 from readbetween.utils.thread_pool_executor_util import ThreadPoolExecutorUtil
 
@@ -59,6 +63,13 @@ def init_built_in_model():
     lem = LocalEmbedManager()
     thread_pool.submit_task(lem.initialize, model_name=embedding_model, model_dir=model_dir)
 
+    # 内置重排序模型管理器
+    if settings.retrieval.rerank_enabled:
+        lrm = LocalRerankManager()
+        thread_pool.submit_task(lrm.initialize, model_name=BUILT_IN_RERANK_NAME, model_dir=model_dir,
+                                num_threads=settings.retrieval.rerank_num_threads,
+                                max_length=settings.retrieval.rerank_max_length)
+
     # 测试环境不自动下载TTS/STT
     if os.getenv("APP__ENV", "dev") not in ['test', 'dev']:
         # 内置TTS模型管理器
@@ -74,6 +85,23 @@ def init_built_in_model():
     thread_pool.shutdown()
 
 
+def init_milvus_collections():
+    """初始化向量存储, Milvus 后端预加载热点知识库集合并启动空闲集合释放巡检"""
+    try:
+        get_vector_store()  # 建立连接
+        if settings.storage.vector_store.backend == VECTOR_STORE_BACKEND_MILVUS:
+            MilvusLoadManager().start_sweeper()
+            MilvusLoadManager().preload()
+    except Exception as e:
+        logger_util.warning(f"预加载Milvus集合失败: {e}")
+
+
+def clean_up_milvus_collections():
+    """停止空闲集合释放巡检"""
+    if settings.storage.vector_store.backend == VECTOR_STORE_BACKEND_MILVUS:
+        MilvusLoadManager().stop_sweeper()
+
+
 async def init_function_calling_manager():
     redis_client = RedisUtil()
 
@@ -4,7 +4,7 @@ from fastapi.middleware.cors import CORSMiddleware
 from fastapi.responses import ORJSONResponse
 from contextlib import asynccontextmanager
 from core.init_app import init_database, init_built_in_model, init_function_calling_manager, \
-    clean_up_function_calling_manager
+    clean_up_function_calling_manager, init_milvus_collections, clean_up_milvus_collections
 
 
 @asynccontextmanager
@@ -13,6 +13,8 @@ async def _LIFESPAN(app: FastAPI):
     init_database()
     # 加载本地嵌入模型
     init_built_in_model()
+    # 预加载热点知识库集合
+    init_milvus_collections()
     # 初始化 FunctionCalling 管理器
     await init_function_calling_manager()
 
@@ -20,6 +22,8 @@ async def _LIFESPAN(app: FastAPI):
 
     # 清理MCP客户端
     await clean_up_function_calling_manager()
+    # 停止集合释放巡检
+    clean_up_milvus_collections()
 
 
 
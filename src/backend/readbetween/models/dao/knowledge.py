@@ -12,7 +12,7 @@ from readbetween.utils.logger_util import logger_util
 from datetime import datetime
 from fastapi import HTTPException
 
-from . import ModelAvailableCfg
+from . import ModelAvailableCfg, ModelSettingCfg, ModelProviderCfg
 from ..v1.knowledge_file import KnowledgeMsg
 from ...services.constant import System_Embedding_Name
 
@@ -29,6 +29,23 @@ class KnowledgeBase(AwsomeDBModel):
     collection_name: Optional[str] = Field(default=None, sa_column=Column(String(255)), description="Collection 名称")
     index_name: Optional[str] = Field(default=None, sa_column=Column(String(255)), description="Index 名称")
     enable_layout: Optional[int] = Field(default=0, sa_column=Column(INT), description="是否启用布局识别")
+    # 向量存储格式 float/float16/bfloat16/sq8/binary, 创建知识库时确定
+    vector_storage: Optional[str] = Field(default="float", sa_column=Column(String(32), server_default=text("'float'")),
+                                          description="向量存储格式")
+    # 向量降维投影 projection_dim 为空时存储原始维度向量
+    projection_method: Optional[str] = Field(default=None, sa_column=Column(String(32)),
+                                             description="向量降维投影方式 pca/matryoshka")
+    projection_dim: Optional[int] = Field(default=None, sa_column=Column(INT), description="投影后向量维度")
+    # 向量化版本 每次完成嵌入模型迁移后递增
+    embedding_version: Optional[int] = Field(default=1, sa_column=Column(INT, server_default=text('1')),
+                                             description="向量化版本")
+    # 嵌入模型迁移信息 迁移期间新入库文件双写至新旧两个 Collection
+    pending_collection_name: Optional[str] = Field(default=None, sa_column=Column(String(255)),
+                                                   description="迁移中的新 Collection 名称")
+    pending_available_model_id: Optional[str] = Field(default=None, sa_column=Column(String(255)),
+                                                      description="迁移目标可用模型配置ID")
+    migrate_status: Optional[int] = Field(default=0, sa_column=Column(INT, server_default=text('0')),
+                                          description="嵌入模型迁移状态, 0/1/-1/无迁移/迁移中/迁移失败")
     # 删除标识
     delete: int = Field(index=False, default=0, description="删除标志")
     # 创建时间
@@ -77,11 +94,15 @@ class Knowledge(KnowledgeBase, table=True):
 
 class KnowledgeDao:
     @classmethod
-    async def insert(cls, name, desc, available_model_id, collection_name, index_name, enable_layout):
+    async def insert(cls, name, desc, available_model_id, collection_name, index_name, enable_layout,
+                     vector_storage="float", projection_method=None, projection_dim=None):
         async with async_session_getter() as session:
             new_knowledge = Knowledge(name=name, desc=desc, available_model_id=available_model_id, collection_name=collection_name,
                                       index_name=index_name,
-                                      enable_layout=enable_layout)
+                                      enable_layout=enable_layout,
+                                      vector_storage=vector_storage,
+                                      projection_method=projection_method,
+                                      projection_dim=projection_dim)
             session.add(new_knowledge)
             await session.commit()
             await session.refresh(new_knowledge)
@@ -158,6 +179,8 @@ class KnowledgeDao:
                         collection_name=knowledge[0].collection_name,
                         index_name=knowledge[0].index_name,
                         enable_layout=knowledge[0].enable_layout,
+                        embedding_version=knowledge[0].embedding_version,
+                        migrate_status=knowledge[0].migrate_status,
                         create_time=knowledge[0].create_time,
                         update_time=knowledge[0].update_time,
 
@@ -214,6 +237,25 @@ class KnowledgeDao:
                     detail=f"数据库查询错误: {str(e)}"
                 )
 
+    @classmethod
+    async def get_many_with_model_cfg(cls, knowledge_base_ids: List[str]):
+        """
+        批量获取知识库及其嵌入模型配置(一次查询)
+        :param knowledge_base_ids: 知识库ID列表
+        :return: [(知识库, 可用模型配置, 模型设置, 模型供应商)]，使用系统内置模型时后三项为 None
+        """
+        async with async_session_getter() as session:
+            stmt = (
+                select(Knowledge, ModelAvailableCfg, ModelSettingCfg, ModelProviderCfg)
+                .join(ModelAvailableCfg, Knowledge.available_model_id == ModelAvailableCfg.id, isouter=True)
+                .join(ModelSettingCfg, ModelAvailableCfg.setting_id == ModelSettingCfg.id, isouter=True)
+                .join(ModelProviderCfg, ModelSettingCfg.provider_id == ModelProviderCfg.id, isouter=True)
+                .where(Knowledge.id.in_(knowledge_base_ids))
+                .where(Knowledge.delete == 0)
+            )
+            result = await session.execute(stmt)
+            return [tuple(row) for row in result.all()]
+
     @classmethod
     async def delete_by_available_id(cls, id: str):
         async with async_session_getter() as session:
@@ -236,4 +278,145 @@ class KnowledgeDao:
 
             # 提交事务
             await session.commit()
-            logger_util.info(f"Deleted knowledges for model_available_cfg ID: {id}")
\ No newline at end of file
+            logger_util.info(f"Deleted knowledges for model_available_cfg ID: {id}")
+
+    @classmethod
+    def select_one(cls, kb_id) -> Optional[Knowledge]:
+        """
+        同步查询知识库记录（供 Celery 任务使用）
+        :param kb_id: 知识库ID
+        :return: 知识库对象
+        """
+        with session_getter() as session:
+            stmt = select(Knowledge).where(Knowledge.id == kb_id, Knowledge.delete == 0)
+            return session.execute(stmt).scalar_one_or_none()
+
+    @classmethod
+    async def begin_migration(cls, kb_id, pending_collection_name, pending_available_model_id):
+        """
+        标记知识库进入嵌入模型迁移状态
+        :param kb_id: 知识库ID
+        :param pending_collection_name: 新 Collection 名称
+        :param pending_available_model_id: 目标可用模型配置ID
+        :return: 知识库对象
+        """
+        async with async_session_getter() as session:
+            stmt = select(Knowledge).where(Knowledge.id == kb_id, Knowledge.delete == 0).with_for_update()
+            knowledge = (await session.execute(stmt)).scalar_one_or_none()
+            if knowledge is None:
+                raise HTTPException(status_code=404, detail="Knowledge not found")
+            if knowledge.migrate_status == 1:
+                raise HTTPException(status_code=409, detail="知识库正在进行嵌入模型迁移")
+            knowledge.pending_collection_name = pending_collection_name
+            knowledge.pending_available_model_id = pending_available_model_id
+            knowledge.migrate_status = 1
+            await session.commit()
+            await session.refresh(knowledge)
+            logger_util.info(f"Knowledge {kb_id} begin migration to {pending_collection_name}")
+            return knowledge
+
+    @classmethod
+    def begin_index_upgrade(cls, kb_id, pending_collection_name) -> bool:
+        """
+        标记知识库进入索引升级状态, 复用迁移字段使入库文件双写至新 Collection, 嵌入模型不变
+        :param kb_id: 知识库ID
+        :param pending_collection_name: 新 Collection 名称
+        :return: 是否成功进入升级状态, 知识库不存在或正在迁移时返回 False
+        """
+        with session_getter() as session:
+            stmt = select(Knowledge).where(Knowledge.id == kb_id, Knowledge.delete == 0).with_for_update()
+            knowledge = session.execute(stmt).scalar_one_or_none()
+            if knowledge is None or knowledge.migrate_status == 1:
+                return False
+            knowledge.pending_collection_name = pending_collection_name
+            knowledge.pending_available_model_id = knowledge.available_model_id
+            knowledge.migrate_status = 1
+            session.commit()
+            logger_util.info(f"Knowledge {kb_id} begin index upgrade to {pending_collection_name}")
+            return True
+
+    @classmethod
+    def finish_migration(cls, kb_id) -> str:
+        """
+        原子切换知识库至新 Collection
+        :param kb_id: 知识库ID
+        :return: 被替换的旧 Collection 名称
+        """
+        with session_getter() as session:
+            stmt = select(Knowledge).where(Knowledge.id == kb_id).with_for_update()
+            knowledge = session.execute(stmt).scalar_one_or_none()
+            if knowledge is None or knowledge.migrate_status != 1:
+                raise Exception(f"知识库{kb_id}不处于迁移状态")
+            old_collection_name = knowledge.collection_name
+            knowledge.collection_name = knowledge.pending_collection_name
+            knowledge.available_model_id = knowledge.pending_available_model_id
+            knowledge.embedding_version = (knowledge.embedding_version or 1) + 1
+            knowledge.pending_collection_name = None
+            knowledge.pending_available_model_id = None
+            knowledge.migrate_status = 0
+            session.commit()
+            logger_util.info(f"Knowledge {kb_id} swapped collection {old_collection_name} -> {knowledge.collection_name}")
+            return old_collection_name
+
+    @classmethod
+    def abort_migration(cls, kb_id, migrate_status: int = -1) -> Optional[str]:
+        """
+        终止迁移并清理迁移信息
+        :param kb_id: 知识库ID
+        :param migrate_status: 终止后的迁移状态, 默认标记为迁移失败
+        :return: 未完成的新 Collection 名称
+        """
+        with session_getter() as session:
+            stmt = select(Knowledge).where(Knowledge.id == kb_id).with_for_update()
+            knowledge = session.execute(stmt).scalar_one_or_none()
+            if knowledge is None:
+                return None
+            pending_collection_name = knowledge.pending_collection_name
+            knowledge.pending_collection_name = None
+            knowledge.pending_available_model_id = None
+            knowledge.migrate_status = migrate_status
+            session.commit()
+            logger_util.info(f"Knowledge {kb_id} migration aborted")
+            return pending_collection_name
+
+    @classmethod
+    def select_all_active(cls) -> List[Knowledge]:
+        """
+        同步查询全部未删除的知识库记录（供 Celery 任务使用）
+        :return: 知识库对象列表
+        """
+        with session_getter() as session:
+            stmt = select(Knowledge).where(Knowledge.delete == 0)
+            return list(session.execute(stmt).scalars().all())
+
+    @classmethod
+    def update_index_name(cls, kb_id, index_name):
+        """
+        修改知识库 ES 索引名称
+        :param kb_id: 知识库ID
+        :param index_name: 新索引名称
+        """
+        with session_getter() as session:
+            stmt = select(Knowledge).where(Knowledge.id == kb_id)
+            knowledge = session.execute(stmt).scalar_one_or_none()
+            if knowledge is None:
+                raise Exception(f"知识库{kb_id}不存在")
+            knowledge.index_name = index_name
+            session.commit()
+            logger_util.info(f"Knowledge {kb_id} index_name -> {index_name}")
+
+    @classmethod
+    def update_collection_name(cls, kb_id, collection_name):
+        """
+        修改知识库 Milvus 集合名称
+        :param kb_id: 知识库ID
+        :param collection_name: 新集合名称
+        """
+        with session_getter() as session:
+            stmt = select(Knowledge).where(Knowledge.id == kb_id)
+            knowledge = session.execute(stmt).scalar_one_or_none()
+            if knowledge is None:
+                raise Exception(f"知识库{kb_id}不存在")
+            knowledge.collection_name = collection_name
+            session.commit()
+            logger_util.info(f"Knowledge {kb_id} collection_name -> {collection_name}")
@@ -0,0 +1,97 @@
+from typing import Optional, List
+from readbetween.models.dao.base import AwsomeDBModel
+from sqlalchemy import Column, String, INT, select, delete, Text, func
+# 切片内容字段名为 text, 重命名导入避免被类属性遮蔽
+from sqlmodel import Field, DateTime, text as sql_text
+from readbetween.core.context import session_getter, async_session_getter
+from datetime import datetime
+
+from readbetween.utils.logger_util import logger_util
+
+
+class KnowledgeChunkBase(AwsomeDBModel):
+    __tablename__ = "knowledge_chunk"
+
+    # 切片ID {file_id}_{chunk_index} 由向量存储中的过滤键直接得到 无需额外写入向量存储
+    id: str = Field(sa_column=Column(String(64), primary_key=True), description="切片ID")
+    knowledge_id: str = Field(sa_column=Column(String(255), index=True, nullable=False), description="知识库ID")
+    file_id: str = Field(sa_column=Column(String(255), index=True, nullable=False), description="文件ID")
+    chunk_index: int = Field(default=0, sa_column=Column(INT, nullable=False), description="切片索引")
+    start_page: int = Field(default=0, sa_column=Column(INT, nullable=False), description="切片最小页码")
+    title: Optional[str] = Field(default=None, sa_column=Column(String(255)), description="文件名")
+    source: Optional[str] = Field(default=None, sa_column=Column(String(255)), description="MinIO Object Name")
+    bbox: Optional[str] = Field(default=None, sa_column=Column(Text), description="切片位置 JSON")
+    extra: Optional[str] = Field(default=None, sa_column=Column(Text), description="扩展信息")
+    text: Optional[str] = Field(default=None, sa_column=Column(Text), description="「标题:原文」")
+    # 创建时间
+    create_time: Optional[datetime] = Field(
+        sa_column=Column(
+            DateTime,
+            nullable=False,
+            server_default=sql_text('CURRENT_TIMESTAMP')
+        )
+    )
+
+
+class KnowledgeChunk(KnowledgeChunkBase, table=True):
+    __table_args__ = {"extend_existing": True}  # 允许扩展现有的表
+
+
+class KnowledgeChunkDao:
+    @staticmethod
+    def save_batch(chunks: List[KnowledgeChunk]):
+        """
+        批量写入切片, 已存在的切片(任务重试/迁移补写)先删除后写入
+        :param chunks: 切片列表
+        """
+        if not chunks:
+            return
+        with session_getter() as session:
+            session.execute(delete(KnowledgeChunk).where(KnowledgeChunk.id.in_([chunk.id for chunk in chunks])))
+            session.add_all(chunks)
+            session.commit()
+
+    @staticmethod
+    def select_by_ids(chunk_ids: List[str]) -> List[KnowledgeChunk]:
+        """同步批量查询切片（供 Celery 任务使用）"""
+        if not chunk_ids:
+            return []
+        with session_getter() as session:
+            stmt = select(KnowledgeChunk).where(KnowledgeChunk.id.in_(chunk_ids))
+            return list(session.execute(stmt).scalars().all())
+
+    @staticmethod
+    def sample_by_knowledge_id(knowledge_id: str, limit: int) -> List[KnowledgeChunk]:
+        """同步随机抽样知识库切片（供 Celery 任务拟合向量投影）"""
+        with session_getter() as session:
+            stmt = select(KnowledgeChunk).where(KnowledgeChunk.knowledge_id == knowledge_id) \
+                .order_by(func.rand()).limit(limit)
+            return list(session.execute(stmt).scalars().all())
+
+    @staticmethod
+    async def get_many(chunk_ids: List[str]) -> List[KnowledgeChunk]:
+        """
+        批量查询切片
+        :param chunk_ids: 切片ID列表
+        :return: 切片列表, 不存在的ID忽略
+        """
+        if not chunk_ids:
+            return []
+        async with async_session_getter() as session:
+            stmt = select(KnowledgeChunk).where(KnowledgeChunk.id.in_(chunk_ids))
+            result = await session.execute(stmt)
+            return list(result.scalars().all())
+
+    @staticmethod
+    async def delete_by_file_id(file_id: str):
+        async with async_session_getter() as session:
+            await session.execute(delete(KnowledgeChunk).where(KnowledgeChunk.file_id == file_id))
+            await session.commit()
+            logger_util.info(f"Deleted Knowledge_chunks with File_id: {file_id}")
+
+    @staticmethod
+    async def delete_by_knowledge_id(knowledge_id: str):
+        async with async_session_getter() as session:
+            await session.execute(delete(KnowledgeChunk).where(KnowledgeChunk.knowledge_id == knowledge_id))
+            await session.commit()
+            logger_util.info(f"Deleted Knowledge_chunks with Knowledge_id: {knowledge_id}")
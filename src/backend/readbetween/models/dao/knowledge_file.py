@@ -84,6 +84,34 @@ class KnowledgeFileDao:
             await session.commit()
             logger_util.info(f"Deleted Knowledge_files with Knowledge_id: {kb_id}")
 
+    @staticmethod
+    async def filter_files(kb_ids: List[str], file_ids: Optional[List[str]] = None,
+                           names: Optional[List[str]] = None, created_after: Optional[datetime] = None,
+                           created_before: Optional[datetime] = None) -> List[KnowledgeFile]:
+        """
+        按文件ID/文件名/上传时间筛选知识库下的文件
+        :param kb_ids: 知识库ID列表
+        :param file_ids: 文件ID列表
+        :param names: 文件名列表
+        :param created_after: 上传时间下限(含)
+        :param created_before: 上传时间上限(含)
+        :return: 文件列表
+        """
+        if not kb_ids:
+            return []
+        conditions = [KnowledgeFile.kb_id.in_(kb_ids), KnowledgeFile.delete == 0]
+        if file_ids is not None:
+            conditions.append(KnowledgeFile.id.in_(file_ids))
+        if names is not None:
+            conditions.append(KnowledgeFile.name.in_(names))
+        if created_after is not None:
+            conditions.append(KnowledgeFile.create_time >= created_after)
+        if created_before is not None:
+            conditions.append(KnowledgeFile.create_time <= created_before)
+        async with async_session_getter() as session:
+            result = await session.execute(select(KnowledgeFile).where(*conditions))
+            return list(result.scalars().all())
+
     @staticmethod
     def delete_by_id():
         pass
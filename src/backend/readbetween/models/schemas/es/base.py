@@ -1,17 +1,17 @@
 from elasticsearch_dsl import Document, Text, Keyword, Long, Index, analyzer, \
-    token_filter, tokenizer, Nested
+    token_filter, tokenizer, Object
 
 
-# 元数据基类
+# 元数据基类 字段类型与 ES_DEFAULT_INDEX_MAPPINGS 保持一致
 class Metadata(Document):
-    bbox = Text(fields={'keyword': Keyword(ignore_above=256)})
+    bbox = Keyword(index=False, doc_values=False)
     chunk_index = Long()
-    extra = Text(analyzer='ik_max_word', fields={'keyword': Keyword(ignore_above=256)})
-    file_id = Text(fields={'keyword': Keyword(ignore_above=256)})
-    knowledge_id = Text(fields={'keyword': Keyword(ignore_above=256)})
+    extra = Keyword(index=False, doc_values=False)
+    file_id = Keyword()
+    knowledge_id = Keyword()
     start_page = Long()
-    source = Text(analyzer='ik_max_word', fields={'keyword': Keyword(ignore_above=256)})
-    title = Text(analyzer='ik_max_word', fields={'keyword': Keyword(ignore_above=256)})
+    source = Keyword()
+    title = Text(analyzer='ik_max_word', search_analyzer='ik_smart')
 
     def __init__(self, **kwargs):
         super(Metadata, self).__init__(**kwargs)
@@ -28,8 +28,8 @@ class Metadata(Document):
 # 文档基类
 class BaseDocument(Document):
     # 定义字段
-    metadata = Nested(Metadata)
-    text = Text(analyzer='ik_max_word')  # 使用 ik_max_word 中文分词器
+    metadata = Object(Metadata)
+    text = Text(analyzer='ik_max_word', search_analyzer='ik_smart')  # 使用 ik_max_word 中文分词器
 
     # 指定IK分词器
     class DocType:
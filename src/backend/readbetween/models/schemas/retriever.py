@@ -1,5 +1,5 @@
 class RetrieverResult:
-    def __init__(self, source, name, id, score, metadata, text, vector=None):
+    def __init__(self, source, name, id, score, metadata, text, vector=None, fusion_score=None, rerank_score=None):
         """
         用于表示召回结果的通用类。
         :param source: 来源（"es" 或 "milvus"）
@@ -9,6 +9,8 @@ class RetrieverResult:
         :param metadata: 元数据（字典形式）
         :param text: 文本内容
         :param vector: 向量（仅 Milvus 有，可选）
+        :param fusion_score: 混合检索融合分数（仅融合结果有，可选）
+        :param rerank_score: 重排序分数（仅重排序结果有，可选）
         """
         self.source = source  # 数据来源（"es" 或 "milvus"）
         self.name = name  # 集合名称或索引名称
@@ -17,6 +19,8 @@ class RetrieverResult:
         self.metadata = metadata  # 元数据
         self.text = text  # 文本内容
         self.vector = vector  # 向量（仅 Milvus 有）
+        self.fusion_score = fusion_score  # 融合分数
+        self.rerank_score = rerank_score  # 重排序分数
 
     def to_dict(self):
         """
@@ -32,4 +36,8 @@ class RetrieverResult:
         }
         if self.vector is not None:
             result_dict["vector"] = self.vector
+        if self.fusion_score is not None:
+            result_dict["fusion_score"] = self.fusion_score
+        if self.rerank_score is not None:
+            result_dict["rerank_score"] = self.rerank_score
         return result_dict
@@ -3,6 +3,7 @@ from pydantic import BaseModel, Field
 from typing import Optional, List, Dict
 from readbetween.models.dao import Conversation
 from readbetween.models.v1.model_available_cfg import ModelAvailableCfgInfo
+from readbetween.models.v1.retrieval import RetrievalFilter
 
 
 class Message(BaseModel):
@@ -49,6 +50,7 @@ class ChatMessageSend(BaseModel):
     max_tokens: Optional[int] = Field(2000, ge=1, description="生成的最大 token 数量")
     search: bool = Field(default=False, description="是否开启网络搜索")
     thinking: bool = Field(default=False, description="是否开启思考模式")
+    retrieval_filter: Optional[RetrievalFilter] = Field(default=None, description="知识库检索过滤条件")
 
 
 class ConversationOut(BaseModel):
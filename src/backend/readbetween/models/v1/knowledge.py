@@ -1,8 +1,9 @@
 from datetime import datetime
-from typing import Optional
+from typing import Optional, List
 from pydantic import BaseModel, Field
 from readbetween.models.dao import Knowledge
 from readbetween.models.v1.model_available_cfg import ModelAvailableCfgInfo
+from readbetween.models.v1.retrieval import RetrievalFilter
 
 
 class KnowledgeCreate(BaseModel):
@@ -13,6 +14,12 @@ class KnowledgeCreate(BaseModel):
     collection_name: str = Field(None, examples=[""], description="collection名称")
     index_name: str = Field(None, examples=[""], description="index名称")
     enable_layout: int = Field(0, examples=[0], description="是否开启布局识别")
+    vector_storage: str = Field("float", examples=["float"],
+                                description="向量存储格式 float/float16/bfloat16/sq8/binary(近似精排), 共享集合模式仅支持 float")
+    projection_method: Optional[str] = Field(None, examples=["pca"],
+                                             description="向量降维投影方式 pca/matryoshka, 共享集合模式不支持")
+    projection_dim: Optional[int] = Field(None, examples=[256],
+                                          description="投影后向量维度, 为空时存储原始维度向量")
 
 
 class KnowledgeUpdate(BaseModel):
@@ -21,6 +28,26 @@ class KnowledgeUpdate(BaseModel):
     desc: str = Field(None, examples=["新描述1"], description="新更新知识库描述")
 
 
+class KnowledgeEmbeddingMigrate(BaseModel):
+    id: str = Field(..., description="知识库主键ID")
+    available_model_id: Optional[str] = Field(None, examples=["xxx-xxx-xxx-xxx"],
+                                              description="迁移目标可用向量化模型ID，None时使用系统内置模型")
+
+
+class KnowledgeSharedMigrate(BaseModel):
+    kb_ids: Optional[List[str]] = Field(None, examples=[["xxx-xxx-xxx-xxx"]],
+                                        description="需要迁移的知识库ID列表，None时迁移全部知识库")
+
+
+class KnowledgeSearch(BaseModel):
+    kb_ids: List[str] = Field(..., examples=[["xxx-xxx-xxx-xxx"]], description="检索的知识库ID列表")
+    queries: List[str] = Field(..., examples=[["问题1", "问题2"]], description="查询内容列表")
+    mode: str = Field("both", examples=["both"], description="检索模式 milvus/es/both")
+    top_k: int = Field(5, ge=1, le=100, description="每个查询每个检索后端返回数量")
+    deduplicate: bool = Field(False, description="是否去除 Milvus 与 ES 重复召回的切片")
+    retrieval_filter: Optional[RetrievalFilter] = Field(None, description="检索过滤条件")
+
+
 class KnowledgeInfo(BaseModel):
     knowledge: Knowledge = Field(..., description="知识库")
     model_cfg: ModelAvailableCfgInfo = Field(..., description="当前会话渠道模型配置")
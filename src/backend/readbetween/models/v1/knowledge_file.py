@@ -33,6 +33,9 @@ class KnowledgeFileVectorizeTasks(BaseModel):
     separator: str
     enable_layout: int
     embedding_cfg_info: ModelAvailableCfgInfo
+    # 嵌入模型迁移期间的双写目标
+    shadow_collection_name: Optional[str] = None
+    shadow_embedding_cfg_info: Optional[ModelAvailableCfgInfo] = None
 
 
 class KnowledgeMsg(BaseModel):
@@ -42,6 +45,8 @@ class KnowledgeMsg(BaseModel):
     collection_name: Optional[str]
     index_name: Optional[str]
     enable_layout: Optional[int]
+    embedding_version: Optional[int] = None
+    migrate_status: Optional[int] = None
     # 创建时间
     create_time: Optional[datetime]
     # 修改时间
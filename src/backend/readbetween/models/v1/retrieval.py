@@ -0,0 +1,47 @@
+from datetime import datetime
+from typing import Dict, List, Optional
+
+from pydantic import BaseModel, Field
+
+
+class RetrievalFilter(BaseModel):
+    """
+    知识库检索过滤条件
+        文件名/上传时间由 knowledge_file 表解析为文件ID, 文件ID与页码范围下推至 Milvus 过滤表达式及 ES bool filter
+        各条件之间为且关系, 列表条件内为或关系
+    """
+    knowledge_ids: Optional[List[str]] = Field(None, examples=[["xxx-xxx-xxx-xxx"]],
+                                               description="限定检索的知识库ID, 仅在会话绑定的知识库内生效")
+    file_ids: Optional[List[str]] = Field(None, examples=[["xxx-xxx-xxx-xxx"]], description="文件ID列表")
+    titles: Optional[List[str]] = Field(None, examples=[["产品手册.pdf"]], description="文件名列表")
+    page_from: Optional[int] = Field(None, ge=0, examples=[1], description="切片起始页码下限(含)")
+    page_to: Optional[int] = Field(None, ge=0, examples=[10], description="切片起始页码上限(含)")
+    uploaded_after: Optional[datetime] = Field(None, description="文件上传时间下限(含)")
+    uploaded_before: Optional[datetime] = Field(None, description="文件上传时间上限(含)")
+
+    def needs_file_lookup(self) -> bool:
+        """是否需要查询 knowledge_file 表解析文件"""
+        return (self.file_ids is not None or self.titles is not None
+                or self.uploaded_after is not None or self.uploaded_before is not None)
+
+    def has_page_range(self) -> bool:
+        return self.page_from is not None or self.page_to is not None
+
+    def match(self, metadata: Dict) -> bool:
+        """
+        判断切片元数据是否满足知识库/文件/页码条件(文件名及上传时间需先解析为文件ID)
+        :param metadata: 切片元数据
+        """
+        if self.knowledge_ids is not None and metadata.get("knowledge_id") not in self.knowledge_ids:
+            return False
+        if self.file_ids is not None and metadata.get("file_id") not in self.file_ids:
+            return False
+        if self.has_page_range():
+            start_page = metadata.get("start_page")
+            if start_page is None:
+                return False
+            if self.page_from is not None and start_page < self.page_from:
+                return False
+            if self.page_to is not None and start_page > self.page_to:
+                return False
+        return True
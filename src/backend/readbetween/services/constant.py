@@ -1,4 +1,4 @@
-from pymilvus import FieldSchema, DataType
+from pymilvus import FieldSchema, DataType, Function, FunctionType
 from readbetween.config import settings
 from enum import Enum
 # JINA 地址
@@ -9,6 +9,7 @@ MODEL_SAVE_PATH = './static/models'
 BUILT_IN_EMBEDDING_NAME = "iic/nlp_gte_sentence-embedding_chinese-large"  # 1024维
 BUILT_IN_TTS_NAME = "AI-ModelScope/Kokoro-82M-v1.1-zh"
 BUILT_IN_STT_NAME = "Systran/faster-whisper-base"
+BUILT_IN_RERANK_NAME = "BAAI/bge-reranker-base"
 
 
 # SourceMsgType 引用来源类型
@@ -44,6 +45,16 @@ RedisMCPServerDetailKey = "mcp_server_detail_info"
 Milvus 默认配置项
 """
 MILVUS_COLLECTION_NAME_PREFIX = "c_readbetween_"
+# 共享集合名称
+MILVUS_SHARED_COLLECTION_NAME = f"{MILVUS_COLLECTION_NAME_PREFIX}shared"
+# 集合最近访问时间(有序集合 分数为时间戳)
+RedisMilvusLastAccessKey = "milvus_load:last_access"
+# 集合访问次数(有序集合 分数为访问次数) 用于启动预加载
+RedisMilvusHotKey = "milvus_load:hot"
+# 查询向量缓存
+PrefixRedisQueryEmbedding = "query_emb:"
+# 知识库数据版本号 入库/删除/迁移时自增 用于检索结果缓存失效
+PrefixRedisKnowledgeVersion = "know_version:"
 MILVUS_EMBEDDING_FIELD_NAME = "vector"
 MILVUS_DEFAULT_FIELDS_1024 = [
     FieldSchema(name="bbox", dtype=DataType.VARCHAR, max_length=65535),
@@ -73,6 +84,41 @@ MILVUS_DEFAULT_FIELDS_768 = [
     FieldSchema(name=MILVUS_EMBEDDING_FIELD_NAME, dtype=DataType.FLOAT_VECTOR, dim=768)
 ]
 
+# 精简集合 切片内容字段存于 MySQL knowledge_chunk 表, 集合仅保留向量及过滤键
+# 检索后按切片ID {file_id}_{chunk_index} 批量回填最终 top_k 的切片内容
+MILVUS_CHUNK_PAYLOAD_FIELDS = ["bbox", "start_page", "source", "title", "extra", "text"]
+MILVUS_LEAN_FIELDS_1024 = [
+    FieldSchema(name="chunk_index", dtype=DataType.INT64),
+    FieldSchema(name="file_id", dtype=DataType.VARCHAR, max_length=255),
+    # 页码范围过滤键
+    FieldSchema(name="start_page", dtype=DataType.INT64),
+    FieldSchema(name="knowledge_id", dtype=DataType.VARCHAR, max_length=255, is_partition_key=True),
+    FieldSchema(name="pk", dtype=DataType.INT64, is_primary=True, auto_id=True),
+    FieldSchema(name=MILVUS_EMBEDDING_FIELD_NAME, dtype=DataType.FLOAT_VECTOR, dim=1024)
+]
+
+# 稀疏向量字段 由 Milvus 内置 BM25 函数根据 text 字段自动生成 写入时无需提供
+MILVUS_SPARSE_FIELD_NAME = "sparse"
+MILVUS_BM25_FIELDS_1024 = [field for field in MILVUS_DEFAULT_FIELDS_1024 if field.name != "text"] + [
+    FieldSchema(name="text", dtype=DataType.VARCHAR, max_length=65535,
+                enable_analyzer=True, analyzer_params={"type": "chinese"}),
+    FieldSchema(name=MILVUS_SPARSE_FIELD_NAME, dtype=DataType.SPARSE_FLOAT_VECTOR),
+]
+# BM25 函数以 text 字段为输入 精简集合仍需保留 text
+MILVUS_LEAN_BM25_FIELDS_1024 = MILVUS_LEAN_FIELDS_1024 + MILVUS_BM25_FIELDS_1024[-2:]
+MILVUS_BM25_FUNCTIONS = [
+    Function(name="text_bm25", function_type=FunctionType.BM25,
+             input_field_names=["text"], output_field_names=[MILVUS_SPARSE_FIELD_NAME]),
+]
+MILVUS_SPARSE_INDEX_PARAMS = {
+    "index_type": "SPARSE_INVERTED_INDEX",
+    "metric_type": "BM25",
+}
+MILVUS_SPARSE_SEARCH_PARAMS = {
+    "metric_type": "BM25",
+    "params": {},
+}
+
 # Milvus 索引参数
 MILVUS_DEFAULT_INDEX_PARAMS = {
     "index_type": "HNSW",
@@ -82,10 +128,78 @@ MILVUS_DEFAULT_INDEX_PARAMS = {
         "efConstruction": 64
     }
 }
+# 向量存储格式 按知识库配置, 共享集合固定为 float
+#   float: FLOAT_VECTOR + HNSW
+#   float16 / bfloat16: 半精度向量 + HNSW
+#   sq8: FLOAT_VECTOR + IVF_SQ8 标量量化索引
+#   binary: 符号位二值向量 + BIN_IVF_FLAT(汉明距离), 不保存原始向量, 精排距离为近似值
+VECTOR_STORAGE_FLOAT = "float"
+VECTOR_STORAGE_FLOAT16 = "float16"
+VECTOR_STORAGE_BFLOAT16 = "bfloat16"
+VECTOR_STORAGE_SQ8 = "sq8"
+VECTOR_STORAGE_BINARY = "binary"
+VECTOR_STORAGE_OPTIONS = [VECTOR_STORAGE_FLOAT, VECTOR_STORAGE_FLOAT16, VECTOR_STORAGE_BFLOAT16,
+                          VECTOR_STORAGE_SQ8, VECTOR_STORAGE_BINARY]
+# 二值向量的缩放系数 以 scale * sign(v) 近似还原向量
+MILVUS_VECTOR_SCALE_FIELD_NAME = "vector_scale"
+MILVUS_STORAGE_INDEX_PARAMS = {
+    VECTOR_STORAGE_FLOAT: MILVUS_DEFAULT_INDEX_PARAMS,
+    VECTOR_STORAGE_FLOAT16: MILVUS_DEFAULT_INDEX_PARAMS,
+    VECTOR_STORAGE_BFLOAT16: MILVUS_DEFAULT_INDEX_PARAMS,
+    VECTOR_STORAGE_SQ8: {
+        "index_type": "IVF_SQ8",
+        "metric_type": "L2",
+        "params": {
+            "nlist": 128
+        }
+    },
+    VECTOR_STORAGE_BINARY: {
+        "index_type": "BIN_IVF_FLAT",
+        "metric_type": "HAMMING",
+        "params": {
+            "nlist": 128
+        }
+    },
+}
+# 向量降维投影方式 按知识库配置
+PROJECTION_METHOD_PCA = "pca"
+PROJECTION_METHOD_MATRYOSHKA = "matryoshka"
+PROJECTION_METHODS = [PROJECTION_METHOD_PCA, PROJECTION_METHOD_MATRYOSHKA]
+# 投影矩阵在 MinIO 中的对象前缀(以集合名称命名)
+PROJECTION_OBJECT_PREFIX = "projections/"
+# 投影首次拟合锁
+PrefixRedisProjectionLock = "projection_lock:"
+# 集合索引重建锁 同一集合同时只有一个进程重建
+PrefixRedisIndexRebuildLock = "index_rebuild_lock:"
+# 知识库关键词索引写入锁 入库写入 ES 与共享索引迁移切换互斥
+PrefixRedisKeywordWriteLock = "keyword_write_lock:"
 """
 ES 相关默认常量
 """
 ES_INDEX_NAME_PREFIX = "i_readbetween_"
+# 共享索引名称
+ES_SHARED_INDEX_NAME = f"{ES_INDEX_NAME_PREFIX}shared"
+# 知识库索引显式映射 仅 text/title 使用中文分词, ID 使用 keyword, bbox/extra 不建索引
+ES_DEFAULT_INDEX_MAPPINGS = {
+    "dynamic": False,
+    "properties": {
+        "text": {"type": "text", "analyzer": "ik_max_word", "search_analyzer": "ik_smart"},
+        "metadata": {
+            "properties": {
+                "title": {"type": "text", "analyzer": "ik_max_word", "search_analyzer": "ik_smart"},
+                "source": {"type": "keyword"},
+                "file_id": {"type": "keyword"},
+                "knowledge_id": {"type": "keyword"},
+                "chunk_index": {"type": "long"},
+                "start_page": {"type": "long"},
+                "bbox": {"type": "keyword", "index": False, "doc_values": False},
+                "extra": {"type": "keyword", "index": False, "doc_values": False},
+            }
+        }
+    }
+}
+# 知识库检索默认字段
+ES_DEFAULT_SEARCH_FIELDS = ["text", "metadata.title"]
 """
 常量
 """
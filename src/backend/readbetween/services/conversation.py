@@ -15,11 +15,11 @@ from readbetween.models.schemas.response import PageModel
 from readbetween.models.schemas.sse_response import StreamResponseTemplate
 from readbetween.models.v1.chat import ChatCreate, ChatUpdate, ChatMessageSend, ChatMessageSendPlus
 from fastapi import HTTPException
-from typing import Generator, List, Dict
+from typing import Generator, List, Dict, Optional
 
 from readbetween.models.v1.chat import ConversationInfo
-from readbetween.models.v1.knowledge import KnowledgeInfo
 from readbetween.models.v1.model_available_cfg import ModelAvailableCfgInfo
+from readbetween.models.v1.retrieval import RetrievalFilter
 from readbetween.services.constant import ModelType_LLM, PrefixRedisConversation, Ex_PrefixRedisConversation, \
     SourceMsgType
 from readbetween.services.conversation_knowledge_link import ConversationKnowledgeLinkService
@@ -229,7 +229,8 @@ class ConversationService:
 
                     # 已是异步设计 直接使用 await 调用异步函数
                     # task_results['kb_recall'] 保存结果 保持代码风格一致
-                    recall_chunk, kb_source_list = await cls._append_kb_recall_msg(knowledge_bases, content)
+                    recall_chunk, kb_source_list = await cls._append_kb_recall_msg(
+                        knowledge_bases, content, message_data.retrieval_filter)
                     task_results['kb_recall'] = (recall_chunk, kb_source_list)
 
                 # 处理网络搜索
@@ -735,14 +736,17 @@ class ConversationService:
         }
 
     @classmethod
-    async def _append_kb_recall_msg(cls, knowledge_bases: List[Knowledge], query: str):
+    async def _append_kb_recall_msg(cls, knowledge_bases: List[Knowledge], query: str,
+                                    retrieval_filter: Optional[RetrievalFilter] = None):
         recall_chunk = ""
         source_list: List[SourceMsg] = []
         if knowledge_bases:
             # 收集知识库及知识库所用模型信息
             milvus_knowledge_info: Dict[ModelAvailableCfgInfo, List[Knowledge]] = {}
-            for knowledge in knowledge_bases:
-                knowledge_info: KnowledgeInfo = await KnowledgeService.get_knowledge_info(knowledge.id)
+            # 一次批量获取全部知识库及模型配置
+            knowledge_infos = await KnowledgeService.get_knowledge_infos(
+                [knowledge.id for knowledge in knowledge_bases])
+            for knowledge_info in knowledge_infos.values():
                 model_cfg = knowledge_info.model_cfg
                 knowledge_obj = knowledge_info.knowledge
                 if model_cfg not in milvus_knowledge_info:
@@ -759,27 +763,30 @@ class ConversationService:
                     for knowledge_base in knowledge_bases
                 ],
                 es_fields=['text', 'metadata.title', 'metadata.source'],
-                top_k=3
+                es_knowledge_ids=[knowledge_base.id for knowledge_base in knowledge_bases],
+                top_k=3,
+                retrieval_filter=retrieval_filter,
             )
             for retrieve_result in retrieve_resp:
                 # print(retrieve_result.source)
                 # print(retrieve_result.score)
                 # print(retrieve_result)
-                # 返回object_name minio获取预签名链接
-                minio_object_name = retrieve_result.metadata['source']
-                minio_file_url = minio_client.get_presigned_url(object_name=minio_object_name)
-                # 保存来源信息
-                source_list.append(SourceMsg(source=SourceMsgType.KB.value, title=retrieve_result.metadata['title'],
-                                             url=minio_file_url))
                 # TODO 考虑是否抽象为配置项
                 # if retrieve_result.source == 'milvus' and float(retrieve_result.score) < 1:  # 较为宽松的召回
                 if retrieve_result.source == 'milvus' and float(retrieve_result.score) < 0.9:  # 较为严格的召回
-                    recall_chunk += f"Title: {retrieve_result.metadata['title']}\nContent: {retrieve_result.text}\n\n"
                     logger_util.debug(f"Milvus Score: {float(retrieve_result.score)}")
                 # if retrieve_result.source == 'es' and float(retrieve_result.score) > 2.5:  # 较为宽松的召回
-                if retrieve_result.source == 'es' and float(retrieve_result.score) > 4.5:  # 较为严格的召回
-                    recall_chunk += f"Title: {retrieve_result.metadata['title']}\nContent: {retrieve_result.text}\n\n"
+                elif retrieve_result.source == 'es' and float(retrieve_result.score) > 4.5:  # 较为严格的召回
                     logger_util.debug(f"ES Score: {float(retrieve_result.score)}")
+                else:
+                    continue
+                recall_chunk += f"Title: {retrieve_result.metadata['title']}\nContent: {retrieve_result.text}\n\n"
+                # 仅为采用的切片返回来源 返回object_name minio获取预签名链接 同一文件复用链接
+                minio_object_name = retrieve_result.metadata['source']
+                minio_file_url = minio_client.get_cached_presigned_url(object_name=minio_object_name)
+                # 保存来源信息
+                source_list.append(SourceMsg(source=SourceMsgType.KB.value, title=retrieve_result.metadata['title'],
+                                             url=minio_file_url))
 
         if recall_chunk:
             # 拼接RAG提示词模板
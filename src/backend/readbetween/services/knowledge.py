@@ -1,29 +1,39 @@
 import json
+from typing import Dict, List
 from readbetween.models.dao.model_available_cfg import ModelAvailableCfgDao
 from readbetween.models.v1.knowledge import KnowledgeCreate, KnowledgeUpdate, KnowledgeInfo
 from readbetween.models.v1.model_available_cfg import ModelAvailableCfgInfo
 from readbetween.services.base import BaseService
 from readbetween.models.dao.knowledge import KnowledgeDao, Knowledge
-from readbetween.utils.elasticsearch_util import ElasticSearchUtil
-from readbetween.utils.milvus_util import MilvusUtil
+from readbetween.utils.keyword_store import get_keyword_store
+from readbetween.utils.vector_store import get_vector_store, VECTOR_STORE_BACKEND_MILVUS
 from readbetween.utils.redis_util import RedisUtil
-from readbetween.services.constant import MILVUS_DEFAULT_INDEX_PARAMS, MILVUS_DEFAULT_FIELDS_768, \
-    MILVUS_DEFAULT_FIELDS_1024, \
+from readbetween.utils.logger_util import logger_util
+from readbetween.utils.retrieval_cache import bump_knowledge_version
+from readbetween.utils.vector_quantization import check_vector_storage, storage_fields
+from readbetween.utils.projection import projection_store
+from readbetween.utils.index_advisor import IndexAdvisor
+from readbetween.models.dao.knowledge_chunk import KnowledgeChunkDao
+from readbetween.services.constant import MILVUS_DEFAULT_FIELDS_768, MILVUS_DEFAULT_FIELDS_1024, \
     PrefixRedisKnowledge, System_Embedding_Name, MILVUS_EMBEDDING_FIELD_NAME, ES_INDEX_NAME_PREFIX, \
-    MILVUS_COLLECTION_NAME_PREFIX
+    MILVUS_COLLECTION_NAME_PREFIX, ES_SHARED_INDEX_NAME, MILVUS_SHARED_COLLECTION_NAME, MILVUS_BM25_FIELDS_1024, \
+    MILVUS_BM25_FUNCTIONS, MILVUS_SPARSE_FIELD_NAME, MILVUS_SPARSE_INDEX_PARAMS, MILVUS_STORAGE_INDEX_PARAMS, \
+    MILVUS_LEAN_FIELDS_1024, MILVUS_LEAN_BM25_FIELDS_1024, \
+    VECTOR_STORAGE_FLOAT, VECTOR_STORAGE_BINARY, PROJECTION_METHOD_PCA, PROJECTION_METHODS
+from readbetween.config import settings
 from fastapi import HTTPException
 import uuid
 from readbetween.services.constant import redis_default_model_key
 from readbetween.models.schemas.response import PageModel
 
 # 实例化milvus
-milvus_client = MilvusUtil()
+milvus_client = get_vector_store()
 
 # 实例化redis
 redis_util = RedisUtil()
 
 # 实例化es
-es_client = ElasticSearchUtil()
+es_client = get_keyword_store()
 
 # 实例化redis
 redis_client = RedisUtil()
@@ -33,17 +43,18 @@ class KnowledgeService(BaseService):
 
     @classmethod
     async def create_knowledge(cls, knowledge_create: KnowledgeCreate):
-        # TODO 同时创建Milvus-Collection
-        new_milvus_collection_name = f"{MILVUS_COLLECTION_NAME_PREFIX}{uuid.uuid4().hex}"
-        new_elastic_index_name = f"{ES_INDEX_NAME_PREFIX}{uuid.uuid4().hex}"
+        # 共享集合模式下全部知识库共用同一集合 以 knowledge_id 分区键隔离
+        new_milvus_collection_name = MILVUS_SHARED_COLLECTION_NAME if settings.storage.milvus.shared_collection \
+            else f"{MILVUS_COLLECTION_NAME_PREFIX}{uuid.uuid4().hex}"
+        # 共享索引模式下全部知识库共用同一索引
+        new_elastic_index_name = ES_SHARED_INDEX_NAME if settings.storage.es.shared_index \
+            else f"{ES_INDEX_NAME_PREFIX}{uuid.uuid4().hex}"
+        vector_storage = knowledge_create.vector_storage or VECTOR_STORAGE_FLOAT
+        projection_dim = knowledge_create.projection_dim or None
+        projection_method = (knowledge_create.projection_method or PROJECTION_METHOD_PCA) if projection_dim else None
+        cls.check_vector_options(vector_storage, projection_method, projection_dim)
         try:
-            # 创建MilvusCollection
-            milvus_client.create_collection(new_milvus_collection_name,  # 集合名
-                                            MILVUS_DEFAULT_FIELDS_1024)  # 属性
-            # 创建MilvusIndex
-            milvus_client.create_index_on_field(new_milvus_collection_name,  # 集合名
-                                                MILVUS_EMBEDDING_FIELD_NAME,  # 创建索引的属性
-                                                MILVUS_DEFAULT_INDEX_PARAMS)  # 索引参数
+            cls.ensure_milvus_collection(new_milvus_collection_name, vector_storage, projection_dim)
         except Exception as e:
             raise HTTPException(status_code=500, detail=f"创建Milvus集合异常: {str(e)}")
 
@@ -51,8 +62,8 @@ class KnowledgeService(BaseService):
         knowledge_create.collection_name = new_milvus_collection_name
 
         try:
-            # 上传文件时自动创建ES索引
-            pass
+            # 使用显式映射创建ES索引
+            es_client.create_index(new_elastic_index_name)
         except Exception as e:
             raise HTTPException(status_code=500, detail=f"创建ElasticSearch索引异常: {str(e)}")
 
@@ -64,24 +75,110 @@ class KnowledgeService(BaseService):
                                          knowledge_create.available_model_id,
                                          knowledge_create.collection_name,
                                          knowledge_create.index_name,
-                                         knowledge_create.enable_layout)
+                                         knowledge_create.enable_layout,
+                                         vector_storage,
+                                         projection_method,
+                                         projection_dim)
+
+    @classmethod
+    def check_vector_options(cls, vector_storage, projection_method, projection_dim):
+        """
+        校验知识库向量存储格式及降维投影配置, 共享集合字段固定不支持
+        """
+        try:
+            check_vector_storage(vector_storage)
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+        if vector_storage != VECTOR_STORAGE_FLOAT and (
+                settings.storage.milvus.shared_collection
+                or settings.storage.vector_store.backend != VECTOR_STORE_BACKEND_MILVUS):
+            raise HTTPException(status_code=400, detail="共享集合模式及本地向量存储仅支持 float 向量存储")
+        if not projection_dim:
+            return
+        if settings.storage.milvus.shared_collection:
+            raise HTTPException(status_code=400, detail="共享集合模式不支持向量降维投影")
+        if projection_method not in PROJECTION_METHODS:
+            raise HTTPException(status_code=400, detail=f"不支持的投影方式: {projection_method}")
+        if projection_dim <= 0 or (vector_storage == VECTOR_STORAGE_BINARY and projection_dim % 8):
+            raise HTTPException(status_code=400, detail="投影维度需为正数, 二值向量存储时需为 8 的倍数")
+
+    @classmethod
+    def ensure_milvus_collection(cls, collection_name, vector_storage=VECTOR_STORAGE_FLOAT, vector_dim=None,
+                                 index_params=None):
+        """
+        集合不存在时创建集合及向量索引
+        开启 storage.milvus.enable_bm25 时同时创建 BM25 稀疏向量字段及索引, 支持 Milvus 原生混合检索
+        开启 storage.milvus.auto_index 时 float 存储的新集合使用 FLAT 索引, 数据增长后由后台任务在新集合中升级并切换
+        开启 storage.vector_store.lean_collections 时集合仅保留向量及过滤键, 切片内容存于 knowledge_chunk 表
+        :param collection_name: 集合名称
+        :param vector_storage: 向量存储格式 float/float16/bfloat16/sq8/binary
+        :param vector_dim: 向量维度, 知识库配置降维投影时为投影维度, 为空时使用默认维度
+        :param index_params: 向量索引参数, 为空时按存储格式选择(索引升级时传入建议索引)
+        """
+        if milvus_client.check_collection_exists(collection_name):
+            return
+        is_milvus = settings.storage.vector_store.backend == VECTOR_STORE_BACKEND_MILVUS
+        enable_bm25 = settings.storage.milvus.enable_bm25 and is_milvus
+        if settings.storage.vector_store.lean_collections:
+            fields = MILVUS_LEAN_BM25_FIELDS_1024 if enable_bm25 else MILVUS_LEAN_FIELDS_1024
+        else:
+            fields = MILVUS_BM25_FIELDS_1024 if enable_bm25 else MILVUS_DEFAULT_FIELDS_1024
+        if vector_storage != VECTOR_STORAGE_FLOAT or vector_dim:
+            fields = storage_fields(fields, vector_storage, vector_dim)
+        # 创建MilvusCollection
+        if enable_bm25:
+            milvus_client.create_collection(collection_name,  # 集合名
+                                            fields,  # 属性
+                                            MILVUS_BM25_FUNCTIONS)  # BM25 函数
+        else:
+            milvus_client.create_collection(collection_name,  # 集合名
+                                            fields)  # 属性
+        # 创建MilvusIndex 量化存储保持对应索引类型
+        if index_params is None:
+            index_params = MILVUS_STORAGE_INDEX_PARAMS[vector_storage]
+            if is_milvus and settings.storage.milvus.auto_index and vector_storage == VECTOR_STORAGE_FLOAT:
+                index_params = IndexAdvisor.choose_index(0, vector_dim or 1024, index_params["metric_type"])
+        milvus_client.create_index_on_field(collection_name,  # 集合名
+                                            MILVUS_EMBEDDING_FIELD_NAME,  # 创建索引的属性
+                                            index_params)  # 索引参数
+        if enable_bm25:
+            milvus_client.create_index_on_field(collection_name,
+                                                MILVUS_SPARSE_FIELD_NAME,
+                                                MILVUS_SPARSE_INDEX_PARAMS)
 
     @classmethod
     async def delete_knowledge(cls, id):
         try:
             drop_knowledge = await KnowledgeDao.select(id)
 
-            # 删除MilvusCollection
+            # 删除MilvusCollection 共享集合仅删除当前知识库数据
             drop_collection_name = drop_knowledge.collection_name
-            milvus_client.delete_collection(drop_collection_name)
+            if drop_collection_name == MILVUS_SHARED_COLLECTION_NAME:
+                milvus_client.delete_collection_file(drop_collection_name, f"knowledge_id == '{id}'")
+            else:
+                milvus_client.delete_collection(drop_collection_name)
+                if drop_knowledge.projection_dim:
+                    projection_store.delete(drop_collection_name)
+            # 迁移中的新 Collection 同步删除
+            if drop_knowledge.pending_collection_name:
+                milvus_client.delete_collection(drop_knowledge.pending_collection_name)
+                if drop_knowledge.projection_dim:
+                    projection_store.delete(drop_knowledge.pending_collection_name)
 
-            # ES索引存在 同步删除ES索引
+            # ES索引存在 同步删除ES索引 共享索引仅删除当前知识库文档
             drop_es_index_name = drop_knowledge.index_name
-            es_client.delete_index(drop_es_index_name)
+            if drop_es_index_name == ES_SHARED_INDEX_NAME:
+                es_client.delete_knowledge_documents(drop_es_index_name, id, routing=id)
+            else:
+                es_client.delete_index(drop_es_index_name)
+
+            # 删除切片内容
+            await KnowledgeChunkDao.delete_by_knowledge_id(id)
 
             # 拼接 Redis Key
             know_info_key = f"{PrefixRedisKnowledge}{id}"
             redis_client.delete(know_info_key)
+            bump_knowledge_version(id)
 
         except Exception as e:
             raise HTTPException(status_code=500, detail=f"删除Milvus集合异常: {str(e)}")
@@ -122,30 +219,81 @@ class KnowledgeService(BaseService):
             )
 
         knowledge: Knowledge = await KnowledgeDao.select(target_kb_id)
-        if knowledge.available_model_id:
-            available, setting, provider = ModelAvailableCfgDao.select_cfg_info_by_id(knowledge.available_model_id)
-            knowledge_info = KnowledgeInfo(
-                knowledge=knowledge,
-                model_cfg=ModelAvailableCfgInfo(
-                    type=available.type,
-                    name=available.name,
-                    api_key=setting.api_key,
-                    base_url=setting.base_url,
-                    mark=provider.mark
-                )
-            )
-        else:
-            knowledge_info = KnowledgeInfo(
-                knowledge=knowledge,
-                model_cfg=ModelAvailableCfgInfo(
-                    type="embedding",
-                    name=System_Embedding_Name,
-                    api_key="",
-                    base_url="",
-                    mark="system"
-                )
-            )
+        knowledge_info = KnowledgeInfo(
+            knowledge=knowledge,
+            model_cfg=cls.resolve_model_cfg(knowledge.available_model_id)
+        )
         # 加入缓存 不过期
         redis_util.set(know_info_key, knowledge_info.model_dump_json())
 
         return knowledge_info
+
+    @classmethod
+    async def get_knowledge_infos(cls, kb_ids: List[str]) -> Dict[str, KnowledgeInfo]:
+        """
+        批量获取知识库及其嵌入模型配置, 耗时与知识库数量无关
+            一次 MGET 读取缓存, 未命中的知识库一次 SQL 查询知识库及模型配置, pipeline 回写缓存
+        :param kb_ids: 知识库ID列表
+        :return: 知识库ID -> 知识库信息, 按 kb_ids 顺序, 不存在的知识库不返回
+        """
+        kb_ids = list(dict.fromkeys(kb_ids))
+        if not kb_ids:
+            return {}
+        knowledge_infos: Dict[str, KnowledgeInfo] = {}
+        cached_infos = redis_client.mget([f"{PrefixRedisKnowledge}{kb_id}" for kb_id in kb_ids])
+        for kb_id, cached_info in zip(kb_ids, cached_infos):
+            if cached_info:
+                cached_info = json.loads(cached_info)
+                knowledge_infos[kb_id] = KnowledgeInfo(
+                    knowledge=Knowledge.parse_obj(cached_info.get("knowledge", {})),
+                    model_cfg=ModelAvailableCfgInfo.parse_obj(cached_info.get("model_cfg", {}))
+                )
+
+        missing_ids = [kb_id for kb_id in kb_ids if kb_id not in knowledge_infos]
+        if missing_ids:
+            pipe = redis_client.pipeline()
+            for knowledge, available, setting, provider in await KnowledgeDao.get_many_with_model_cfg(missing_ids):
+                if knowledge.available_model_id and available is None:
+                    logger_util.warning(f"知识库{knowledge.id}的嵌入模型配置{knowledge.available_model_id}不存在")
+                    continue
+                knowledge_info = KnowledgeInfo(knowledge=knowledge,
+                                               model_cfg=cls._build_model_cfg(available, setting, provider))
+                knowledge_infos[knowledge.id] = knowledge_info
+                # 加入缓存 不过期
+                pipe.set(f"{PrefixRedisKnowledge}{knowledge.id}", knowledge_info.model_dump_json())
+            pipe.execute()
+            not_found_ids = [kb_id for kb_id in missing_ids if kb_id not in knowledge_infos]
+            if not_found_ids:
+                logger_util.warning(f"未找到的知识库ID: {not_found_ids}")
+
+        return {kb_id: knowledge_infos[kb_id] for kb_id in kb_ids if kb_id in knowledge_infos}
+
+    @classmethod
+    def resolve_model_cfg(cls, available_model_id) -> ModelAvailableCfgInfo:
+        """
+        根据可用模型配置ID解析嵌入模型配置
+        :param available_model_id: 可用模型配置ID，None时使用系统内置模型
+        :return: 模型配置信息
+        """
+        if available_model_id:
+            return cls._build_model_cfg(*ModelAvailableCfgDao.select_cfg_info_by_id(available_model_id))
+        return cls._build_model_cfg(None, None, None)
+
+    @staticmethod
+    def _build_model_cfg(available, setting, provider) -> ModelAvailableCfgInfo:
+        """由可用模型配置、模型设置及供应商组装嵌入模型配置，可用模型配置为空时使用系统内置模型"""
+        if available is not None:
+            return ModelAvailableCfgInfo(
+                type=available.type,
+                name=available.name,
+                api_key=setting.api_key,
+                base_url=setting.base_url,
+                mark=provider.mark
+            )
+        return ModelAvailableCfgInfo(
+            type="embedding",
+            name=System_Embedding_Name,
+            api_key="",
+            base_url="",
+            mark="system"
+        )
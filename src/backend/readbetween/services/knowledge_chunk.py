@@ -0,0 +1,112 @@
+from typing import Dict, List, Optional
+
+from readbetween.models.dao.knowledge_chunk import KnowledgeChunk, KnowledgeChunkDao
+from readbetween.services.base import BaseService
+from readbetween.services.constant import MILVUS_CHUNK_PAYLOAD_FIELDS, MILVUS_EMBEDDING_FIELD_NAME, \
+    MILVUS_VECTOR_SCALE_FIELD_NAME
+
+
+class KnowledgeChunkService(BaseService):
+    """
+    切片内容存储
+        入库时全部切片内容写入 MySQL knowledge_chunk 表, 精简集合仅保存向量及过滤键
+        检索时对最终 top_k 中缺少切片内容的结果按 {file_id}_{chunk_index} 一次批量回填
+    """
+
+    @staticmethod
+    def chunk_id(file_id: str, chunk_index) -> str:
+        return f"{file_id}_{int(chunk_index)}"
+
+    @staticmethod
+    def is_lean(field_names: List[str]) -> bool:
+        """集合字段不含完整切片内容时为精简集合"""
+        return not set(MILVUS_CHUNK_PAYLOAD_FIELDS) <= set(field_names)
+
+    @classmethod
+    def save_rows(cls, rows: List[Dict]):
+        """
+        保存向量存储写入数据中的切片内容
+        :param rows: 含 file_id/knowledge_id/chunk_index 及切片内容字段的写入数据
+        """
+        KnowledgeChunkDao.save_batch([
+            KnowledgeChunk(id=cls.chunk_id(row["file_id"], row.get("chunk_index") or 0),
+                           knowledge_id=row["knowledge_id"],
+                           file_id=row["file_id"],
+                           chunk_index=row.get("chunk_index") or 0,
+                           start_page=row.get("start_page") or 0,
+                           title=row.get("title"),
+                           source=row.get("source"),
+                           bbox=row.get("bbox"),
+                           extra=row.get("extra"),
+                           text=row.get("text"))
+            for row in rows
+        ])
+
+    @classmethod
+    def fill_rows(cls, rows: List[Dict], fields: Optional[List[str]] = None) -> List[Dict]:
+        """
+        同步回填缺少切片内容的数据（供 Celery 任务使用）
+        :param rows: 精简集合查询结果
+        :param fields: 需回填的字段，默认全部切片内容字段
+        :return: rows
+        """
+        fields = MILVUS_CHUNK_PAYLOAD_FIELDS if fields is None else fields
+        pending = cls._pending(rows, fields)
+        if pending:
+            chunks = KnowledgeChunkDao.select_by_ids(list({chunk_id for chunk_id, _ in pending}))
+            cls._fill(pending, chunks, fields)
+        return rows
+
+    @classmethod
+    async def hydrate_results(cls, results: List[Dict], fields: Optional[List[str]] = None) -> List[Dict]:
+        """
+        回填向量检索结果 entity 中缺少的切片内容
+        :param results: 向量检索结果 {"id", "distance", "entity", "collection_name"}
+        :param fields: 调用方要求返回的字段，为空时回填全部切片内容字段
+        :return: results
+        """
+        fields = MILVUS_CHUNK_PAYLOAD_FIELDS if fields is None else \
+            [field for field in fields if field in MILVUS_CHUNK_PAYLOAD_FIELDS]
+        pending = cls._pending([result.get("entity", {}) for result in results], fields)
+        if pending:
+            chunks = await KnowledgeChunkDao.get_many(list({chunk_id for chunk_id, _ in pending}))
+            cls._fill(pending, chunks, fields)
+        return results
+
+    @classmethod
+    def adapt_rows(cls, rows: List[Dict], field_names: List[str]) -> List[Dict]:
+        """
+        按目标集合字段调整待复制数据
+            目标为精简集合: 保存切片内容(历史完整集合的数据补写切片存储)
+            目标集合包含而源数据缺少的切片内容字段: 从切片存储回填
+        :param rows: 源集合查询结果
+        :param field_names: 目标集合可写入字段
+        :return: 仅含目标集合字段的写入数据
+        """
+        if not rows:
+            return rows
+        if cls.is_lean(field_names) and not cls.is_lean(list(rows[0])):
+            cls.save_rows(rows)
+        # 精简 BM25 集合仍需写入 text
+        cls.fill_rows(rows, [field for field in MILVUS_CHUNK_PAYLOAD_FIELDS if field in field_names])
+        writable = set(field_names) | {MILVUS_EMBEDDING_FIELD_NAME, MILVUS_VECTOR_SCALE_FIELD_NAME}
+        return [{field: value for field, value in row.items() if field in writable} for row in rows]
+
+    @classmethod
+    def _pending(cls, entities: List[Dict], fields: List[str]):
+        if not fields:
+            return []
+        return [(cls.chunk_id(entity["file_id"], entity["chunk_index"]), entity) for entity in entities
+                if entity.get("file_id") is not None and entity.get("chunk_index") is not None
+                and any(entity.get(field) is None for field in fields)]
+
+    @staticmethod
+    def _fill(pending, chunks: List[KnowledgeChunk], fields: List[str]):
+        chunk_map = {chunk.id: chunk for chunk in chunks}
+        for chunk_id, entity in pending:
+            chunk = chunk_map.get(chunk_id)
+            if chunk is None:
+                continue
+            for field in fields:
+                if entity.get(field) is None:
+                    entity[field] = getattr(chunk, field)
@@ -5,14 +5,17 @@ from readbetween.models.dao.knowledge_file import KnowledgeFile
 from readbetween.models.schemas.response import PageModel
 from readbetween.models.v1.knowledge_file import UploadFileInfo
 from readbetween.services.base import BaseService
-from readbetween.utils.milvus_util import MilvusUtil
-from readbetween.utils.elasticsearch_util import ElasticSearchUtil
+from readbetween.utils.vector_store import get_vector_store
+from readbetween.utils.keyword_store import get_keyword_store
 from readbetween.utils.minio_util import MinioUtil
 from readbetween.models.dao.knowledge_file import KnowledgeFileDao
+from readbetween.models.dao.knowledge_chunk import KnowledgeChunkDao
+from readbetween.services.constant import ES_SHARED_INDEX_NAME
+from readbetween.utils.retrieval_cache import bump_knowledge_version
 
 minio_client = MinioUtil()
-milvus_client = MilvusUtil()
-es_client = ElasticSearchUtil()
+milvus_client = get_vector_store()
+es_client = get_keyword_store()
 
 
 class KnowledgeFileService(BaseService):
@@ -80,16 +83,14 @@ class KnowledgeFileService(BaseService):
         # 删除Milvus中文件
         delete_expr = f"file_id == '{kb_file_id}'"
         milvus_client.delete_collection_file(delete_kb_info.collection_name, delete_expr)
+        # 迁移期间新 Collection 中已复制的切片同时删除 避免切换后文件复现
+        if delete_kb_info.migrate_status == 1 and delete_kb_info.pending_collection_name:
+            milvus_client.delete_collection_file(delete_kb_info.pending_collection_name, delete_expr)
         # 删除ES中文件
-        delete_query = {
-            "query": {
-                "term": {
-                    "metadata.file_id.keyword": {
-                        "value": f"{kb_file_id}"
-                    }
-                }
-            }
-        }
-        es_client.delete_documents(delete_kb_info.index_name, delete_query)
+        es_client.delete_file_documents(delete_kb_info.index_name, kb_file_id,
+                                        routing=delete_kb_info.id if delete_kb_info.index_name == ES_SHARED_INDEX_NAME else None)
+        # 删除切片内容
+        await KnowledgeChunkDao.delete_by_file_id(kb_file_id)
         # 删除数据库文件记录
         await KnowledgeFileDao.delete_by_kb_file_id(kb_file_id)
+        bump_knowledge_version(delete_kb_info.id)
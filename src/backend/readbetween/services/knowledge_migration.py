@@ -0,0 +1,85 @@
+import uuid
+from typing import List
+
+from fastapi import HTTPException
+
+from readbetween.models.dao.knowledge import KnowledgeDao, Knowledge
+from readbetween.services.base import BaseService
+from readbetween.services.knowledge import KnowledgeService
+from readbetween.services.constant import MILVUS_COLLECTION_NAME_PREFIX, PrefixRedisKnowledge, VECTOR_STORAGE_FLOAT
+from readbetween.config import settings
+from readbetween.services.tasks import celery_migrate_knowledge_embedding, celery_migrate_es_shared_index, \
+    celery_migrate_milvus_shared_collection
+from readbetween.utils.logger_util import logger_util
+from readbetween.utils.vector_store import get_vector_store
+from readbetween.utils.redis_util import RedisUtil
+
+# 实例化milvus
+milvus_client = get_vector_store()
+
+# 实例化redis
+redis_client = RedisUtil()
+
+
+class KnowledgeMigrationService(BaseService):
+
+    @classmethod
+    async def start_embedding_migration(cls, kb_id: str, available_model_id: str = None):
+        """
+        启动知识库嵌入模型在线迁移
+        新建带版本号的 Collection 后台重新向量化, 迁移期间新入库文件双写, 完成后原子切换
+        :param kb_id: 知识库ID
+        :param available_model_id: 目标可用模型配置ID，None时使用系统内置模型
+        :return: 知识库对象
+        """
+        knowledge: Knowledge = await KnowledgeDao.select(kb_id)
+        if knowledge is None:
+            raise HTTPException(status_code=404, detail="Knowledge not found")
+        if knowledge.migrate_status == 1:
+            raise HTTPException(status_code=409, detail="知识库正在进行嵌入模型迁移")
+        if knowledge.available_model_id == available_model_id:
+            raise HTTPException(status_code=400, detail="目标嵌入模型与当前嵌入模型相同")
+
+        next_version = (knowledge.embedding_version or 1) + 1
+        pending_collection_name = f"{MILVUS_COLLECTION_NAME_PREFIX}{uuid.uuid4().hex}_v{next_version}"
+        try:
+            KnowledgeService.ensure_milvus_collection(pending_collection_name,
+                                                      knowledge.vector_storage or VECTOR_STORAGE_FLOAT,
+                                                      knowledge.projection_dim)
+        except Exception as e:
+            raise HTTPException(status_code=500, detail=f"创建Milvus集合异常: {str(e)}")
+
+        try:
+            knowledge = await KnowledgeDao.begin_migration(kb_id, pending_collection_name, available_model_id)
+        except Exception:
+            milvus_client.delete_collection(pending_collection_name)
+            raise
+        redis_client.delete(f"{PrefixRedisKnowledge}{kb_id}")
+
+        celery_migrate_knowledge_embedding.delay(kb_id)
+        logger_util.info(f"知识库{kb_id}嵌入模型迁移任务已提交Celery, 目标集合: {pending_collection_name}")
+        return knowledge
+
+    @classmethod
+    async def start_es_shared_index_migration(cls, kb_ids: List[str] = None):
+        """
+        启动知识库 ES 独立索引迁移至共享索引
+        :param kb_ids: 需要迁移的知识库ID列表，None时迁移全部知识库
+        :return: None
+        """
+        if not settings.storage.es.shared_index:
+            raise HTTPException(status_code=400, detail="未开启ES共享索引模式")
+        celery_migrate_es_shared_index.delay(kb_ids)
+        logger_util.info(f"ES共享索引迁移任务已提交Celery, 知识库: {kb_ids or '全部'}")
+
+    @classmethod
+    async def start_milvus_shared_collection_migration(cls, kb_ids: List[str] = None):
+        """
+        启动知识库 Milvus 独立集合迁移至共享集合
+        :param kb_ids: 需要迁移的知识库ID列表，None时迁移全部知识库
+        :return: None
+        """
+        if not settings.storage.milvus.shared_collection:
+            raise HTTPException(status_code=400, detail="未开启Milvus共享集合模式")
+        celery_migrate_milvus_shared_collection.delay(kb_ids)
+        logger_util.info(f"Milvus共享集合迁移任务已提交Celery, 知识库: {kb_ids or '全部'}")
@@ -0,0 +1,85 @@
+import json
+from typing import AsyncGenerator, Dict, List
+
+from fastapi import HTTPException
+
+from readbetween.config import settings
+from readbetween.models.dao.knowledge import Knowledge
+from readbetween.models.v1.knowledge import KnowledgeSearch
+from readbetween.models.v1.model_available_cfg import ModelAvailableCfgInfo
+from readbetween.services.base import BaseService
+from readbetween.services.knowledge import KnowledgeService
+from readbetween.services.retriever import RetrieverService
+from readbetween.utils.logger_util import logger_util
+
+SEARCH_MODES = ("milvus", "es", "both")
+MILVUS_SEARCH_FIELDS = ['text', 'title', 'source', 'file_id', 'chunk_index', 'start_page', 'knowledge_id']
+ES_SEARCH_FIELDS = ['text', 'metadata.title', 'metadata.source', 'metadata.file_id', 'metadata.chunk_index',
+                    'metadata.start_page', 'metadata.knowledge_id']
+
+
+class KnowledgeSearchService(BaseService):
+
+    @classmethod
+    async def batch_search(cls, knowledge_search: KnowledgeSearch) -> AsyncGenerator[str, None]:
+        """
+        知识库批量检索
+            查询按 retrieval.batch_search_size 分批, 每批一次批量嵌入、Milvus 每个集合一次多向量检索、ES 一次 msearch
+            每个查询的结果为一行 JSON(NDJSON), 按查询顺序逐批返回
+        参数校验在返回生成器前完成, 校验失败直接抛出异常
+        :param knowledge_search: 批量检索参数
+        :return: NDJSON 行生成器
+        """
+        if knowledge_search.mode not in SEARCH_MODES:
+            raise HTTPException(status_code=400, detail=f"不支持的检索模式: {knowledge_search.mode}")
+        if not knowledge_search.queries:
+            raise HTTPException(status_code=400, detail="查询内容不能为空")
+        max_queries = settings.retrieval.batch_search_max_queries
+        if len(knowledge_search.queries) > max_queries:
+            raise HTTPException(status_code=400, detail=f"单次请求查询数量不能超过 {max_queries}")
+
+        knowledge_infos = await KnowledgeService.get_knowledge_infos(knowledge_search.kb_ids)
+        missing_ids = [kb_id for kb_id in knowledge_search.kb_ids if kb_id not in knowledge_infos]
+        if missing_ids:
+            raise HTTPException(status_code=404, detail=f"知识库不存在: {missing_ids}")
+        milvus_knowledge_info: Dict[ModelAvailableCfgInfo, List[Knowledge]] = {}
+        for knowledge_info in knowledge_infos.values():
+            milvus_knowledge_info.setdefault(knowledge_info.model_cfg, []).append(knowledge_info.knowledge)
+        knowledges = [knowledge_info.knowledge for knowledge_info in knowledge_infos.values()]
+
+        return cls._stream_results(knowledge_search, milvus_knowledge_info, knowledges)
+
+    @classmethod
+    async def _stream_results(cls, knowledge_search: KnowledgeSearch,
+                              milvus_knowledge_info: Dict[ModelAvailableCfgInfo, List[Knowledge]],
+                              knowledges: List[Knowledge]) -> AsyncGenerator[str, None]:
+        queries = knowledge_search.queries
+        batch_size = max(settings.retrieval.batch_search_size, 1)
+        for start in range(0, len(queries), batch_size):
+            batch = queries[start:start + batch_size]
+            try:
+                batch_results = await RetrieverService.batch_retrieve(
+                    queries=batch,
+                    mode=knowledge_search.mode,
+                    milvus_knowledge_info=milvus_knowledge_info,
+                    milvus_fields=MILVUS_SEARCH_FIELDS,
+                    es_index_names=[knowledge.index_name for knowledge in knowledges],
+                    es_fields=ES_SEARCH_FIELDS,
+                    es_knowledge_ids=[knowledge.id for knowledge in knowledges],
+                    top_k=knowledge_search.top_k,
+                    deduplicate=knowledge_search.deduplicate,
+                    retrieval_filter=knowledge_search.retrieval_filter,
+                )
+            except Exception as e:
+                # 单批失败不影响后续批次 该批每个查询返回错误信息
+                logger_util.error(f"批量检索失败 查询序号 {start}-{start + len(batch) - 1}: {e}")
+                for offset, query in enumerate(batch):
+                    yield json.dumps({"index": start + offset, "query": query, "error": str(e)},
+                                     ensure_ascii=False) + "\n"
+                continue
+            for offset, (query, results) in enumerate(zip(batch, batch_results)):
+                yield json.dumps({
+                    "index": start + offset,
+                    "query": query,
+                    "results": [result.to_dict() for result in results],
+                }, ensure_ascii=False, default=str) + "\n"
@@ -1,15 +1,29 @@
 import asyncio
 import json
 import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
 from typing import List, Dict, Union, Optional
 
+import numpy as np
+
+from readbetween.config import settings
+from readbetween.core.dependencies import get_local_rerank_manager
 from readbetween.models.dao import Knowledge
+from readbetween.models.dao.knowledge_file import KnowledgeFileDao
 from readbetween.models.schemas.retriever import RetrieverResult
 from readbetween.models.v1.model_available_cfg import ModelAvailableCfgInfo
+from readbetween.models.v1.retrieval import RetrievalFilter
 from readbetween.services.base import BaseService
-from readbetween.utils.elasticsearch_util import ElasticSearchUtil
+from readbetween.services.constant import MILVUS_EMBEDDING_FIELD_NAME
+from readbetween.services.knowledge_chunk import KnowledgeChunkService
+from readbetween.utils.keyword_store import get_keyword_store
+from readbetween.utils.embedding_cache import embedding_cache
 from readbetween.utils.logger_util import logger_util
-from readbetween.utils.milvus_util import MilvusUtil
+from readbetween.utils.projection import project_for_query
+from readbetween.utils.retrieval_cache import retrieval_cache, get_knowledge_versions
+from readbetween.utils.vector_store import get_vector_store
 from readbetween.utils.model_factory import ModelFactory
 
 
@@ -17,6 +31,10 @@ class RetrieverService(BaseService):
     # 添加类属性
     _milvus_client = None
     _es_client = None
+    # 查询向量计算线程池
+    _embedding_executor = ThreadPoolExecutor(max_workers=4, thread_name_prefix="retriever_embedding")
+    # 重排序线程池 模型推理串行执行
+    _rerank_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="retriever_rerank")
     # _model_client = None
 
     @classmethod
@@ -24,16 +42,17 @@ class RetrieverService(BaseService):
         """初始化所有客户端（线程安全）"""
         with threading.Lock():
             if cls._milvus_client is None:
-                cls._milvus_client = MilvusUtil()
+                cls._milvus_client = get_vector_store()
             if cls._es_client is None:
-                cls._es_client = ElasticSearchUtil()
+                cls._es_client = get_keyword_store()
         return cls._milvus_client, cls._es_client
 
     @classmethod
-    def _convert_milvus_result_to_retriever_result(cls, milvus_result: Dict) -> RetrieverResult:
+    def _convert_milvus_result_to_retriever_result(cls, milvus_result: Dict, source: str = "milvus") -> RetrieverResult:
         """
         将 Milvus 的结果转换为 RetrieverResult 格式。
         :param milvus_result: Milvus 返回的结果
+        :param source: 结果来源，Milvus 原生混合检索为 milvus_hybrid
         :param name: 集合名称或索引名称
         :return: RetrieverResult 格式的字典
         """
@@ -42,14 +61,18 @@ class RetrieverService(BaseService):
         text = milvus_result.get("entity", {}).get("text")
         if "text" in metadata:
             del metadata["text"]  # 删除 text 字段
+        # 调用方请求向量字段时移出 metadata, 仅保留 float 向量(量化存储的编码向量不可直接使用)
+        vector = metadata.pop(MILVUS_EMBEDDING_FIELD_NAME, None)
+        if not (isinstance(vector, list) and vector and isinstance(vector[0], (float, np.floating))):
+            vector = milvus_result.get("vector", None)
         return RetrieverResult(
-            source="milvus",
+            source=source,
             name=milvus_result.get("collection_name", "Unknown"),
             id=milvus_result.get("id", ""),
             score=milvus_result.get("distance", ""),
             metadata=metadata,
             text=text,
-            vector=milvus_result.get("vector", None)
+            vector=vector
         )
 
     @classmethod
@@ -73,7 +96,7 @@ class RetrieverService(BaseService):
     async def retrieve(
             cls,
             query: str,
-            mode: str = "both",  # 检索模式：'milvus', 'es', 'both'
+            mode: str = "both",  # 检索模式：'milvus', 'es', 'both', 'hybrid'
             milvus_knowledge_info: Dict[ModelAvailableCfgInfo, List[Knowledge]] = {},
             milvus_fields: List[str] = None,
             milvus_expr: str = None,
@@ -81,12 +104,18 @@ class RetrieverService(BaseService):
             es_index_names: Optional[List[str]] = None,
             es_fields: List[str] = None,
             es_query: Union[str, Dict] = None,
+            es_knowledge_ids: Optional[List[str]] = None,
             top_k: int = 5,
+            deduplicate: bool = False,
+            retrieval_filter: Optional[RetrievalFilter] = None,
     ) -> List[RetrieverResult]:
         """
         检索服务，支持通过 Milvus 和 Elasticsearch 进行检索。
+        向量与关键词检索后端由配置 storage.vector_store / storage.keyword_store 决定，es 模式可使用本地 BM25 索引。
         :param query: 查询内容。
-        :param mode: 检索模式，可选值为 'milvus'、'es' 或 'both'。
+        :param mode: 检索模式，可选值为 'milvus'、'es'、'both' 或 'hybrid'。
+            hybrid: 含 BM25 稀疏向量字段的集合在 Milvus 内完成稠密+稀疏混合检索(来源 milvus_hybrid)，
+            其余知识库同 both 分别检索向量与关键词。
         :param milvus_knowledge_info: Milvus 需要使用的知识库以知识库模型配置信息
         :param milvus_fields: Milvus 返回的字段列表。
         :param milvus_expr: Milvus条件过滤式
@@ -94,65 +123,555 @@ class RetrieverService(BaseService):
         :param es_index_names: Elasticsearch 索引名称列表。
         :param es_fields: Elasticsearch 返回的字段列表。
         :param es_query: Elasticsearch 查询内容，可以是字符串或字典。
+        :param es_knowledge_ids: Elasticsearch 过滤知识库ID列表，共享索引模式下同时用于路由。
         :param top_k: 返回的最相似结果数量，默认为 5。
+        :param deduplicate: 是否按 (file_id, chunk_index) 去除 Milvus 与 ES 重复召回的切片，需返回对应字段。
+        :param retrieval_filter: 检索过滤条件，解析后在 Milvus 过滤表达式及 ES bool filter 中执行。
         :return: 检索结果字典。
         """
 
         # 复用客户端
         milvus_client, es_client = cls._get_clients()
 
+        # 过滤条件解析为知识库及文件ID 无可匹配文件时不访问检索后端
+        if retrieval_filter is not None:
+            knowledge_ids = list(dict.fromkeys(
+                [kb.id for kbs in milvus_knowledge_info.values() for kb in kbs] + list(es_knowledge_ids or [])))
+            retrieval_filter = await cls.resolve_filter(retrieval_filter, knowledge_ids)
+            if retrieval_filter is None:
+                return []
+            allowed_ids = set(retrieval_filter.knowledge_ids)
+            milvus_knowledge_info = {
+                model_cfg: [kb for kb in knowledges if kb.id in allowed_ids]
+                for model_cfg, knowledges in milvus_knowledge_info.items()
+                if any(kb.id in allowed_ids for kb in knowledges)
+            }
+            if not milvus_knowledge_info and mode != "es":
+                return []
+            es_knowledge_ids = retrieval_filter.knowledge_ids
+
         # 并行执行
         tasks = []
+        if mode == "hybrid":
+            native_knowledge_info, milvus_knowledge_info = await cls._split_hybrid_knowledge(
+                milvus_client, milvus_knowledge_info)
+            if native_knowledge_info:
+                tasks.append(cls._milvus_search(milvus_client, native_knowledge_info, query, top_k, milvus_fields,
+                                                milvus_expr, milvus_search_params, hybrid=True,
+                                                retrieval_filter=retrieval_filter))
+                # 关键词检索仅覆盖未支持原生混合检索的知识库
+                legacy_knowledges = [kb for kbs in milvus_knowledge_info.values() for kb in kbs]
+                legacy_index_names = {kb.index_name for kb in legacy_knowledges}
+                legacy_ids = {kb.id for kb in legacy_knowledges}
+                es_index_names = [name for name in es_index_names or [] if name in legacy_index_names]
+                if es_knowledge_ids is not None:
+                    es_knowledge_ids = [kb_id for kb_id in es_knowledge_ids if kb_id in legacy_ids]
+                mode = ("both" if es_index_names else "milvus") if milvus_knowledge_info else "hybrid"
+            else:
+                mode = "both"
         # 检索模式：仅使用 Milvus
         if mode in ["milvus", "both"]:
-            tasks.append(cls._milvus_search(milvus_client, milvus_knowledge_info, query, top_k, milvus_fields, milvus_expr, milvus_search_params))
+            tasks.append(cls._milvus_search(milvus_client, milvus_knowledge_info, query, top_k, milvus_fields, milvus_expr, milvus_search_params,
+                                            retrieval_filter=retrieval_filter))
         # 检索模式：仅使用 Elasticsearch
         if mode in ["es", "both"]:
-            tasks.append(cls._es_search(es_client, es_index_names, query, top_k, es_fields, es_query))
+            tasks.append(cls._es_search(es_client, es_index_names, query, top_k, es_fields, es_query,
+                                        es_knowledge_ids, retrieval_filter))
 
-        # 合并结果
+        # 合并结果 检索耗时取决于最慢的后端
         results = []
-        for completed_task in asyncio.as_completed(tasks):
-            results.extend(await completed_task)
+        for task_results in await asyncio.gather(*tasks):
+            results.extend(task_results)
+        if deduplicate:
+            results = cls.deduplicate(results)
 
         # 返回检索结果
         return results
 
     @classmethod
-    async def _milvus_search(cls, milvus_client, milvus_knowledge_info: Dict[ModelAvailableCfgInfo, List[Knowledge]], query, top_k, milvus_fields, milvus_expr, milvus_search_params):
+    async def hybrid_retrieve(
+            cls,
+            query: str,
+            milvus_knowledge_info: Dict[ModelAvailableCfgInfo, List[Knowledge]] = {},
+            milvus_fields: List[str] = None,
+            milvus_expr: str = None,
+            milvus_search_params: Dict = None,
+            es_index_names: Optional[List[str]] = None,
+            es_fields: List[str] = None,
+            es_query: Union[str, Dict] = None,
+            es_knowledge_ids: Optional[List[str]] = None,
+            top_n: int = None,
+            candidate_k: int = None,
+            fusion_method: str = None,
+            retrieval_filter: Optional[RetrievalFilter] = None,
+    ) -> List[RetrieverResult]:
+        """
+        混合检索，Milvus 与 Elasticsearch 各召回 candidate_k 条候选后融合排序，返回 top_n 条结果。
+        含 BM25 稀疏向量字段的集合由 Milvus 原生混合检索召回，不再访问关键词检索后端。
+        融合后同一切片只保留一条，结果的 fusion_score 为融合分数。
+        :param top_n: 融合后返回数量，默认读取配置 retrieval.fusion_top_n。
+        :param candidate_k: 每个检索后端召回的候选数量，默认读取配置 retrieval.fusion_candidate_k。
+        :param fusion_method: 融合方式 rrf | minmax | zscore，默认读取配置 retrieval.fusion_method。
+        其余参数同 retrieve。
+        :return: 融合后的检索结果。
+        """
+        retrieval_settings = settings.retrieval
+        top_n = top_n or retrieval_settings.fusion_top_n
+        candidate_k = max(candidate_k or retrieval_settings.fusion_candidate_k, top_n)
+
+        results = await cls.retrieve(
+            query=query,
+            mode="hybrid",
+            milvus_knowledge_info=milvus_knowledge_info,
+            milvus_fields=milvus_fields,
+            milvus_expr=milvus_expr,
+            milvus_search_params=milvus_search_params,
+            es_index_names=es_index_names,
+            es_fields=es_fields,
+            es_query=es_query,
+            es_knowledge_ids=es_knowledge_ids,
+            top_k=candidate_k,
+            retrieval_filter=retrieval_filter,
+        )
+        ranked_lists: Dict[str, List[RetrieverResult]] = {}
+        for result in results:
+            ranked_lists.setdefault(result.source, []).append(result)
+        return cls.fuse(
+            ranked_lists,
+            method=fusion_method or retrieval_settings.fusion_method,
+            top_n=top_n,
+            metric_type=(milvus_search_params or {}).get("metric_type", "L2"),
+        )
+
+    @classmethod
+    async def cached_retrieve(
+            cls,
+            retrieve_fn,
+            query: str,
+            knowledge_ids: List[str],
+            milvus_knowledge_info: Dict[ModelAvailableCfgInfo, List[Knowledge]],
+            **retrieve_kwargs,
+    ) -> List[RetrieverResult]:
+        """
+        带语义缓存的检索，同一知识库集合下相近查询直接返回缓存结果，不访问 Milvus/ES。
+        :param retrieve_fn: 实际检索方法，如 hybrid_retrieve / rerank_retrieve。
+        :param query: 查询内容。
+        :param knowledge_ids: 检索的知识库ID列表，用于缓存作用域及版本校验。
+        :param milvus_knowledge_info: Milvus 需要使用的知识库以知识库模型配置信息。
+        :param retrieve_kwargs: 透传 retrieve_fn 的其余参数。
+        :return: 检索结果。
+        """
+        if not settings.retrieval.result_cache_enabled or not milvus_knowledge_info:
+            return await retrieve_fn(query=query, milvus_knowledge_info=milvus_knowledge_info, **retrieve_kwargs)
+
+        try:
+            model_cfg = next(iter(milvus_knowledge_info))
+            query_vector = await cls.embed_query(model_cfg, query)
+            versions = await asyncio.to_thread(get_knowledge_versions, knowledge_ids)
+            scope = retrieval_cache.build_scope(
+                knowledge_ids,
+                retrieve_fn=retrieve_fn.__name__,
+                model=[f"{cfg.mark}|{cfg.name}" for cfg in milvus_knowledge_info],
+                **retrieve_kwargs,
+            )
+        except Exception as e:
+            logger_util.error(f"检索结果缓存查询失败: {e}")
+            return await retrieve_fn(query=query, milvus_knowledge_info=milvus_knowledge_info, **retrieve_kwargs)
+
+        cached_results = retrieval_cache.get(scope, query_vector, versions)
+        if cached_results is not None:
+            logger_util.debug(f"检索结果缓存命中: {query}")
+            return cached_results
+
+        results = await retrieve_fn(query=query, milvus_knowledge_info=milvus_knowledge_info, **retrieve_kwargs)
+        # 使用检索前的版本号 检索期间数据变更时条目在下次查询时失效
+        retrieval_cache.put(scope, query_vector, versions, results)
+        return results
+
+    @classmethod
+    async def batch_retrieve(
+            cls,
+            queries: List[str],
+            mode: str = "both",  # 检索模式：'milvus', 'es', 'both'
+            milvus_knowledge_info: Dict[ModelAvailableCfgInfo, List[Knowledge]] = {},
+            milvus_fields: List[str] = None,
+            milvus_expr: str = None,
+            milvus_search_params: Dict = None,
+            es_index_names: Optional[List[str]] = None,
+            es_fields: List[str] = None,
+            es_knowledge_ids: Optional[List[str]] = None,
+            top_k: int = 5,
+            deduplicate: bool = False,
+            retrieval_filter: Optional[RetrievalFilter] = None,
+    ) -> List[List[RetrieverResult]]:
+        """
+        批量检索，适用于评测及预计算等大量查询场景。
+        每个嵌入模型一次批量计算全部查询向量，Milvus 每个集合一次多向量检索，ES 全部查询合并为一次 msearch。
+        :param queries: 查询内容列表。
+        :param mode: 检索模式，可选值为 'milvus'、'es' 或 'both'。
+        其余参数同 retrieve。
+        :return: 与 queries 顺序一致的各查询检索结果。
+        """
+        if not queries:
+            return []
+        milvus_client, es_client = cls._get_clients()
+
+        if retrieval_filter is not None:
+            knowledge_ids = list(dict.fromkeys(
+                [kb.id for kbs in milvus_knowledge_info.values() for kb in kbs] + list(es_knowledge_ids or [])))
+            retrieval_filter = await cls.resolve_filter(retrieval_filter, knowledge_ids)
+            if retrieval_filter is None:
+                return [[] for _ in queries]
+            allowed_ids = set(retrieval_filter.knowledge_ids)
+            milvus_knowledge_info = {
+                model_cfg: [kb for kb in knowledges if kb.id in allowed_ids]
+                for model_cfg, knowledges in milvus_knowledge_info.items()
+                if any(kb.id in allowed_ids for kb in knowledges)
+            }
+            if not milvus_knowledge_info and mode != "es":
+                return [[] for _ in queries]
+            es_knowledge_ids = retrieval_filter.knowledge_ids
+
+        tasks = []
+        if mode in ["milvus", "both"]:
+            tasks.append(cls._batch_milvus_search(milvus_client, milvus_knowledge_info, queries, top_k, milvus_fields,
+                                                  milvus_expr, milvus_search_params, retrieval_filter))
+        if mode in ["es", "both"]:
+            tasks.append(cls._batch_es_search(es_client, es_index_names, queries, top_k, es_fields,
+                                              es_knowledge_ids, retrieval_filter))
+
+        results: List[List[RetrieverResult]] = [[] for _ in queries]
+        for task_results in await asyncio.gather(*tasks):
+            for query_results, backend_results in zip(results, task_results):
+                query_results.extend(backend_results)
+        if deduplicate:
+            results = [cls.deduplicate(query_results) for query_results in results]
+        return results
+
+    @classmethod
+    def fuse(
+            cls,
+            ranked_lists: Dict[str, List[RetrieverResult]],
+            method: str = "rrf",
+            top_n: int = 5,
+            metric_type: str = "L2",
+            weights: Optional[Dict[str, float]] = None,
+    ) -> List[RetrieverResult]:
+        """
+        融合多路召回结果
+            rrf: 倒数排名融合 sum(weight / (rrf_k + rank))，不依赖原始分数尺度
+            minmax: 各路分数归一化到 [0, 1] 后加权求和，未召回记 0
+            zscore: 各路分数标准化后加权求和，未召回记该路最低分
+        :param ranked_lists: 来源 -> 按相关性降序排列的检索结果
+        :param method: 融合方式
+        :param top_n: 返回数量
+        :param metric_type: Milvus 距离度量，L2 距离越小越相关
+        :param weights: 来源权重，默认均为 1
+        :return: 按融合分数降序排列的检索结果
+        """
+        weights = weights or {}
+        rrf_k = settings.retrieval.rrf_k
+        # 来源 -> (切片 -> 归一化分数, 未召回缺省分)
+        source_scores: Dict[str, tuple] = {}
+        representatives: Dict[tuple, RetrieverResult] = {}
+
+        for source, results in ranked_lists.items():
+            if not results:
+                continue
+            if method == "rrf":
+                normalized = 1.0 / (rrf_k + np.arange(1, len(results) + 1))
+                missing_score = 0.0
+            else:
+                raw_scores = np.array([float(result.score) for result in results], dtype=np.float64)
+                # 统一为分数越大越相关
+                if source == "milvus" and metric_type.upper() == "L2":
+                    raw_scores = -raw_scores
+                if method == "minmax":
+                    score_range = raw_scores.max() - raw_scores.min()
+                    normalized = (raw_scores - raw_scores.min()) / score_range if score_range > 0 \
+                        else np.ones_like(raw_scores)
+                    missing_score = 0.0
+                elif method == "zscore":
+                    std = raw_scores.std()
+                    normalized = (raw_scores - raw_scores.mean()) / std if std > 0 else np.zeros_like(raw_scores)
+                    missing_score = float(normalized.min())
+                else:
+                    raise ValueError(f"不支持的融合方式: {method}")
+
+            scores: Dict[tuple, float] = {}
+            for result, score in zip(results, normalized):
+                key = cls._result_key(result)
+                # 同一来源内重复的切片只计排名最高的一次
+                if key in scores:
+                    continue
+                scores[key] = float(score)
+                representative = representatives.setdefault(key, result)
+                # 同一切片优先保留带向量的结果 供上下文装填 MMR 复用
+                if representative.vector is None and result.vector is not None:
+                    representative.vector = result.vector
+            source_scores[source] = (scores, missing_score)
+
+        fused_scores = {
+            key: sum(weights.get(source, 1.0) * scores.get(key, missing_score)
+                     for source, (scores, missing_score) in source_scores.items())
+            for key in representatives
+        }
+
+        fused_results = []
+        for key, score in sorted(fused_scores.items(), key=lambda item: item[1], reverse=True)[:top_n]:
+            result = representatives[key]
+            result.fusion_score = score
+            fused_results.append(result)
+        return fused_results
+
+    @classmethod
+    def _result_key(cls, result: RetrieverResult) -> tuple:
+        """同一切片的唯一标识，缺少 file_id/chunk_index 时退化为来源内文档ID"""
+        file_id = result.metadata.get("file_id")
+        chunk_index = result.metadata.get("chunk_index")
+        if file_id is not None and chunk_index is not None:
+            return file_id, int(chunk_index)
+        return result.source, result.name, result.id
+
+    @classmethod
+    def deduplicate(cls, results: List[RetrieverResult]) -> List[RetrieverResult]:
+        """
+        按 (file_id, chunk_index) 去除重复切片，保留先出现的结果，缺少字段的结果不参与去重。
+        :param results: 检索结果
+        :return: 去重后的检索结果
+        """
+        seen = set()
+        unique_results = []
+        for result in results:
+            file_id = result.metadata.get("file_id")
+            chunk_index = result.metadata.get("chunk_index")
+            if file_id is not None and chunk_index is not None:
+                key = (file_id, int(chunk_index))
+                if key in seen:
+                    continue
+                seen.add(key)
+            unique_results.append(result)
+        return unique_results
+
+    @classmethod
+    async def embed_texts(cls, model_cfg: ModelAvailableCfgInfo, texts: List[str]) -> List[List[float]]:
+        """在线程池中批量计算文本向量"""
+        if not texts:
+            return []
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(
+            cls._embedding_executor,
+            partial(ModelFactory.create_client(config=model_cfg).get_embeddings, inputs=texts)
+        )
+
+    @classmethod
+    async def embed_query(cls, model_cfg: ModelAvailableCfgInfo, query: str) -> List[float]:
+        """
+        获取查询向量，优先读取缓存
+        未命中进程内缓存时在线程池中查询 Redis 缓存或计算，避免本地模型推理阻塞事件循环
+        """
+        query_vector = embedding_cache.get_local(model_cfg, query)
+        if query_vector is not None:
+            return query_vector
+
+        def _compute():
+            return ModelFactory.create_client(config=model_cfg).get_embeddings(inputs=[query])[0]
+
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(
+            cls._embedding_executor,
+            partial(embedding_cache.get_or_compute, model_cfg, query, _compute)
+        )
+
+    @classmethod
+    async def resolve_filter(cls, retrieval_filter: RetrievalFilter,
+                             knowledge_ids: List[str]) -> Optional[RetrievalFilter]:
+        """
+        解析检索过滤条件
+            知识库取本次检索知识库与过滤条件的交集
+            文件ID/文件名/上传时间由 knowledge_file 表解析为文件ID, 并将知识库收窄到文件所在知识库(分区键裁剪)
+        :param retrieval_filter: 检索过滤条件
+        :param knowledge_ids: 本次检索的知识库ID列表
+        :return: 仅含知识库ID/文件ID/页码范围的过滤条件, 无可匹配数据时返回 None
+        """
+        if retrieval_filter.knowledge_ids is not None:
+            allowed_ids = set(retrieval_filter.knowledge_ids)
+            knowledge_ids = [kb_id for kb_id in knowledge_ids if kb_id in allowed_ids] if knowledge_ids \
+                else list(retrieval_filter.knowledge_ids)
+        file_ids = None
+        if retrieval_filter.needs_file_lookup() and knowledge_ids:
+            files = await KnowledgeFileDao.filter_files(
+                knowledge_ids,
+                file_ids=retrieval_filter.file_ids,
+                names=retrieval_filter.titles,
+                created_after=retrieval_filter.uploaded_after,
+                created_before=retrieval_filter.uploaded_before,
+            )
+            file_ids = [file.id for file in files]
+            file_kb_ids = {file.kb_id for file in files}
+            knowledge_ids = [kb_id for kb_id in knowledge_ids if kb_id in file_kb_ids]
+        if not knowledge_ids:
+            return None
+        return RetrievalFilter(knowledge_ids=knowledge_ids, file_ids=file_ids,
+                               page_from=retrieval_filter.page_from, page_to=retrieval_filter.page_to)
+
+    @classmethod
+    async def _split_hybrid_knowledge(cls, milvus_client, milvus_knowledge_info: Dict[ModelAvailableCfgInfo, List[Knowledge]]):
+        """
+        按集合是否包含 BM25 稀疏向量字段拆分知识库
+        :return: (支持原生混合检索的知识库, 其余知识库)，结构同 milvus_knowledge_info
+        """
+        collection_names = {kb.collection_name for kbs in milvus_knowledge_info.values() for kb in kbs}
+        supported = await asyncio.to_thread(
+            lambda: {name for name in collection_names if milvus_client.supports_hybrid_search(name)})
+        native, legacy = {}, {}
+        for model_cfg, knowledges in milvus_knowledge_info.items():
+            for kb in knowledges:
+                target = native if kb.collection_name in supported else legacy
+                target.setdefault(model_cfg, []).append(kb)
+        return native, legacy
+
+    @classmethod
+    async def _collection_exprs(cls, milvus_client, milvus_knowledge_info: Dict[ModelAvailableCfgInfo, List[Knowledge]],
+                                milvus_expr, retrieval_filter: Optional[RetrievalFilter]):
+        """
+        各集合的过滤表达式, 文件及页码范围条件下推至表达式
+        不含 start_page 字段的历史精简集合无法按页码过滤, 由调用方检索后按回填的页码过滤
+        :return: (集合名称 -> 过滤表达式, (页码过滤条件, 需检索后过滤的集合) | None)
+        """
+        collection_names = {kb.collection_name for kbs in milvus_knowledge_info.values() for kb in kbs}
+        if retrieval_filter is None:
+            return {name: milvus_expr for name in collection_names}, None
+        page_collections = set()
+        if retrieval_filter.has_page_range():
+            page_collections = await asyncio.to_thread(
+                lambda: {name for name in collection_names if "start_page" in milvus_client.list_field_names(name)})
+        collection_exprs = {}
+        for name in collection_names:
+            page_pushdown = name in page_collections
+            collection_exprs[name] = milvus_client.merge_expr(milvus_expr, milvus_client.metadata_expr(
+                retrieval_filter.file_ids,
+                retrieval_filter.page_from if page_pushdown else None,
+                retrieval_filter.page_to if page_pushdown else None,
+            ))
+        post_collections = collection_names - page_collections
+        if not retrieval_filter.has_page_range() or not post_collections:
+            return collection_exprs, None
+        page_filter = RetrievalFilter(page_from=retrieval_filter.page_from, page_to=retrieval_filter.page_to)
+        return collection_exprs, (page_filter, post_collections)
+
+    @staticmethod
+    def _group_by_expr(target_collections: Dict[str, List[str]],
+                       collection_exprs: Dict[str, Optional[str]]) -> Dict[Optional[str], Dict[str, List[str]]]:
+        expr_groups: Dict[Optional[str], Dict[str, List[str]]] = {}
+        for collection_name, knowledge_ids in target_collections.items():
+            expr_groups.setdefault(collection_exprs[collection_name], {})[collection_name] = knowledge_ids
+        return expr_groups
+
+    @classmethod
+    async def _filter_pages(cls, results: List[Dict], page_filter: RetrievalFilter) -> List[Dict]:
+        """回填页码后按页码范围过滤检索结果"""
+        await KnowledgeChunkService.hydrate_results(results, ["start_page"])
+        return [result for result in results if page_filter.match(result.get("entity", {}))]
+
+    @classmethod
+    async def _milvus_search(cls, milvus_client, milvus_knowledge_info: Dict[ModelAvailableCfgInfo, List[Knowledge]], query, top_k, milvus_fields, milvus_expr, milvus_search_params, hybrid: bool = False,
+                             retrieval_filter: Optional[RetrievalFilter] = None):
         if not milvus_knowledge_info:
             logger_util.error("未指定 Milvus 所需知识库配置信息")
             raise ValueError("未指定 Milvus 所需知识库配置信息")
 
-        # 获取查询向量
-        # query_vector = model_client.get_embeddings(inputs=[query])[0]
-        # query_vector = model_client.get_embeddings(query).data[0].embedding
+        # 混合检索分数为 RRF 融合得分 越大越相关
+        metric_type = "IP" if hybrid else (milvus_search_params or {}).get("metric_type", "L2")
 
-        # 在 Milvus 中进行向量检索
-        try:
-            all_milvus_results = []
-            for key, value in milvus_knowledge_info.items():
-                # key 为 模型配置
-                # value 为 知识库信息
-                query_vector = ModelFactory().create_client(config=key).get_embeddings(inputs=[query])[0]
-                target_collections = [kb.collection_name for kb in value]
-
-                current_milvus_results = milvus_client.similarity_search(
+        collection_exprs, post_page_filter = await cls._collection_exprs(
+            milvus_client, milvus_knowledge_info, milvus_expr, retrieval_filter)
+
+        async def _search_group(query_vector, target_collections: Dict[str, List[str]]):
+            # 过滤表达式相同的集合合并检索
+            expr_groups = cls._group_by_expr(target_collections, collection_exprs)
+            return milvus_client.merge_top_k(await asyncio.gather(*[
+                _search_expr_group(query_vector, collections, expr) for expr, collections in expr_groups.items()
+            ]), top_k, metric_type)
+
+        async def _search_expr_group(query_vector, target_collections: Dict[str, List[str]], expr):
+            results = await _search_collections(query_vector, target_collections, expr)
+            if post_page_filter is not None and set(target_collections) <= post_page_filter[1]:
+                results = await cls._filter_pages(results, post_page_filter[0])
+            return results
+
+        async def _search_collections(query_vector, target_collections: Dict[str, List[str]], expr):
+            if hybrid:
+                return await milvus_client.async_hybrid_search(
                     query_vector=query_vector,
-                    collection_names=target_collections,
+                    query_text=query,
+                    collection_names=list(target_collections),
+                    knowledge_ids=target_collections,
                     top_k=top_k,
                     output_fields=milvus_fields,
-                    expr=milvus_expr,
+                    expr=expr,
                     search_params=milvus_search_params
                 )  # List[Dict]
-                all_milvus_results.extend(current_milvus_results)
+            return await milvus_client.async_similarity_search(
+                query_vector=query_vector,
+                collection_names=list(target_collections),
+                knowledge_ids=target_collections,
+                top_k=top_k,
+                output_fields=milvus_fields,
+                expr=expr,
+                search_params=milvus_search_params
+            )  # List[Dict]
+
+        async def _search_by_model(model_cfg: ModelAvailableCfgInfo, knowledges: List[Knowledge]):
+            # model_cfg 为 模型配置
+            # knowledges 为 知识库信息
+            query_vector = await cls.embed_query(model_cfg, query)
+            # 集合名称 -> 知识库ID 共享集合模式下多个知识库对应同一集合
+            target_collections: Dict[str, List[str]] = {}
+            # 配置降维投影的集合使用各自投影后的查询向量单独检索
+            projected_knowledges: Dict[str, Knowledge] = {}
+            for kb in knowledges:
+                if kb.projection_dim:
+                    projected_knowledges.setdefault(kb.collection_name, kb)
+                else:
+                    target_collections.setdefault(kb.collection_name, []).append(kb.id)
+
+            async def _search_projected(kb: Knowledge):
+                # 首次使用时从 MinIO 加载投影
+                projected_vector = await asyncio.to_thread(project_for_query, kb, kb.collection_name, query_vector)
+                if projected_vector is None:
+                    # 投影尚未拟合 集合中无数据
+                    return []
+                return await _search_group(projected_vector, {kb.collection_name: [kb.id]})
+
+            searches = [_search_projected(kb) for kb in projected_knowledges.values()]
+            if target_collections:
+                searches.append(_search_group(query_vector, target_collections))
+            return milvus_client.merge_top_k(await asyncio.gather(*searches), top_k, metric_type)
+
+        # 在 Milvus 中进行向量检索 不同嵌入模型配置并发检索
+        try:
+            all_milvus_results = milvus_client.merge_top_k(
+                await asyncio.gather(*[_search_by_model(key, value) for key, value in milvus_knowledge_info.items()]),
+                top_k,
+                metric_type
+            )
+            # 精简集合的结果仅含过滤键 最终 top_k 一次批量回填切片内容
+            try:
+                await KnowledgeChunkService.hydrate_results(all_milvus_results, milvus_fields)
+            except Exception as e:
+                logger_util.error(f"切片内容回填失败: {e}")
             # 转换 milvus_results 为统一检索数据结构
-            return [cls._convert_milvus_result_to_retriever_result(milvus_result) for milvus_result in all_milvus_results]
+            source = "milvus_hybrid" if hybrid else "milvus"
+            return [cls._convert_milvus_result_to_retriever_result(milvus_result, source)
+                    for milvus_result in all_milvus_results]
         except Exception as e:
             logger_util.error(f"Milvus 检索失败: {e}")
+            return []
 
     @classmethod
-    async def _es_search(cls, es_client, es_index_names, query, top_k, es_fields, es_query):
+    async def _es_search(cls, es_client, es_index_names, query, top_k, es_fields, es_query, es_knowledge_ids=None,
+                         retrieval_filter: Optional[RetrievalFilter] = None):
         if not es_index_names:
             logger_util.error("未指定 Elasticsearch 索引名称")
             raise ValueError("未指定 Elasticsearch 索引名称")
@@ -162,20 +681,171 @@ class RetrieverService(BaseService):
             es_query = query  # 默认使用简单字符串查询
 
         try:
-            es_results = es_client.search_documents(
+            es_results = await es_client.async_search_documents(
                 index_names=es_index_names,
                 query=es_query,
                 size=top_k,
                 fields=es_fields,
+                knowledge_ids=es_knowledge_ids,
+                retrieval_filter=retrieval_filter,
             )  # List[Dict]
             # 转换 es_results 为统一检索数据结构
             return [cls._convert_es_result_to_retriever_result(es_result) for es_result in es_results]
         except Exception as e:
             logger_util.error(f"Elasticsearch 检索失败: {e}")
+            return []
+
+    @classmethod
+    async def _batch_milvus_search(cls, milvus_client, milvus_knowledge_info: Dict[ModelAvailableCfgInfo, List[Knowledge]],
+                                   queries: List[str], top_k, milvus_fields, milvus_expr, milvus_search_params,
+                                   retrieval_filter: Optional[RetrievalFilter] = None) -> List[List[RetrieverResult]]:
+        if not milvus_knowledge_info:
+            logger_util.error("未指定 Milvus 所需知识库配置信息")
+            raise ValueError("未指定 Milvus 所需知识库配置信息")
+
+        metric_type = (milvus_search_params or {}).get("metric_type", "L2")
+        collection_exprs, post_page_filter = await cls._collection_exprs(
+            milvus_client, milvus_knowledge_info, milvus_expr, retrieval_filter)
+
+        async def _search_group(query_vectors, target_collections: Dict[str, List[str]]):
+            expr_groups = cls._group_by_expr(target_collections, collection_exprs)
+            group_results = []
+            for expr, collections in expr_groups.items():
+                group_results.append(milvus_client.async_batch_similarity_search(
+                    query_vectors=query_vectors,
+                    collection_names=list(collections),
+                    knowledge_ids=collections,
+                    top_k=top_k,
+                    output_fields=milvus_fields,
+                    expr=expr,
+                    search_params=milvus_search_params
+                ))
+            group_results = await asyncio.gather(*group_results)
+            if post_page_filter is not None:
+                for expr_index, collections in enumerate(expr_groups.values()):
+                    if set(collections) <= post_page_filter[1]:
+                        group_results[expr_index] = [await cls._filter_pages(results, post_page_filter[0])
+                                                     for results in group_results[expr_index]]
+            return group_results
+
+        async def _search_by_model(model_cfg: ModelAvailableCfgInfo, knowledges: List[Knowledge]):
+            # 一次批量计算全部查询向量
+            query_vectors = await cls.embed_texts(model_cfg, queries)
+            target_collections: Dict[str, List[str]] = {}
+            projected_knowledges: Dict[str, Knowledge] = {}
+            for kb in knowledges:
+                if kb.projection_dim:
+                    projected_knowledges.setdefault(kb.collection_name, kb)
+                else:
+                    target_collections.setdefault(kb.collection_name, []).append(kb.id)
+
+            async def _search_projected(kb: Knowledge):
+                projected_vectors = await asyncio.to_thread(
+                    lambda: [project_for_query(kb, kb.collection_name, vector) for vector in query_vectors])
+                if projected_vectors[0] is None:
+                    # 投影尚未拟合 集合中无数据
+                    return []
+                return await _search_group(projected_vectors, {kb.collection_name: [kb.id]})
+
+            searches = [_search_projected(kb) for kb in projected_knowledges.values()]
+            if target_collections:
+                searches.append(_search_group(query_vectors, target_collections))
+            # 各检索组的结果均为按查询顺序排列的列表
+            result_lists = [group for groups in await asyncio.gather(*searches) for group in groups]
+            return [milvus_client.merge_top_k([group[i] for group in result_lists], top_k, metric_type)
+                    for i in range(len(queries))]
+
+        try:
+            model_results = await asyncio.gather(*[_search_by_model(key, value)
+                                                   for key, value in milvus_knowledge_info.items()])
+            all_milvus_results = [
+                milvus_client.merge_top_k([results[i] for results in model_results], top_k, metric_type)
+                for i in range(len(queries))
+            ]
+            # 全部查询的结果一次批量回填切片内容
+            try:
+                await KnowledgeChunkService.hydrate_results(
+                    [result for results in all_milvus_results for result in results], milvus_fields)
+            except Exception as e:
+                logger_util.error(f"切片内容回填失败: {e}")
+            return [[cls._convert_milvus_result_to_retriever_result(milvus_result) for milvus_result in results]
+                    for results in all_milvus_results]
+        except Exception as e:
+            logger_util.error(f"Milvus 批量检索失败: {e}")
+            return [[] for _ in queries]
+
+    @classmethod
+    async def _batch_es_search(cls, es_client, es_index_names, queries: List[str], top_k, es_fields,
+                               es_knowledge_ids=None,
+                               retrieval_filter: Optional[RetrievalFilter] = None) -> List[List[RetrieverResult]]:
+        if not es_index_names:
+            logger_util.error("未指定 Elasticsearch 索引名称")
+            raise ValueError("未指定 Elasticsearch 索引名称")
+
+        try:
+            es_results = await es_client.async_msearch_documents(
+                index_names=es_index_names,
+                queries=queries,
+                size=top_k,
+                fields=es_fields,
+                knowledge_ids=es_knowledge_ids,
+                retrieval_filter=retrieval_filter,
+            )  # List[List[Dict]]
+            return [[cls._convert_es_result_to_retriever_result(es_result) for es_result in results]
+                    for results in es_results]
+        except Exception as e:
+            logger_util.error(f"Elasticsearch 批量检索失败: {e}")
+            return [[] for _ in queries]
+
     @classmethod
-    async def rerank_retrieve(cls):
-        # TODO 检索重排序
-        pass
+    async def rerank_retrieve(
+            cls,
+            query: str,
+            top_n: int = None,
+            candidate_pool: int = None,
+            latency_budget_ms: int = None,
+            **hybrid_kwargs,
+    ) -> List[RetrieverResult]:
+        """
+        检索重排序，混合检索召回较大的候选池后由本地交叉编码器打分，返回 top_n 条结果。
+        超出时间预算未打分的候选按融合顺序排在已打分候选之后，重排序失败时退化为融合结果。
+        :param query: 查询内容。
+        :param top_n: 重排序后返回数量，默认读取配置 retrieval.rerank_top_n。
+        :param candidate_pool: 参与重排序的候选数量，默认读取配置 retrieval.rerank_candidate_pool。
+        :param latency_budget_ms: 重排序时间预算(毫秒)，默认读取配置 retrieval.rerank_latency_budget_ms。
+        :param hybrid_kwargs: 透传 hybrid_retrieve 的检索参数。
+        :return: 重排序后的检索结果。
+        """
+        retrieval_settings = settings.retrieval
+        top_n = top_n or retrieval_settings.rerank_top_n
+        candidate_pool = max(candidate_pool or retrieval_settings.rerank_candidate_pool, top_n)
+        latency_budget_ms = latency_budget_ms or retrieval_settings.rerank_latency_budget_ms
+
+        candidates = await cls.hybrid_retrieve(query=query, top_n=candidate_pool,
+                                               candidate_k=candidate_pool, **hybrid_kwargs)
+        if len(candidates) <= 1:
+            return candidates[:top_n]
+
+        try:
+            deadline = time.monotonic() + latency_budget_ms / 1000
+            loop = asyncio.get_running_loop()
+            # 模型按需加载 同样放在线程池中执行
+            scores = await loop.run_in_executor(
+                cls._rerank_executor,
+                lambda: get_local_rerank_manager().score(
+                    query, [candidate.text or "" for candidate in candidates],
+                    batch_size=retrieval_settings.rerank_batch_size, deadline=deadline)
+            )
+        except Exception as e:
+            logger_util.error(f"重排序失败, 使用融合结果: {e}")
+            return candidates[:top_n]
+
+        for candidate, score in zip(candidates, scores):
+            candidate.rerank_score = score
+        # 已打分候选按分数降序 未打分候选保持融合顺序
+        order = sorted(range(len(candidates)),
+                       key=lambda i: (scores[i] is None, -(scores[i] or 0.0), i))
+        return [candidates[i] for i in order[:top_n]]
 
 
 async def main():
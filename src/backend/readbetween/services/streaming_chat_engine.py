@@ -1,6 +1,7 @@
 import asyncio
 import copy
 import json
+from collections import Counter
 from datetime import datetime
 from typing import Generator, List, Dict, Optional
 
@@ -8,18 +9,20 @@ from fastapi import HTTPException
 from mcp.types import CallToolResult
 from openai.types.chat import ChatCompletionMessageToolCallUnion
 
+from readbetween.config import settings
 from readbetween.models.dao import Conversation
 from readbetween.models.dao.conversation import ConversationDao
 from readbetween.models.dao.messages import MessageDao
 from readbetween.models.schemas.source import SourceMsg
 from readbetween.models.schemas.sse_response import StreamResponseTemplate
 from readbetween.models.v1.chat import ChatMessageSendPlus, ConversationInfo
-from readbetween.models.v1.knowledge import KnowledgeInfo
+from readbetween.models.v1.retrieval import RetrievalFilter
 from readbetween.services.conversation_knowledge_link import ConversationKnowledgeLinkService
 from readbetween.services.knowledge import KnowledgeService
 from readbetween.services.prompt import DEFAULT_PROMPT, KB_RECALL_PROMPT, WEB_SEARCH_PROMPT, MEMORY_PROMPT, \
     WEB_LINK_PROMPT, WEB_LINK_ERROR_PROMPT
 from readbetween.services.retriever import RetrieverService
+from readbetween.utils import context_packer
 from readbetween.utils.function_calling_manager import function_calling_manager
 from readbetween.utils.logger_util import logger_util
 from readbetween.utils.mcp_client import MCPClient, mcp_client_manager
@@ -28,7 +31,7 @@ from readbetween.utils.minio_util import MinioUtil
 from readbetween.utils.model_factory import ModelFactory
 from readbetween.utils.thread_pool_executor_util import ThreadPoolExecutorUtil
 from readbetween.utils.tools import WebSearchTool, BaseTool
-from readbetween.services.constant import SourceMsgType
+from readbetween.services.constant import SourceMsgType, MILVUS_EMBEDDING_FIELD_NAME
 from readbetween.services.tasks import celery_add_memory
 
 minio_client = MinioUtil()
@@ -155,7 +158,8 @@ class StreamingChatEngine:
             conversation_info.conversation.id
         )
         if knowledge_bases:
-            recall_chunk, kb_sources = await cls._append_kb_recall_msg(knowledge_bases, query)
+            recall_chunk, kb_sources = await cls._append_kb_recall_msg(
+                knowledge_bases, query, conversation_info.model_cfg.name, message_data.retrieval_filter)
             task_results['kb_recall'] = (recall_chunk, kb_sources)
             if kb_sources:
                 source_collector.extend(kb_sources)
@@ -163,19 +167,19 @@ class StreamingChatEngine:
         # 网络搜索
         if hasattr(message_data, 'search') and message_data.search:
             task_results['web_search'] = thread_pool.submit_task(
-                cls._append_web_search_msg, query
+                cls._append_web_search_msg, query, conversation_info.model_cfg.name
             )
 
         # 记忆召回
         if conversation_info.conversation.use_memory == 1:
             task_results['memory_recall'] = thread_pool.submit_task(
-                cls._append_memory_msg, query, message_data.conv_id, 3
+                cls._append_memory_msg, query, message_data.conv_id, 3, conversation_info.model_cfg.name
             )
 
         # 网页直链处理
         urls, url_cnt = BaseTool.extract_urls(query)
         if url_cnt > 0:
-            task_results['webpage_text'] = await cls._append_webpage_text(urls)
+            task_results['webpage_text'] = await cls._append_webpage_text(urls, conversation_info.model_cfg.name)
 
         # 等待所有任务完成
         thread_pool.wait_for_all()
@@ -357,6 +361,14 @@ class StreamingChatEngine:
         # 开始流式响应
         yield StreamResponseTemplate.start_event()
 
+        # 检索来源在调用模型前已确定, 可提前推送
+        sources_emitted = False
+        if settings.retrieval.early_source_event and not is_recursion and source_msg_list:
+            sources_emitted = True
+            yield StreamResponseTemplate.source_event(
+                sources=[source_msg.to_dict() for source_msg in list(set(source_msg_list))]
+            )
+
         try:
             response = await client.generate_text(
                 messages=messages,
@@ -384,7 +396,7 @@ class StreamingChatEngine:
 
             # 保存助手响应并返回最终结果
             async for final_response in cls._finalize_chat_response(
-                    full_response, source_msg_list, message_data, user_msg_id, is_recursion
+                    full_response, source_msg_list, message_data, user_msg_id, is_recursion, sources_emitted
             ):
                 yield final_response
 
@@ -479,9 +491,13 @@ class StreamingChatEngine:
             source_msg_list: List[SourceMsg],
             message_data: ChatMessageSendPlus,
             user_msg_id: str,
-            is_recursion: bool
+            is_recursion: bool,
+            sources_emitted: bool = False
     ) -> Generator:
-        """完成聊天响应处理"""
+        """
+        完成聊天响应处理
+        :param sources_emitted: 来源是否已在调用模型前推送, 已推送则不再重复推送
+        """
         assistant_content = "".join(full_response)
 
         # 保存助手响应
@@ -495,7 +511,7 @@ class StreamingChatEngine:
             )
 
         # 返回来源信息（仅非递归调用）
-        if not is_recursion and source_msg_list:
+        if not is_recursion and source_msg_list and not sources_emitted:
             yield StreamResponseTemplate.source_event(
                 sources=[source_msg.to_dict() for source_msg in list(set(source_msg_list))]
             )
@@ -747,48 +763,92 @@ class StreamingChatEngine:
 
     # 以下是原有的辅助方法，保持不变
     @classmethod
-    async def _append_kb_recall_msg(cls, knowledge_bases: List, query: str):
+    async def _append_kb_recall_msg(cls, knowledge_bases: List, query: str, model_name: str = None,
+                                    retrieval_filter: Optional[RetrievalFilter] = None):
         """知识库召回消息处理"""
         recall_chunk = ""
         source_list: List[SourceMsg] = []
         if knowledge_bases:
             # 收集知识库及知识库所用模型信息
             milvus_knowledge_info: Dict = {}
-            for knowledge in knowledge_bases:
-                knowledge_info: KnowledgeInfo = await KnowledgeService.get_knowledge_info(knowledge.id)
+            # 一次批量获取全部知识库及模型配置
+            knowledge_infos = await KnowledgeService.get_knowledge_infos(
+                [knowledge.id for knowledge in knowledge_bases])
+            for knowledge_info in knowledge_infos.values():
                 model_cfg = knowledge_info.model_cfg
                 knowledge_obj = knowledge_info.knowledge
                 if model_cfg not in milvus_knowledge_info:
                     milvus_knowledge_info[model_cfg] = []
                 milvus_knowledge_info[model_cfg].append(knowledge_obj)
 
-            retrieve_resp = await RetrieverService.retrieve(
+            # Milvus 与 ES 召回结果融合排序 开启重排序时由交叉编码器从候选池中选出最相关的切片
+            retrieve = RetrieverService.rerank_retrieve if settings.retrieval.rerank_enabled \
+                else RetrieverService.hybrid_retrieve
+            # 相近问题命中语义缓存时不再访问 Milvus/ES
+            retrieve_resp = await RetrieverService.cached_retrieve(
+                retrieve,
                 query=query,
-                mode="both",
+                knowledge_ids=[knowledge_base.id for knowledge_base in knowledge_bases],
                 milvus_knowledge_info=milvus_knowledge_info,
-                milvus_fields=['text', 'title', 'source'],
+                # 返回切片向量供 MMR 复用 无需重新向量化
+                milvus_fields=['text', 'title', 'source', 'file_id', 'chunk_index', 'knowledge_id',
+                               MILVUS_EMBEDDING_FIELD_NAME],
                 es_index_names=[
                     knowledge_base.index_name
                     for knowledge_base in knowledge_bases
                 ],
-                es_fields=['text', 'metadata.title', 'metadata.source'],
-                top_k=3
+                es_fields=['text', 'metadata.title', 'metadata.source', 'metadata.file_id', 'metadata.chunk_index'],
+                es_knowledge_ids=[knowledge_base.id for knowledge_base in knowledge_bases],
+                retrieval_filter=retrieval_filter,
             )
-            for retrieve_result in retrieve_resp:
+            # 按 token 预算装填 MMR 去除内容相近的切片
+            recall_texts = [
+                f"Title: {retrieve_result.metadata['title']}\nContent: {retrieve_result.text}\n\n"
+                for retrieve_result in retrieve_resp
+            ]
+            query_vector, candidate_vectors = None, None
+            # 复用 Milvus 返回的切片向量 仅与查询向量同一空间(同一嵌入模型且未降维)的切片参与 MMR
+            # 无向量的切片(仅 ES 召回/量化存储/降维投影)保持相关性顺序
+            kb_model_cfgs = {knowledge.id: model_cfg for model_cfg, knowledges in milvus_knowledge_info.items()
+                             for knowledge in knowledges if not knowledge.projection_dim}
+            hit_model_cfgs = [kb_model_cfgs.get(retrieve_result.metadata.get("knowledge_id"))
+                              if retrieve_result.vector is not None else None for retrieve_result in retrieve_resp]
+            model_cfg_counts = Counter(model_cfg for model_cfg in hit_model_cfgs if model_cfg is not None)
+            if model_cfg_counts and model_cfg_counts.most_common(1)[0][1] > 1:
+                pack_model_cfg = model_cfg_counts.most_common(1)[0][0]
+                try:
+                    # 检索时已计算 命中查询向量缓存
+                    query_vector = await RetrieverService.embed_query(pack_model_cfg, query)
+                    candidate_vectors = [
+                        retrieve_result.vector
+                        if model_cfg == pack_model_cfg and len(retrieve_result.vector) == len(query_vector) else None
+                        for retrieve_result, model_cfg in zip(retrieve_resp, hit_model_cfgs)
+                    ]
+                except Exception as e:
+                    logger_util.error(f"知识库召回查询向量计算失败, 按相关性顺序装填: {e}")
+            selected_indexes = context_packer.pack(
+                recall_texts,
+                settings.retrieval.context_kb_tokens,
+                model_name=model_name,
+                query_vector=query_vector,
+                candidate_vectors=candidate_vectors,
+                lambda_mult=settings.retrieval.context_mmr_lambda,
+            )
+            for index in selected_indexes:
+                retrieve_result = retrieve_resp[index]
                 minio_object_name = retrieve_result.metadata['source']
-                minio_file_url = minio_client.get_presigned_url(object_name=minio_object_name)
+                # 同一文件的多个切片复用预签名链接
+                minio_file_url = minio_client.get_cached_presigned_url(object_name=minio_object_name)
                 source_list.append(SourceMsg(
                     source=SourceMsgType.KB.value,
                     title=retrieve_result.metadata['title'],
                     url=minio_file_url
                 ))
 
-                if retrieve_result.source == 'milvus' and float(retrieve_result.score) < 0.9:
-                    recall_chunk += f"Title: {retrieve_result.metadata['title']}\nContent: {retrieve_result.text}\n\n"
-                    logger_util.debug(f"Milvus Score: {float(retrieve_result.score)}")
-                if retrieve_result.source == 'es' and float(retrieve_result.score) > 4.5:
-                    recall_chunk += f"Title: {retrieve_result.metadata['title']}\nContent: {retrieve_result.text}\n\n"
-                    logger_util.debug(f"ES Score: {float(retrieve_result.score)}")
+                recall_chunk += recall_texts[index]
+                logger_util.debug(f"{retrieve_result.source} Score: {retrieve_result.score} "
+                                  f"Fusion Score: {retrieve_result.fusion_score} "
+                                  f"Rerank Score: {retrieve_result.rerank_score}")
 
         if recall_chunk:
             kb_recall_prompt = KB_RECALL_PROMPT.format(kb_recall_content=recall_chunk.strip())
@@ -797,7 +857,7 @@ class StreamingChatEngine:
             return "", None
 
     @classmethod
-    def _append_web_search_msg(cls, query: str):
+    def _append_web_search_msg(cls, query: str, model_name: str = None):
         """网络搜索消息处理"""
         search_tool = WebSearchTool()
         web_search_info = ""
@@ -807,12 +867,19 @@ class StreamingChatEngine:
         now_query = f"{now}{query}"
         search_results = search_tool.search_baidu(query, size=10, lm=3)
 
+        search_items, search_texts = [], []
         for search_item in search_results:
             search_content = search_tool.get_page_detail(search_item.url)
             if search_content is not None:
-                source_list.append(
-                    SourceMsg(source=SourceMsgType.WEB.value, title=search_item.name, url=search_item.url))
-                web_search_info += f"Title: {search_item.name}\nContent: {search_content}\n\n"
+                search_items.append(search_item)
+                search_texts.append(f"Title: {search_item.name}\nContent: {search_content}\n\n")
+
+        # 按搜索排名在 token 预算内装填
+        for index in context_packer.pack(search_texts, settings.retrieval.context_web_tokens, model_name=model_name):
+            search_item = search_items[index]
+            source_list.append(
+                SourceMsg(source=SourceMsgType.WEB.value, title=search_item.name, url=search_item.url))
+            web_search_info += search_texts[index]
 
         if web_search_info:
             web_search_prompt = WEB_SEARCH_PROMPT.format(web_search_content=web_search_info)
@@ -821,7 +888,7 @@ class StreamingChatEngine:
             return "", None
 
     @classmethod
-    def _append_memory_msg(cls, query: str, user_id, limit: int = 3):
+    def _append_memory_msg(cls, query: str, user_id, limit: int = 3, model_name: str = None):
         """记忆召回消息处理"""
         from readbetween.services.constant import memory_config
         memory_tool = MemoryUtil(memory_config)
@@ -838,11 +905,13 @@ class StreamingChatEngine:
         if len(graph_entities) == 0 and len(original_memories) == 0:
             return ""
         else:
+            memory_str = context_packer.truncate_to_tokens(memory_str, settings.retrieval.context_memory_tokens,
+                                                           model_name=model_name)
             memory_prompt = MEMORY_PROMPT.format(memory_recall_content=memory_str)
             return memory_prompt
 
     @classmethod
-    async def _append_webpage_text(cls, urls: List[str]):
+    async def _append_webpage_text(cls, urls: List[str], model_name: str = None):
         """网页直链文本处理"""
         fetch_tasks = []
         for url in urls:
@@ -851,9 +920,12 @@ class StreamingChatEngine:
 
         fetched_contents = await asyncio.gather(*fetch_tasks, return_exceptions=True)
         successful_contents = []
+        # 网页直链平分 token 预算
+        per_link_tokens = settings.retrieval.context_webpage_tokens // max(len(urls), 1)
 
         for url, content in zip(urls, fetched_contents):
-            if content is not None and content != '':
+            if isinstance(content, str) and content != '':
+                content = context_packer.truncate_to_tokens(content, per_link_tokens, model_name=model_name)
                 successful_contents.append(WEB_LINK_PROMPT.format(web_link=url, web_link_content=content))
             else:
                 successful_contents.append(WEB_LINK_ERROR_PROMPT.format(web_link=url))
@@ -1,4 +1,5 @@
 import json
+import uuid
 from typing import List
 
 from readbetween.models.dao import *  # 确保执行任务时已加载全部DAO
@@ -7,17 +8,28 @@ from readbetween.models.dao.knowledge_file import KnowledgeFile
 from readbetween.models.schemas.es.save_document import SaveDocument
 from readbetween.models.v1.knowledge_file import KnowledgeFileVectorizeTasks
 from readbetween.models.v1.model_available_cfg import ModelAvailableCfgInfo
-from readbetween.utils.elasticsearch_util import ElasticSearchUtil
+from readbetween.utils.keyword_store import get_keyword_store
 from readbetween.utils.file_splitter import UnifiedFileSplitter
 from readbetween.utils.memory_util import MemoryUtil
-from readbetween.utils.milvus_util import MilvusUtil
+from readbetween.utils.vector_store import VectorStore, get_vector_store
 from readbetween.utils.minio_util import MinioUtil
 from readbetween.utils.model_factory import ModelFactory
 from readbetween.utils.tools import PdfExtractTool
 from readbetween.services.constant import (MILVUS_DEFAULT_FIELDS_768,  # 默认字段
-                                           MILVUS_DEFAULT_INDEX_PARAMS, MILVUS_DEFAULT_FIELDS_1024  # 默认索引配置
+                                           MILVUS_DEFAULT_INDEX_PARAMS,  # 默认索引配置
+                                           MILVUS_EMBEDDING_FIELD_NAME
                                            )
 from readbetween.services.knowledge_file import KnowledgeFileService
+from readbetween.services.knowledge import KnowledgeService
+from readbetween.services.knowledge_chunk import KnowledgeChunkService
+from readbetween.services.constant import PrefixRedisKnowledge, ES_SHARED_INDEX_NAME, MILVUS_SHARED_COLLECTION_NAME, \
+    VECTOR_STORAGE_FLOAT, VECTOR_STORAGE_SQ8, MILVUS_COLLECTION_NAME_PREFIX, PrefixRedisIndexRebuildLock, \
+    PrefixRedisKeywordWriteLock
+from readbetween.models.dao.knowledge import KnowledgeDao
+from readbetween.models.dao.knowledge_file import KnowledgeFileDao
+from readbetween.utils.redis_util import RedisUtil
+from readbetween.utils.retrieval_cache import bump_knowledge_version
+from readbetween.utils.projection import project_for_ingest, projection_store
 from celery.utils.log import get_task_logger
 from langchain.docstore.document import Document
 
@@ -58,9 +70,9 @@ def celery_embed_document(self, task_json):
         # 实例化minio_client
         minio_client = MinioUtil()
         # 实例化milvus
-        milvus_client = MilvusUtil()
+        milvus_client = get_vector_store()
         # 实例化es
-        es_client = ElasticSearchUtil()
+        es_client = get_keyword_store()
         # 获取默认模型配置客户端
         embed_config = ModelAvailableCfgInfo.parse_obj(knowledge_file_vectorize_task.embedding_cfg_info)
         embed_client = ModelFactory.create_client(config=embed_config)
@@ -70,8 +82,6 @@ def celery_embed_document(self, task_json):
         return  # 如果实例化失败，直接返回
 
     target_kb_id = knowledge_file_vectorize_task.target_kb_id  # target_knowledge_id
-    target_collection_name = knowledge_file_vectorize_task.collection_name  # milvus_collection_name
-    target_index_name = knowledge_file_vectorize_task.index_name  # es_index_name
     enable_layout_flag = knowledge_file_vectorize_task.enable_layout  # 是否开启布局识别
     for file_info in knowledge_file_vectorize_task.file_info_list:
         file_save_path = file_info["file_save_path"]
@@ -120,54 +130,77 @@ def celery_embed_document(self, task_json):
                     bbox | start_page[chunk片段最小页码] | source | title | chunk_index[分片索引] | extra | file_id | knowledge_id
                 - text
             """
-            for chunk in all_chunks:
-                save_document = SaveDocument()
-
-                save_document.index_name = target_index_name  # ***设置索引名称
-                # chunk
-                save_document.text = chunk.page_content or ""
-                save_document.metadata.bbox = json.dumps(chunk.metadata.get("chunk_bboxes", ""))
-                save_document.metadata.start_page = chunk.metadata.get("page", 0)
-                save_document.metadata.source = file_object_name
-                save_document.metadata.title = file_name
-                save_document.metadata.chunk_index = chunk.metadata.get("chunk_id", 0)
-                save_document.metadata.extra = ""
-                save_document.metadata.file_id = file_id
-                save_document.metadata.knowledge_id = target_kb_id
-
-                # 创建索引
-                es_client.save_document(save_document)
+            # 以数据库中知识库的最新索引为准 写入期间持有写入锁 与共享索引迁移切换互斥
+            with _keyword_write_lock(target_kb_id):
+                target_index_name = _resolve_keyword_index(knowledge_file_vectorize_task,
+                                                           KnowledgeDao.select_one(target_kb_id))
+                # 历史知识库索引未预先创建时 使用显式映射创建
+                es_client.create_index(target_index_name)
+                for chunk in all_chunks:
+                    save_document = SaveDocument()
+
+                    save_document.index_name = target_index_name  # ***设置索引名称
+                    # chunk
+                    save_document.text = chunk.page_content or ""
+                    save_document.metadata.bbox = json.dumps(chunk.metadata.get("chunk_bboxes", ""))
+                    save_document.metadata.start_page = chunk.metadata.get("page", 0)
+                    save_document.metadata.source = file_object_name
+                    save_document.metadata.title = file_name
+                    save_document.metadata.chunk_index = chunk.metadata.get("chunk_id", 0)
+                    save_document.metadata.extra = ""
+                    save_document.metadata.file_id = file_id
+                    save_document.metadata.knowledge_id = target_kb_id
+
+                    # 创建索引 共享索引按知识库路由
+                    es_client.save_document(save_document,
+                                            routing=target_kb_id if target_index_name == ES_SHARED_INDEX_NAME else None)
             logger_util.info(f"========》{file_name}: ES插入完成 《========")
             """
             插入Milvus
             bbox | start_page[chunk片段最小页码] | source | title | chunk_index[分片索引] | extra | file_id | knowledge_id | text | vector | pk[auto_id]
             """
-            if not milvus_client.check_collection_exists(target_collection_name):
-                logger_util.info(f"新建集合{target_index_name}")
-                milvus_client.create_collection(target_collection_name, MILVUS_DEFAULT_FIELDS_1024)
-                logger_util.info(f"完成集合{target_index_name}新建")
-            # milvus 插入数据
-            insert_data = []
-            for chunk in all_chunks:
-                chunk_vector = embed_client.get_embeddings(inputs=[chunk.page_content or ""])[0]
-
-                data = {
-                    "bbox": json.dumps(chunk.metadata.get("chunk_bboxes", "")),
-                    "start_page": chunk.metadata.get("page", 0),
-                    "source": file_object_name,
-                    "title": file_name,
-                    "chunk_index": chunk.metadata.get("chunk_id", 0),
-                    "extra": "",
-                    "file_id": file_id,
-                    "knowledge_id": target_kb_id,
-                    # title + chunk
-                    "text": file_name + ":" + (chunk.page_content or ""),
+            chunk_rows = [{
+                "bbox": json.dumps(chunk.metadata.get("chunk_bboxes", "")),
+                "start_page": chunk.metadata.get("page", 0),
+                "source": file_object_name,
+                "title": file_name,
+                "chunk_index": chunk.metadata.get("chunk_id", 0),
+                "extra": "",
+                "file_id": file_id,
+                "knowledge_id": target_kb_id,
+                # title + chunk
+                "text": file_name + ":" + (chunk.page_content or ""),
+            } for chunk in all_chunks]
+            # 切片内容写入 MySQL 精简集合仅写入向量及过滤键
+            KnowledgeChunkService.save_rows(chunk_rows)
+            # 按文件重新解析写入目标 嵌入模型迁移期间同时写入新旧两个 Collection
+            target_knowledge = KnowledgeDao.select_one(target_kb_id)
+            for write_collection_name, write_embed_client in _resolve_milvus_write_targets(
+                    knowledge_file_vectorize_task, embed_client, target_knowledge):
+                if not milvus_client.check_collection_exists(write_collection_name):
+                    logger_util.info(f"新建集合{write_collection_name}")
+                    KnowledgeService.ensure_milvus_collection(
+                        write_collection_name,
+                        (target_knowledge.vector_storage if target_knowledge else None) or VECTOR_STORAGE_FLOAT,
+                        target_knowledge.projection_dim if target_knowledge else None)
+                    logger_util.info(f"完成集合{write_collection_name}新建")
+                # 知识库配置降维投影时 整批向量一次矩阵乘投影 集合首次入库时以知识库切片样本拟合投影
+                chunk_vectors = project_for_ingest(
+                    target_knowledge, write_collection_name,
+                    [write_embed_client.get_embeddings(inputs=[chunk.page_content or ""])[0] for chunk in all_chunks],
+                    embed_client=write_embed_client)
+                # milvus 插入数据 仅保留集合中存在的字段
+                write_fields = set(milvus_client.list_field_names(write_collection_name))
+                insert_data = []
+                for chunk_row, chunk_vector in zip(chunk_rows, chunk_vectors):
+                    data = {field: value for field, value in chunk_row.items() if field in write_fields}
                     # 调用Embedding模型获取向量数据
-                    "vector": chunk_vector
-                }
-                insert_data.append(data)
+                    data["vector"] = chunk_vector
+                    insert_data.append(data)
 
-            milvus_client.insert_data(target_collection_name, insert_data)
+                milvus_client.insert_data(write_collection_name, insert_data)
+            # 集合规模增长后提交后台索引升级(FLAT -> HNSW -> IVF_PQ/DISKANN) 不影响当前集合检索
+            _schedule_index_upgrade(milvus_client, target_knowledge)
             # Desperate----- 创建Collection时已完成索引创建
             # milvus_client.create_index_on_field(target_collection_name, "vector", milvus_default_index_params)
             logger_util.info(f"========》{file_name}: Milvus插入完成 《========")
@@ -177,6 +210,7 @@ def celery_embed_document(self, task_json):
             update_file: KnowledgeFile = KnowledgeFileService.select_by_file_id(file_id)
             update_file.status = 1
             KnowledgeFileService.update_file(update_file)
+            bump_knowledge_version(target_kb_id)
             logger_util.info(f"========》{file_name}: 向量化完成 《========")
         except Exception as e:
             logger_util.error(f"任务失败，正在重试，重试次数：{self.request.retries}")
@@ -195,3 +229,366 @@ def celery_embed_document(self, task_json):
             logger_util.exception(file_vectorize_err_msg)
 
             continue  # 跳过本次
+
+
+def _keyword_write_lock(kb_id: str):
+    """
+    知识库关键词索引写入锁(跨进程), 锁过期时间覆盖单个文件写入耗时
+    """
+    return RedisUtil().client.lock(f"{PrefixRedisKeywordWriteLock}{kb_id}", timeout=600, blocking_timeout=600)
+
+
+def _resolve_keyword_index(vectorize_task: KnowledgeFileVectorizeTasks, knowledge=None) -> str:
+    """
+    解析当前文件写入的 ES 索引, 以数据库中知识库的最新状态为准, 查询失败时回退至任务参数
+    """
+    if knowledge is not None and knowledge.index_name:
+        return knowledge.index_name
+    return vectorize_task.index_name
+
+
+def _resolve_milvus_write_targets(vectorize_task: KnowledgeFileVectorizeTasks, embed_client, knowledge=None):
+    """
+    解析当前文件需要写入的 Milvus Collection 及对应嵌入模型客户端
+    以数据库中知识库的最新状态为准, 查询失败时回退至任务参数
+    """
+    if knowledge is None:
+        write_targets = [(vectorize_task.collection_name, embed_client)]
+        if vectorize_task.shadow_collection_name and vectorize_task.shadow_embedding_cfg_info:
+            write_targets.append((vectorize_task.shadow_collection_name,
+                                  ModelFactory.create_client(config=vectorize_task.shadow_embedding_cfg_info)))
+        return write_targets
+
+    write_targets = [(knowledge.collection_name,
+                      ModelFactory.create_client(
+                          config=KnowledgeService.resolve_model_cfg(knowledge.available_model_id)))]
+    if knowledge.migrate_status == 1 and knowledge.pending_collection_name:
+        write_targets.append((knowledge.pending_collection_name,
+                              ModelFactory.create_client(
+                                  config=KnowledgeService.resolve_model_cfg(knowledge.pending_available_model_id))))
+    return write_targets
+
+
+def _drop_knowledge_collection(milvus_client: VectorStore, kb_id: str, collection_name: str):
+    """
+    删除知识库不再使用的 Collection, 共享集合仅删除该知识库数据
+    """
+    if collection_name == MILVUS_SHARED_COLLECTION_NAME:
+        milvus_client.delete_collection_file(collection_name, f"knowledge_id == '{kb_id}'")
+    else:
+        milvus_client.delete_collection(collection_name)
+        projection_store.delete(collection_name)
+
+
+def _purge_deleted_files(milvus_client: VectorStore, kb_id: str, collection_name: str, file_ids: List[str]):
+    """
+    切换前复核快照文件, 删除迁移复制期间已被删除的文件在新 Collection 中的切片
+    """
+    active_file_ids = {file.id for file in KnowledgeFileDao.select_by_kb_id(kb_id)}
+    deleted_file_ids = [file_id for file_id in file_ids if file_id not in active_file_ids]
+    if deleted_file_ids:
+        milvus_client.delete_collection_file(collection_name, f"file_id in {json.dumps(deleted_file_ids)}")
+        logger_util.info(f"{collection_name} 清理迁移期间已删除文件: {deleted_file_ids}")
+
+
+def _copy_files_with_new_embedding(milvus_client: VectorStore, source_collection_name: str,
+                                   target_collection_name: str, embed_client, file_ids: List[str],
+                                   file_batch_size: int = 100, embed_batch_size: int = 64, knowledge=None):
+    """
+    读取旧 Collection 中指定文件的切片, 使用新嵌入模型重新向量化后写入新 Collection
+    """
+    output_fields = milvus_client.list_field_names(source_collection_name)
+    target_fields = milvus_client.list_field_names(target_collection_name)
+    copied_cnt = 0
+    for start in range(0, len(file_ids), file_batch_size):
+        expr = f"file_id in {json.dumps(file_ids[start:start + file_batch_size])}"
+        for rows in milvus_client.query_iterator(source_collection_name, expr,
+                                                 output_fields=output_fields, batch_size=embed_batch_size):
+            # 精简集合从切片存储读取 title/text
+            KnowledgeChunkService.fill_rows(rows, ["title", "text"])
+            # 入库时向量化内容为切片原文 Milvus text 字段为「标题:原文」
+            contents = []
+            for row in rows:
+                prefix = f"{row.get('title') or ''}:"
+                text = row.get("text") or ""
+                contents.append(text[len(prefix):] if text.startswith(prefix) else text)
+            vectors = project_for_ingest(knowledge, target_collection_name,
+                                         embed_client.get_embeddings(inputs=contents), embed_client=embed_client)
+            insert_data = []
+            for row, vector in zip(rows, vectors):
+                data = {field: row.get(field) for field in output_fields}
+                data["vector"] = vector
+                insert_data.append(data)
+            insert_data = KnowledgeChunkService.adapt_rows(insert_data, target_fields)
+            milvus_client.insert_data(target_collection_name, insert_data)
+            copied_cnt += len(insert_data)
+    logger_util.info(f"{source_collection_name} -> {target_collection_name} 重新向量化切片数量: {copied_cnt}")
+
+
+@celery.task(bind=True)
+def celery_migrate_knowledge_embedding(self, kb_id: str):
+    """
+    知识库嵌入模型在线迁移
+        1. 迁移开始前已完成向量化的文件 使用新模型重新向量化写入新 Collection
+        2. 迁移期间新入库文件由 celery_embed_document 双写
+        3. 原子切换知识库至新 Collection 并补偿切换前遗漏的文件
+        4. 删除旧 Collection
+    """
+    logger_util.info(f"====》Celery 知识库{kb_id}嵌入模型迁移任务开始执行")
+    milvus_client = get_vector_store()
+    redis_client = RedisUtil()
+    know_info_key = f"{PrefixRedisKnowledge}{kb_id}"
+    swapped = False
+    try:
+        knowledge = KnowledgeDao.select_one(kb_id)
+        if knowledge is None or knowledge.migrate_status != 1:
+            logger_util.warning(f"知识库{kb_id}不处于迁移状态, 跳过迁移")
+            return
+        source_collection_name = knowledge.collection_name
+        target_collection_name = knowledge.pending_collection_name
+        target_embed_client = ModelFactory.create_client(
+            config=KnowledgeService.resolve_model_cfg(knowledge.pending_available_model_id))
+
+        # 迁移开始时已完成向量化的文件快照
+        snapshot_file_ids = [file.id for file in KnowledgeFileDao.select_by_kb_id(kb_id) if file.status == 1]
+        _copy_files_with_new_embedding(milvus_client, source_collection_name, target_collection_name,
+                                       target_embed_client, snapshot_file_ids, knowledge=knowledge)
+        _purge_deleted_files(milvus_client, kb_id, target_collection_name, snapshot_file_ids)
+
+        # 原子切换 Collection
+        old_collection_name = KnowledgeDao.finish_migration(kb_id)
+        swapped = True
+        redis_client.delete(know_info_key)
+        bump_knowledge_version(kb_id)
+
+        # 补偿迁移开始前已提交、切换前完成但未双写的文件
+        missing_file_ids = [
+            file.id for file in KnowledgeFileDao.select_by_kb_id(kb_id)
+            if file.status == 1 and file.id not in snapshot_file_ids
+            and not milvus_client.query(target_collection_name, f"file_id == '{file.id}'",
+                                        output_fields=["file_id"], limit=1)
+        ]
+        if missing_file_ids:
+            _copy_files_with_new_embedding(milvus_client, old_collection_name, target_collection_name,
+                                           target_embed_client, missing_file_ids, knowledge=knowledge)
+
+        _drop_knowledge_collection(milvus_client, kb_id, old_collection_name)
+        bump_knowledge_version(kb_id)
+        logger_util.info(f"====》Celery 知识库{kb_id}嵌入模型迁移完成")
+        # 新集合按入库初始索引创建 迁移数据量较大时提交索引升级
+        _schedule_index_upgrade(milvus_client, KnowledgeDao.select_one(kb_id))
+    except Exception as e:
+        logger_util.exception(f"知识库{kb_id}嵌入模型迁移失败: {e}")
+        if not swapped:
+            pending_collection_name = KnowledgeDao.abort_migration(kb_id)
+            if pending_collection_name:
+                milvus_client.delete_collection(pending_collection_name)
+        redis_client.delete(know_info_key)
+
+
+@celery.task(bind=True)
+def celery_migrate_es_shared_index(self, kb_ids: List[str] = None):
+    """
+    知识库 ES 独立索引迁移至共享索引
+        1. 复制独立索引文档至共享索引 并按 knowledge_id 路由
+        2. 持有知识库写入锁切换索引名称 新入库文档直接写入共享索引
+        3. 二次复制切换前写入的增量文档(已存在文档跳过), 入库任务持锁写入, 切换后不再写入旧索引
+        4. 删除独立索引
+    """
+    logger_util.info("====》Celery ES共享索引迁移任务开始执行")
+    es_client = get_keyword_store()
+    redis_client = RedisUtil()
+    es_client.create_index(ES_SHARED_INDEX_NAME)
+    for knowledge in KnowledgeDao.select_all_active():
+        if kb_ids and knowledge.id not in kb_ids:
+            continue
+        source_index_name = knowledge.index_name
+        if not source_index_name or source_index_name == ES_SHARED_INDEX_NAME:
+            continue
+        try:
+            es_client.reindex(source_index_name, ES_SHARED_INDEX_NAME, routing=knowledge.id)
+            # 等待正在写入旧索引的入库任务完成后切换 切换后入库任务解析到共享索引
+            with _keyword_write_lock(knowledge.id):
+                KnowledgeDao.update_index_name(knowledge.id, ES_SHARED_INDEX_NAME)
+                redis_client.delete(f"{PrefixRedisKnowledge}{knowledge.id}")
+                es_client.reindex(source_index_name, ES_SHARED_INDEX_NAME, routing=knowledge.id, op_type="create")
+            es_client.delete_index(source_index_name)
+            bump_knowledge_version(knowledge.id)
+            logger_util.info(f"========》知识库{knowledge.id}: {source_index_name} 已迁移至共享索引 《========")
+        except Exception as e:
+            logger_util.exception(f"知识库{knowledge.id}迁移共享索引失败: {e}")
+            continue
+
+
+def _copy_knowledge_rows(milvus_client: VectorStore, source_collection_name: str, target_collection_name: str,
+                         expr: str, batch_size: int = 500):
+    """
+    按条件复制 Collection 数据(含向量)至目标 Collection, 不重新向量化
+    """
+    output_fields = milvus_client.list_field_names(source_collection_name) + [MILVUS_EMBEDDING_FIELD_NAME]
+    target_fields = milvus_client.list_field_names(target_collection_name)
+    copied_cnt = 0
+    for rows in milvus_client.query_iterator(source_collection_name, expr,
+                                             output_fields=output_fields, batch_size=batch_size):
+        # 源集合与目标集合字段不同时(完整/精简) 补写或回填切片内容
+        milvus_client.insert_data(target_collection_name, KnowledgeChunkService.adapt_rows(
+            [{field: row.get(field) for field in output_fields} for row in rows], target_fields))
+        copied_cnt += len(rows)
+    logger_util.info(f"{source_collection_name} -> {target_collection_name} 复制切片数量: {copied_cnt}")
+
+
+@celery.task(bind=True)
+def celery_migrate_milvus_shared_collection(self, kb_ids: List[str] = None):
+    """
+    知识库 Milvus 独立集合迁移至共享集合
+        1. 复制独立集合数据(含向量)至共享集合
+        2. 切换知识库集合名称 新入库文件直接写入共享集合
+        3. 补偿切换前完成向量化但未复制的文件
+        4. 删除独立集合
+    """
+    logger_util.info("====》Celery Milvus共享集合迁移任务开始执行")
+    milvus_client = get_vector_store()
+    redis_client = RedisUtil()
+    KnowledgeService.ensure_milvus_collection(MILVUS_SHARED_COLLECTION_NAME)
+    for knowledge in KnowledgeDao.select_all_active():
+        if kb_ids and knowledge.id not in kb_ids:
+            continue
+        source_collection_name = knowledge.collection_name
+        if not source_collection_name or source_collection_name == MILVUS_SHARED_COLLECTION_NAME:
+            continue
+        if knowledge.migrate_status == 1:
+            logger_util.warning(f"知识库{knowledge.id}正在进行嵌入模型迁移, 跳过共享集合迁移")
+            continue
+        # 共享集合为 float 存储 半精度/二值向量无法无损复制
+        if (knowledge.vector_storage or VECTOR_STORAGE_FLOAT) not in (VECTOR_STORAGE_FLOAT, VECTOR_STORAGE_SQ8):
+            logger_util.warning(f"知识库{knowledge.id}使用 {knowledge.vector_storage} 向量存储, 跳过共享集合迁移")
+            continue
+        if knowledge.projection_dim:
+            logger_util.warning(f"知识库{knowledge.id}已配置向量降维投影, 跳过共享集合迁移")
+            continue
+        try:
+            # 清理上次失败遗留的数据 保证可重复执行
+            milvus_client.delete_collection_file(MILVUS_SHARED_COLLECTION_NAME,
+                                                 f"knowledge_id == '{knowledge.id}'")
+            _copy_knowledge_rows(milvus_client, source_collection_name, MILVUS_SHARED_COLLECTION_NAME,
+                                 f"knowledge_id == '{knowledge.id}'")
+            KnowledgeDao.update_collection_name(knowledge.id, MILVUS_SHARED_COLLECTION_NAME)
+            redis_client.delete(f"{PrefixRedisKnowledge}{knowledge.id}")
+
+            missing_file_ids = [
+                file.id for file in KnowledgeFileDao.select_by_kb_id(knowledge.id)
+                if file.status == 1
+                and not milvus_client.query(MILVUS_SHARED_COLLECTION_NAME,
+                                            f"knowledge_id == '{knowledge.id}' and file_id == '{file.id}'",
+                                            output_fields=["file_id"], limit=1)
+            ]
+            if missing_file_ids:
+                _copy_knowledge_rows(milvus_client, source_collection_name, MILVUS_SHARED_COLLECTION_NAME,
+                                     f"file_id in {json.dumps(missing_file_ids)}")
+            milvus_client.delete_collection(source_collection_name)
+            bump_knowledge_version(knowledge.id)
+            logger_util.info(f"========》知识库{knowledge.id}: {source_collection_name} 已迁移至共享集合 《========")
+        except Exception as e:
+            logger_util.exception(f"知识库{knowledge.id}迁移共享集合失败: {e}")
+            continue
+
+
+def _schedule_index_upgrade(milvus_client: VectorStore, knowledge):
+    """
+    知识库集合规模需要升级索引时提交后台升级任务, 同一知识库通过 Redis 锁去重
+    共享集合及迁移中的知识库不升级
+    """
+    if knowledge is None or knowledge.migrate_status == 1:
+        return
+    collection_name = knowledge.collection_name
+    if not collection_name or collection_name == MILVUS_SHARED_COLLECTION_NAME:
+        return
+    if milvus_client.advise_index(collection_name) is None:
+        return
+    # 锁过期时间覆盖大集合复制及建索引耗时 任务异常退出后自动释放
+    lock_key = f"{PrefixRedisIndexRebuildLock}{knowledge.id}"
+    if not RedisUtil().client.set(lock_key, "1", nx=True, ex=3600):
+        return
+    celery_upgrade_knowledge_index.delay(knowledge.id)
+    logger_util.info(f"知识库{knowledge.id}集合{collection_name}索引升级任务已提交")
+
+
+@celery.task(bind=True)
+def celery_upgrade_knowledge_index(self, kb_id: str, file_batch_size: int = 100):
+    """
+    知识库向量索引在线升级, 正在服务的集合不释放、不重建索引
+        1. 按建议索引新建 Collection 并复用投影, 标记迁移状态使新入库文件双写
+        2. 复制升级开始前已完成向量化的文件(含向量, 不重新向量化)
+        3. 等待新索引构建完成并加载后原子切换, 补偿切换前遗漏的文件
+        4. 删除旧 Collection
+    """
+    logger_util.info(f"====》Celery 知识库{kb_id}索引升级任务开始执行")
+    milvus_client = get_vector_store()
+    redis_client = RedisUtil()
+    know_info_key = f"{PrefixRedisKnowledge}{kb_id}"
+    pending_collection_name = None
+    began = False
+    swapped = False
+    try:
+        knowledge = KnowledgeDao.select_one(kb_id)
+        if knowledge is None or knowledge.migrate_status == 1 \
+                or knowledge.collection_name == MILVUS_SHARED_COLLECTION_NAME:
+            logger_util.warning(f"知识库{kb_id}不存在、正在迁移或使用共享集合, 跳过索引升级")
+            return
+        source_collection_name = knowledge.collection_name
+        advised_params = milvus_client.advise_index(source_collection_name)
+        if advised_params is None:
+            return
+
+        pending_collection_name = (f"{MILVUS_COLLECTION_NAME_PREFIX}{uuid.uuid4().hex}"
+                                   f"_v{(knowledge.embedding_version or 1) + 1}")
+        KnowledgeService.ensure_milvus_collection(pending_collection_name,
+                                                  knowledge.vector_storage or VECTOR_STORAGE_FLOAT,
+                                                  knowledge.projection_dim,
+                                                  index_params=advised_params)
+        # 向量原样复制 新集合沿用旧集合投影 双写时不重新拟合
+        projection_store.copy(source_collection_name, pending_collection_name)
+        began = KnowledgeDao.begin_index_upgrade(kb_id, pending_collection_name)
+        if not began:
+            _drop_knowledge_collection(milvus_client, kb_id, pending_collection_name)
+            return
+        redis_client.delete(know_info_key)
+
+        # 升级开始时已完成向量化的文件快照
+        snapshot_file_ids = [file.id for file in KnowledgeFileDao.select_by_kb_id(kb_id) if file.status == 1]
+        for start in range(0, len(snapshot_file_ids), file_batch_size):
+            _copy_knowledge_rows(milvus_client, source_collection_name, pending_collection_name,
+                                 f"file_id in {json.dumps(snapshot_file_ids[start:start + file_batch_size])}")
+        _purge_deleted_files(milvus_client, kb_id, pending_collection_name, snapshot_file_ids)
+        milvus_client.wait_for_index(pending_collection_name)
+
+        # 原子切换 Collection
+        old_collection_name = KnowledgeDao.finish_migration(kb_id)
+        swapped = True
+        redis_client.delete(know_info_key)
+        bump_knowledge_version(kb_id)
+
+        # 补偿升级开始前已提交、切换前完成但未双写的文件
+        missing_file_ids = [
+            file.id for file in KnowledgeFileDao.select_by_kb_id(kb_id)
+            if file.status == 1 and file.id not in snapshot_file_ids
+            and not milvus_client.query(pending_collection_name, f"file_id == '{file.id}'",
+                                        output_fields=["file_id"], limit=1)
+        ]
+        if missing_file_ids:
+            _copy_knowledge_rows(milvus_client, old_collection_name, pending_collection_name,
+                                 f"file_id in {json.dumps(missing_file_ids)}")
+
+        _drop_knowledge_collection(milvus_client, kb_id, old_collection_name)
+        bump_knowledge_version(kb_id)
+        logger_util.info(f"====》Celery 知识库{kb_id}索引升级完成: {advised_params}")
+    except Exception as e:
+        logger_util.exception(f"知识库{kb_id}索引升级失败: {e}")
+        if not swapped and pending_collection_name:
+            # 升级失败恢复为正常状态 旧集合始终可用
+            if began:
+                KnowledgeDao.abort_migration(kb_id, migrate_status=0)
+            _drop_knowledge_collection(milvus_client, kb_id, pending_collection_name)
+        redis_client.delete(know_info_key)
+    finally:
+        redis_client.delete(f"{PrefixRedisIndexRebuildLock}{kb_id}")
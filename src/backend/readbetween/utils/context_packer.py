@@ -0,0 +1,147 @@
+import re
+from functools import lru_cache
+from typing import List, Optional, Sequence
+
+import numpy as np
+
+from readbetween.utils.logger_util import logger_util
+
+try:
+    import tiktoken
+except ImportError:  # 未安装 tiktoken 时按字符估算
+    tiktoken = None
+
+# 未知模型使用的通用编码
+DEFAULT_ENCODING_NAME = "cl100k_base"
+# 中日韩字符约 1 字 1 token, 其余字符约 4 字符 1 token
+_CJK_PATTERN = re.compile(r"[\u3040-\u30ff\u3400-\u4dbf\u4e00-\u9fff\uac00-\ud7af\uff00-\uffef]")
+
+
+@lru_cache(maxsize=32)
+def _get_encoding(model_name: Optional[str]):
+    if tiktoken is None:
+        return None
+    try:
+        return tiktoken.encoding_for_model(model_name) if model_name else tiktoken.get_encoding(DEFAULT_ENCODING_NAME)
+    except KeyError:
+        pass
+    try:
+        return tiktoken.get_encoding(DEFAULT_ENCODING_NAME)
+    except Exception as e:
+        # 离线环境无法下载编码文件
+        logger_util.warning(f"加载分词编码失败, 按字符估算token数: {e}")
+        return None
+
+
+def count_tokens(text: str, model_name: Optional[str] = None) -> int:
+    """
+    计算文本 token 数，优先使用目标模型的 tiktoken 编码，不可用时按字符估算
+    :param text: 文本
+    :param model_name: 目标模型名称
+    :return: token 数
+    """
+    if not text:
+        return 0
+    encoding = _get_encoding(model_name)
+    if encoding is not None:
+        return len(encoding.encode(text, disallowed_special=()))
+    cjk_cnt = len(_CJK_PATTERN.findall(text))
+    return cjk_cnt + (len(text) - cjk_cnt + 3) // 4
+
+
+def truncate_to_tokens(text: str, max_tokens: int, model_name: Optional[str] = None) -> str:
+    """
+    截断文本至指定 token 数
+    :param text: 文本
+    :param max_tokens: token 上限
+    :param model_name: 目标模型名称
+    :return: 截断后的文本
+    """
+    if max_tokens <= 0 or not text:
+        return ""
+    encoding = _get_encoding(model_name)
+    if encoding is not None:
+        tokens = encoding.encode(text, disallowed_special=())
+        return text if len(tokens) <= max_tokens else encoding.decode(tokens[:max_tokens])
+    if count_tokens(text) <= max_tokens:
+        return text
+    # 二分查找满足上限的最长前缀
+    low, high = 0, len(text)
+    while low < high:
+        mid = (low + high + 1) // 2
+        if count_tokens(text[:mid]) <= max_tokens:
+            low = mid
+        else:
+            high = mid - 1
+    return text[:low]
+
+
+def mmr_order(query_vector: Sequence[float], candidate_vectors: Sequence[Sequence[float]],
+              lambda_mult: float = 0.7) -> List[int]:
+    """
+    最大边际相关性排序 MMR = λ·sim(q, d) - (1-λ)·max sim(d, 已选)
+    :param query_vector: 查询向量
+    :param candidate_vectors: 候选向量
+    :param lambda_mult: 相关性与多样性的权衡系数，越大越偏重相关性
+    :return: 候选下标的选择顺序
+    """
+    candidates = np.asarray(candidate_vectors, dtype=np.float32)
+    if candidates.ndim != 2 or len(candidates) == 0:
+        return []
+    query = np.asarray(query_vector, dtype=np.float32)
+    candidates = candidates / np.maximum(np.linalg.norm(candidates, axis=1, keepdims=True), 1e-12)
+    query = query / max(float(np.linalg.norm(query)), 1e-12)
+
+    relevance = candidates @ query
+    pairwise = candidates @ candidates.T
+    selected: List[int] = []
+    # 各候选与已选集合的最大相似度
+    max_redundancy = np.full(len(candidates), -np.inf, dtype=np.float32)
+    remaining = np.ones(len(candidates), dtype=bool)
+    for _ in range(len(candidates)):
+        redundancy = np.where(np.isfinite(max_redundancy), max_redundancy, 0.0)
+        scores = np.where(remaining, lambda_mult * relevance - (1 - lambda_mult) * redundancy, -np.inf)
+        best = int(np.argmax(scores))
+        selected.append(best)
+        remaining[best] = False
+        max_redundancy = np.maximum(max_redundancy, pairwise[best])
+    return selected
+
+
+def pack(texts: List[str], token_budget: int, model_name: Optional[str] = None,
+         query_vector: Optional[Sequence[float]] = None,
+         candidate_vectors: Optional[Sequence[Sequence[float]]] = None,
+         lambda_mult: float = 0.7) -> List[int]:
+    """
+    在 token 预算内选择候选
+    提供向量时按 MMR 顺序选择，否则按传入顺序；放不下的候选跳过，首个候选超出预算时截断后放入
+    部分候选向量为 None 时，这些候选保持原位置，其余候选在剩余位置上按 MMR 顺序排列
+    :param texts: 候选文本(已按相关性降序)
+    :param token_budget: token 预算
+    :param model_name: 目标模型名称
+    :param query_vector: 查询向量，可选
+    :param candidate_vectors: 候选向量，可选，元素为 None 表示该候选无向量
+    :param lambda_mult: MMR 权衡系数
+    :return: 被选中候选的下标(按选择顺序)，被截断的候选文本写回 texts
+    """
+    order = list(range(len(texts)))
+    if query_vector is not None and candidate_vectors is not None and len(candidate_vectors) == len(texts):
+        vector_indexes = [index for index, vector in enumerate(candidate_vectors) if vector is not None]
+        if len(vector_indexes) > 1:
+            mmr_indexes = mmr_order(query_vector, [candidate_vectors[index] for index in vector_indexes],
+                                    lambda_mult)
+            for position, mmr_index in zip(vector_indexes, mmr_indexes):
+                order[position] = vector_indexes[mmr_index]
+
+    selected: List[int] = []
+    used_tokens = 0
+    for index in order:
+        tokens = count_tokens(texts[index], model_name)
+        if used_tokens + tokens <= token_budget:
+            selected.append(index)
+            used_tokens += tokens
+        elif not selected:
+            texts[index] = truncate_to_tokens(texts[index], token_budget, model_name)
+            selected.append(index)
+            used_tokens = token_budget
+    return selected
@@ -1,6 +1,8 @@
 from typing import TYPE_CHECKING
 from readbetween.utils.logger_util import logger_util
+from sqlalchemy import inspect, text
 from sqlalchemy.exc import OperationalError
+from sqlalchemy.schema import CreateColumn
 from sqlmodel import Session, SQLModel, create_engine
 from sqlalchemy.ext.asyncio import create_async_engine, AsyncSession, AsyncEngine
 from readbetween.config import settings
@@ -108,4 +110,30 @@ class DatabaseClient:
                 logger_util.error(f'建表异常 {table}: {exc}')  # 记录创建表时的错误
                 raise RuntimeError(f'建表异常 {table}') from exc  # 抛出运行时异常
 
+        # 已存在的表补齐新增字段
+        self.add_missing_columns()
         logger_util.debug('创建数据库表成功')  # 记录成功创建数据库和表的信息
+
+    def add_missing_columns(self):
+        """
+        为已存在的表补齐模型中新增的字段(ALTER TABLE ... ADD COLUMN)，可重复执行。
+        create_all 不修改已存在的表，升级后新增字段(如 knowledge 表的迁移及向量存储字段)由此补齐；
+        非空且无服务端默认值的字段无法为已有数据补值，仅记录告警。
+        """
+        engine = DatabaseClient.engine
+        inspector = inspect(engine)
+        preparer = engine.dialect.identifier_preparer
+        for table in SQLModel.metadata.sorted_tables:
+            if not inspector.has_table(table.name):
+                continue
+            existing_columns = {column['name'] for column in inspector.get_columns(table.name)}
+            for column in table.columns:
+                if column.name in existing_columns:
+                    continue
+                if not column.nullable and column.server_default is None:
+                    logger_util.warning(f'表 {table.name} 缺少非空字段 {column.name} 且无默认值, 请手动添加')
+                    continue
+                column_ddl = CreateColumn(column).compile(dialect=engine.dialect)
+                with engine.begin() as connection:
+                    connection.execute(text(f'ALTER TABLE {preparer.format_table(table)} ADD COLUMN {column_ddl}'))
+                logger_util.info(f'表 {table.name} 新增字段 {column.name}')
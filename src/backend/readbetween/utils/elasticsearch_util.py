@@ -1,12 +1,13 @@
 from elasticsearch_dsl import Document, Date, Integer, Text, Keyword, connections, Long, Index, Search, analyzer, \
-    token_filter, tokenizer, Nested, Q
+    token_filter, tokenizer, Nested, Q, AsyncSearch, AsyncMultiSearch, async_connections
 from readbetween.utils.logger_util import logger_util
 from readbetween.models.schemas.es.base import BaseDocument
 from readbetween.config import settings
+from readbetween.services.constant import ES_DEFAULT_INDEX_MAPPINGS, ES_DEFAULT_SEARCH_FIELDS, ES_SHARED_INDEX_NAME
+from readbetween.utils.keyword_store import KeywordStore
 
 
-
-class ElasticSearchUtil:
+class ElasticSearchUtil(KeywordStore):
 
     def __init__(self, es_hosts=None, es_timeout=None, es_http_auth=None):
         """
@@ -33,13 +34,51 @@ class ElasticSearchUtil:
             raise Exception(f"Elasticsearch连接失败: {e}")
 
     @classmethod
-    def save_document(cls, save_document: BaseDocument):
+    def create_index(cls, index_name):
+        """
+        使用显式映射创建知识库索引，索引已存在时跳过。
+        共享索引要求写入时必须指定 routing(knowledge_id)。
+        :param index_name: 索引名称。
+        """
+        try:
+            if Index(index_name).exists():
+                return
+            es_settings = settings.storage.es
+            is_shared = index_name == ES_SHARED_INDEX_NAME
+            mappings = dict(ES_DEFAULT_INDEX_MAPPINGS)
+            if is_shared:
+                mappings["_routing"] = {"required": True}
+            connections.get_connection().indices.create(
+                index=index_name,
+                settings={
+                    "number_of_shards": es_settings.shared_number_of_shards if is_shared
+                    else es_settings.number_of_shards,
+                    "number_of_replicas": es_settings.number_of_replicas,
+                    "refresh_interval": es_settings.refresh_interval,
+                },
+                mappings=mappings,
+            )
+            logger_util.info(f"索引 {index_name} 已创建。")
+        except Exception as e:
+            # 并发创建时索引可能已由其他进程创建
+            if "resource_already_exists_exception" in str(e):
+                logger_util.info(f"索引 {index_name} 已存在。")
+                return
+            logger_util.error(f"创建索引 {index_name} 时发生错误: {e}")
+            raise Exception(f"创建索引 {index_name} 时发生错误: {e}")
+
+    @classmethod
+    def save_document(cls, save_document: BaseDocument, routing=None):
         """
         将文档保存到 Elasticsearch 索引中。
         :param save_document: 要保存的文档对象。
+        :param routing: 路由值，共享索引模式下为 knowledge_id。
         """
         try:
-            save_document.save()
+            if routing:
+                save_document.save(routing=routing)
+            else:
+                save_document.save()
         except Exception as e:
             logger_util.error(f"保存文档失败: {e}")
             raise Exception(f"保存文档失败: {e}")
@@ -63,54 +102,146 @@ class ElasticSearchUtil:
             raise Exception(f"删除索引 {index_name} 时发生错误: {e}")
 
     @classmethod
-    def search_documents(cls, index_names, query, size=10, fields=None):
+    def knowledge_filter(cls, knowledge_ids):
+        """
+        构建知识库过滤条件，兼容动态映射创建的历史索引(metadata.knowledge_id.keyword)。
+        :param knowledge_ids: 知识库ID列表。
+        :return: Q 查询对象。
+        """
+        return Q("bool", should=[
+            Q("terms", **{"metadata.knowledge_id": knowledge_ids}),
+            Q("terms", **{"metadata.knowledge_id.keyword": knowledge_ids}),
+        ], minimum_should_match=1)
+
+    @classmethod
+    def metadata_filter(cls, retrieval_filter):
+        """
+        构建文件及页码范围过滤条件，文件ID兼容动态映射创建的历史索引(metadata.file_id.keyword)。
+        :param retrieval_filter: 已解析的检索过滤条件 RetrievalFilter。
+        :return: Q 查询对象列表。
+        """
+        filters = []
+        if retrieval_filter.file_ids is not None:
+            filters.append(Q("bool", should=[
+                Q("terms", **{"metadata.file_id": retrieval_filter.file_ids}),
+                Q("terms", **{"metadata.file_id.keyword": retrieval_filter.file_ids}),
+            ], minimum_should_match=1))
+        if retrieval_filter.has_page_range():
+            page_range = {}
+            if retrieval_filter.page_from is not None:
+                page_range["gte"] = retrieval_filter.page_from
+            if retrieval_filter.page_to is not None:
+                page_range["lte"] = retrieval_filter.page_to
+            filters.append(Q("range", **{"metadata.start_page": page_range}))
+        return filters
+
+    @classmethod
+    def _build_search(cls, s, index_names, query, size=10, fields=None, knowledge_ids=None,
+                      retrieval_filter=None):
+        """
+        构建检索请求，同步与异步检索共用。
+        """
+        # 构建查询
+        if isinstance(query, str):
+            # 如果查询是字符串，使用 multi_match 查询在正文与标题中搜索
+            s = s.query("multi_match", query=query, fields=ES_DEFAULT_SEARCH_FIELDS)
+        elif isinstance(query, dict):
+            # 如果查询是字典，直接使用 raw DSL
+            s = s.update_from_dict(query)
+        else:
+            raise ValueError("查询内容必须是字符串或字典类型")
+
+        # 按知识库过滤 共享索引仅访问知识库所在分片
+        if knowledge_ids:
+            s = s.filter(cls.knowledge_filter(knowledge_ids))
+            if index_names == [ES_SHARED_INDEX_NAME]:
+                s = s.params(routing=",".join(knowledge_ids))
+
+        # 文件及页码范围过滤 在 bool filter 中执行 不参与评分
+        if retrieval_filter is not None:
+            for metadata_filter in cls.metadata_filter(retrieval_filter):
+                s = s.filter(metadata_filter)
+
+        # 设置返回结果数量
+        s = s[0:size]
+
+        # 设置字段过滤
+        if fields:
+            if isinstance(fields, list):
+                # 包含指定字段
+                s = s.source(fields)
+            elif isinstance(fields, dict) and "excludes" in fields:
+                # 排除指定字段
+                s = s.source({"excludes": fields["excludes"]})
+        return s
+
+    @staticmethod
+    def _extract_hits(response):
+        return [
+            {
+                "id": hit.meta.id,
+                "score": hit.meta.score,
+                "index_name": hit.meta.index,  # 获取文档所属的索引名称
+                "document": hit.to_dict()
+            }
+            for hit in response.hits
+        ]
+
+    @classmethod
+    def search_documents(cls, index_names, query, size=10, fields=None, knowledge_ids=None,
+                         retrieval_filter=None):
         """
         在指定的索引中搜索文档，并支持返回字段过滤。
         :param index_names: 索引名称列表，支持从多个索引中检索。
         :param query: 查询内容，可以是简单的字符串或复杂的查询字典。
         :param size: 返回结果的数量，默认为10。
         :param fields: 返回字段过滤，可以是一个字段列表或排除字段字典。
+        :param knowledge_ids: 知识库ID列表，指定时按知识库过滤，仅检索共享索引时同时按知识库路由。
+        :param retrieval_filter: 已解析的检索过滤条件，按文件ID及页码范围过滤。
         :return: 查询结果列表。
         """
         try:
-            # 创建搜索对象
-            s = Search(index=index_names)
+            # 多个知识库可能共用同一索引
+            index_names = list(dict.fromkeys(index_names))
+            s = cls._build_search(Search(index=index_names), index_names, query, size, fields, knowledge_ids,
+                                  retrieval_filter)
 
-            # 构建查询
-            if isinstance(query, str):
-                # 如果查询是字符串，使用 multi_match 查询在所有字段中搜索
-                s = s.query("multi_match", query=query, fields="*")
-            elif isinstance(query, dict):
-                # 如果查询是字典，直接使用 raw DSL
-                s = s.update_from_dict(query)
-            else:
-                raise ValueError("查询内容必须是字符串或字典类型")
+            # 执行查询
+            results = cls._extract_hits(s.execute())
+            logger_util.info(f"ES查询成功，返回结果数量: {len(results)}")
+            return results
+        except Exception as e:
+            logger_util.error(f"在索引 {index_names} 中搜索文档时发生错误: {e}")
+            raise Exception(f"在索引 {index_names} 中搜索文档时发生错误: {e}")
 
-            # 设置返回结果数量
-            s = s[0:size]
+    @classmethod
+    def _ensure_async_connection(cls):
+        """
+        按需创建异步连接，AsyncElasticsearch 在首次请求时绑定当前事件循环。
+        """
+        try:
+            async_connections.get_connection()
+        except KeyError:
+            async_connections.create_connection(
+                hosts=settings.storage.es.hosts,
+                timeout=settings.storage.es.timeout,
+                http_auth=('elastic', settings.storage.es.http_auth)
+            )
 
-            # 设置字段过滤
-            if fields:
-                if isinstance(fields, list):
-                    # 包含指定字段
-                    s = s.source(fields)
-                elif isinstance(fields, dict) and "excludes" in fields:
-                    # 排除指定字段
-                    s = s.source({"excludes": fields["excludes"]})
+    @classmethod
+    async def async_search_documents(cls, index_names, query, size=10, fields=None, knowledge_ids=None,
+                                     retrieval_filter=None):
+        """
+        异步在指定的索引中搜索文档，参数同 search_documents。
+        :return: 查询结果列表。
+        """
+        try:
+            cls._ensure_async_connection()
+            index_names = list(dict.fromkeys(index_names))
+            s = cls._build_search(AsyncSearch(index=index_names), index_names, query, size, fields, knowledge_ids,
+                                  retrieval_filter)
 
-            # 执行查询
-            response = s.execute()
-
-            # 提取结果
-            results = [
-                {
-                    "id": hit.meta.id,
-                    "score": hit.meta.score,
-                    "index_name": hit.meta.index,  # 获取文档所属的索引名称
-                    "document": hit.to_dict()
-                }
-                for hit in response.hits
-            ]
+            results = cls._extract_hits(await s.execute())
             logger_util.info(f"ES查询成功，返回结果数量: {len(results)}")
             return results
         except Exception as e:
@@ -118,11 +249,36 @@ class ElasticSearchUtil:
             raise Exception(f"在索引 {index_names} 中搜索文档时发生错误: {e}")
 
     @classmethod
-    def delete_documents(cls, index_name, query):
+    async def async_msearch_documents(cls, index_names, queries, size=10, fields=None, knowledge_ids=None,
+                                      retrieval_filter=None):
+        """
+        异步批量检索，全部查询合并为一次 msearch 请求，其余参数同 search_documents。
+        :param queries: 查询内容列表。
+        :return: 与 queries 顺序一致的各查询结果列表。
+        """
+        if not queries:
+            return []
+        try:
+            cls._ensure_async_connection()
+            index_names = list(dict.fromkeys(index_names))
+            ms = AsyncMultiSearch(index=index_names)
+            for query in queries:
+                ms = ms.add(cls._build_search(AsyncSearch(index=index_names), index_names, query, size, fields,
+                                              knowledge_ids, retrieval_filter))
+            results = [cls._extract_hits(response) for response in await ms.execute()]
+            logger_util.info(f"ES批量查询成功，查询数量: {len(queries)}")
+            return results
+        except Exception as e:
+            logger_util.error(f"在索引 {index_names} 中批量搜索文档时发生错误: {e}")
+            raise Exception(f"在索引 {index_names} 中批量搜索文档时发生错误: {e}")
+
+    @classmethod
+    def delete_documents(cls, index_name, query, routing=None):
         """
         根据查询条件删除指定索引中的文档。
         :param index_name: 索引名称。
         :param query: 查询条件，用于指定要删除的文档。
+        :param routing: 路由值，共享索引模式下为 knowledge_id。
         :return: 删除结果。
         """
         try:
@@ -140,6 +296,8 @@ class ElasticSearchUtil:
                 s = s.update_from_dict(query)
             else:
                 s = s.query(query)
+            if routing:
+                s = s.params(routing=routing)
 
             # 执行删除操作
             response = s.delete()
@@ -152,6 +310,72 @@ class ElasticSearchUtil:
             logger_util.error(f"在索引 {index_name} 中删除文档时发生错误: {e}")
             raise Exception(f"在索引 {index_name} 中删除文档时发生错误: {e}")
 
+    @classmethod
+    def delete_knowledge_documents(cls, index_name, knowledge_id, routing=None):
+        """
+        删除索引中指定知识库的全部文档。
+        :param index_name: 索引名称。
+        :param knowledge_id: 知识库ID。
+        :param routing: 路由值，共享索引模式下为 knowledge_id。
+        :return: 删除结果。
+        """
+        return cls.delete_documents(index_name, {"query": cls.knowledge_filter([knowledge_id]).to_dict()},
+                                    routing=routing)
+
+    @classmethod
+    def delete_file_documents(cls, index_name, file_id, routing=None):
+        """
+        删除索引中指定文件的全部文档，兼容动态映射创建的历史索引(metadata.file_id.keyword)。
+        :param index_name: 索引名称。
+        :param file_id: 文件ID。
+        :param routing: 路由值，共享索引模式下为 knowledge_id。
+        :return: 删除结果。
+        """
+        delete_query = {
+            "query": {
+                "bool": {
+                    "should": [
+                        {"term": {"metadata.file_id": {"value": f"{file_id}"}}},
+                        {"term": {"metadata.file_id.keyword": {"value": f"{file_id}"}}}
+                    ],
+                    "minimum_should_match": 1
+                }
+            }
+        }
+        return cls.delete_documents(index_name, delete_query, routing=routing)
+
+    @classmethod
+    def reindex(cls, source_index, dest_index, routing=None, op_type=None):
+        """
+        将源索引中的文档复制到目标索引。
+        :param source_index: 源索引名称。
+        :param dest_index: 目标索引名称。
+        :param routing: 目标索引写入路由值，可选。
+        :param op_type: 写入方式，"create" 时跳过目标索引中已存在的文档，可选。
+        :return: 复制结果统计。
+        """
+        try:
+            if not Index(source_index).exists():
+                logger_util.info(f"索引 {source_index} 不存在，无需复制")
+                return {"created": 0}
+            dest = {"index": dest_index}
+            if routing:
+                dest["routing"] = f"={routing}"
+            if op_type:
+                dest["op_type"] = op_type
+            response = connections.get_connection().reindex(
+                source={"index": source_index},
+                dest=dest,
+                conflicts="proceed",
+                refresh=True,
+                wait_for_completion=True,
+            )
+            logger_util.info(f"索引 {source_index} -> {dest_index} 复制完成，新增 {response.get('created', 0)} 条文档。")
+            return {"created": response.get("created", 0)}
+        except Exception as e:
+            logger_util.error(f"索引 {source_index} -> {dest_index} 复制时发生错误: {e}")
+            raise Exception(f"索引 {source_index} -> {dest_index} 复制时发生错误: {e}")
+
     @classmethod
     def check_connection(cls):
         """
@@ -0,0 +1,148 @@
+import hashlib
+import threading
+import time
+import unicodedata
+from collections import OrderedDict
+from typing import Callable, List, Optional
+
+import numpy as np
+
+from readbetween.config import settings
+from readbetween.models.v1.model_available_cfg import ModelAvailableCfgInfo
+from readbetween.services.constant import PrefixRedisQueryEmbedding
+from readbetween.utils.logger_util import logger_util
+from readbetween.utils.redis_util import RedisUtil
+
+
+class EmbeddingCache:
+    """
+    查询向量缓存
+        一级: 进程内 LRU, 按条目数上限淘汰, 条目过期后失效
+        二级: Redis(可选), 多进程共享, 以 float32 二进制存储
+    缓存键为 模型标识 + 归一化查询文本
+    """
+
+    def __init__(self, max_size: int = None, ttl: int = None, use_redis: bool = None):
+        self.max_size = settings.retrieval.embedding_cache_size if max_size is None else max_size
+        self.ttl = settings.retrieval.embedding_cache_ttl if ttl is None else ttl
+        self.use_redis = settings.retrieval.embedding_cache_redis if use_redis is None else use_redis
+        self._lock = threading.Lock()
+        # 缓存键 -> (过期时间, 向量)
+        self._cache: "OrderedDict[str, tuple]" = OrderedDict()
+        self._redis_client: Optional[RedisUtil] = None
+        self._local_hits = 0
+        self._redis_hits = 0
+        self._misses = 0
+
+    @property
+    def redis_client(self) -> RedisUtil:
+        if self._redis_client is None:
+            self._redis_client = RedisUtil()
+        return self._redis_client
+
+    @staticmethod
+    def normalize_query(query: str) -> str:
+        """全半角统一、去除首尾空白并合并连续空白"""
+        return " ".join(unicodedata.normalize("NFKC", query or "").split())
+
+    @classmethod
+    def build_key(cls, model_cfg: ModelAvailableCfgInfo, query: str) -> str:
+        model_identity = f"{model_cfg.mark}|{model_cfg.base_url}|{model_cfg.name}"
+        return hashlib.sha1(f"{model_identity}\n{cls.normalize_query(query)}".encode("utf-8")).hexdigest()
+
+    def get_local(self, model_cfg: ModelAvailableCfgInfo, query: str) -> Optional[List[float]]:
+        """
+        仅查询进程内缓存，不发起网络请求，可在事件循环中直接调用
+        :return: 命中时返回向量，否则返回 None
+        """
+        key = self.build_key(model_cfg, query)
+        vector = self._get_local(key)
+        if vector is not None:
+            with self._lock:
+                self._local_hits += 1
+        return vector
+
+    def get_or_compute(self, model_cfg: ModelAvailableCfgInfo, query: str,
+                       compute: Callable[[], List[float]]) -> List[float]:
+        """
+        依次查询进程内缓存、Redis 缓存，均未命中时计算并回写
+        :param model_cfg: 嵌入模型配置
+        :param query: 查询文本
+        :param compute: 计算查询向量的函数
+        :return: 查询向量
+        """
+        key = self.build_key(model_cfg, query)
+        vector = self._get_local(key)
+        if vector is not None:
+            with self._lock:
+                self._local_hits += 1
+            return vector
+
+        if self.use_redis:
+            try:
+                cached = self.redis_client.get(f"{PrefixRedisQueryEmbedding}{key}")
+            except Exception as e:
+                logger_util.warning(f"读取查询向量缓存失败: {e}")
+                cached = None
+            if cached:
+                vector = np.frombuffer(cached, dtype=np.float32).tolist()
+                self._set_local(key, vector)
+                with self._lock:
+                    self._redis_hits += 1
+                return vector
+
+        vector = compute()
+        with self._lock:
+            self._misses += 1
+        self._set_local(key, vector)
+        if self.use_redis:
+            try:
+                self.redis_client.set(f"{PrefixRedisQueryEmbedding}{key}",
+                                      np.asarray(vector, dtype=np.float32).tobytes(), ex=self.ttl)
+            except Exception as e:
+                logger_util.warning(f"写入查询向量缓存失败: {e}")
+        return vector
+
+    def clear(self):
+        with self._lock:
+            self._cache.clear()
+
+    def stats(self):
+        """
+        缓存命中统计
+        :return: 命中次数、未命中次数及命中率
+        """
+        with self._lock:
+            total = self._local_hits + self._redis_hits + self._misses
+            return {
+                "size": len(self._cache),
+                "max_size": self.max_size,
+                "local_hits": self._local_hits,
+                "redis_hits": self._redis_hits,
+                "misses": self._misses,
+                "hit_rate": round((self._local_hits + self._redis_hits) / total, 4) if total else 0.0,
+            }
+
+    def _get_local(self, key: str) -> Optional[List[float]]:
+        with self._lock:
+            entry = self._cache.get(key)
+            if entry is None:
+                return None
+            expire_at, vector = entry
+            if expire_at < time.time():
+                del self._cache[key]
+                return None
+            self._cache.move_to_end(key)
+            return vector
+
+    def _set_local(self, key: str, vector: List[float]):
+        if self.max_size <= 0:
+            return
+        with self._lock:
+            self._cache[key] = (time.time() + self.ttl, vector)
+            self._cache.move_to_end(key)
+            while len(self._cache) > self.max_size:
+                self._cache.popitem(last=False)
+
+
+embedding_cache = EmbeddingCache()
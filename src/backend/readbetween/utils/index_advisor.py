@@ -0,0 +1,126 @@
+"""
+向量索引自动选择
+    建索引: 按集合行数及内存预算选择索引类型
+        行数 <= flat_max_rows: FLAT, 精确检索, 无图/聚类开销
+        HNSW 内存(原始向量 + 邻接表)在预算内: HNSW, 大集合增大 M / efConstruction
+        超出预算: DISKANN(enable_diskann) 或 IVF_PQ(向量压缩为 dim/8 字节)
+    检索: 按 top_k 及延迟目标设置 ef / nprobe / search_list, 延迟目标越宽松探查范围越大
+数据增长后仅升级索引(FLAT -> HNSW -> IVF_PQ/DISKANN), 不因删除数据降级, 避免反复重建
+"""
+import math
+from typing import Dict, Optional
+
+from readbetween.config import settings
+
+INDEX_FLAT = "FLAT"
+INDEX_HNSW = "HNSW"
+INDEX_IVF_PQ = "IVF_PQ"
+INDEX_DISKANN = "DISKANN"
+
+# 索引升级顺序
+_INDEX_RANK = {INDEX_FLAT: 0, INDEX_HNSW: 1, INDEX_IVF_PQ: 2, INDEX_DISKANN: 2}
+# 该行数以上的 HNSW 使用更大的 M 保证召回
+_HNSW_LARGE_ROWS = 1_000_000
+# 延迟目标基准 默认 50ms 时 ef = 4 * top_k, nprobe = nlist 的 3%
+_BASE_SLO_MS = 50
+_BASE_EF_FACTOR = 4
+_BASE_PROBE_RATIO = 0.03
+_MAX_EF = 512
+_MIN_NPROBE = 8
+
+
+class IndexAdvisor:
+
+    @staticmethod
+    def estimate_memory_mb(index_params: Dict, row_count: int, dim: int) -> float:
+        """
+        估算 float 向量集合加载后向量及索引的内存占用(MB)
+        :param index_params: 索引参数
+        :param row_count: 集合行数
+        :param dim: 向量维度
+        """
+        index_type = index_params.get("index_type", INDEX_HNSW).upper()
+        params = index_params.get("params") or {}
+        if index_type == INDEX_HNSW:
+            # 原始向量 + 第 0 层 2M 个 int32 邻居
+            per_row = dim * 4 + params.get("M", 8) * 2 * 4
+        elif index_type == INDEX_IVF_PQ:
+            # PQ 编码 m 字节 + 行号, 另有聚类中心
+            per_row = params.get("m", dim // 8) + 8
+            return (row_count * per_row + params.get("nlist", 1) * dim * 4) / 2 ** 20
+        elif index_type == INDEX_DISKANN:
+            # 内存中仅保留 PQ 编码 原始向量及图位于磁盘
+            per_row = dim // 8 + 8
+        else:
+            per_row = dim * 4
+        return row_count * per_row / 2 ** 20
+
+    @classmethod
+    def choose_index(cls, row_count: int, dim: int, metric_type: str = "L2",
+                     memory_budget_mb: Optional[float] = None) -> Dict:
+        """
+        按集合行数及内存预算选择索引
+        :param row_count: 集合行数(新建集合为 0)
+        :param dim: 向量维度
+        :param metric_type: 距离度量
+        :param memory_budget_mb: 内存预算, 为空时使用 storage.milvus.index_memory_budget_mb
+        :return: 索引参数
+        """
+        milvus_config = settings.storage.milvus
+        if memory_budget_mb is None:
+            memory_budget_mb = milvus_config.index_memory_budget_mb
+        if row_count <= milvus_config.flat_max_rows:
+            return {"index_type": INDEX_FLAT, "metric_type": metric_type, "params": {}}
+        if row_count < _HNSW_LARGE_ROWS:
+            hnsw_params = {"M": 8, "efConstruction": 64}
+        else:
+            hnsw_params = {"M": 16, "efConstruction": 128}
+        hnsw = {"index_type": INDEX_HNSW, "metric_type": metric_type, "params": hnsw_params}
+        if cls.estimate_memory_mb(hnsw, row_count, dim) <= memory_budget_mb:
+            return hnsw
+        if milvus_config.enable_diskann:
+            return {"index_type": INDEX_DISKANN, "metric_type": metric_type, "params": {}}
+        # nlist 约为 4 * sqrt(N), 每个子空间 8 维编码为 1 字节
+        nlist = min(max(int(4 * math.sqrt(row_count)), 64), 65536)
+        m = dim // 8 if dim % 8 == 0 else dim
+        return {"index_type": INDEX_IVF_PQ, "metric_type": metric_type,
+                "params": {"nlist": nlist, "m": m, "nbits": 8}}
+
+    @staticmethod
+    def should_rebuild(current_params: Optional[Dict], advised_params: Dict) -> bool:
+        """建议的索引等级高于当前索引时重建, 未知索引类型(量化存储等)不重建"""
+        if not current_params:
+            return False
+        current_rank = _INDEX_RANK.get(str(current_params.get("index_type", "")).upper())
+        advised_rank = _INDEX_RANK.get(advised_params["index_type"])
+        if current_rank is None or advised_rank is None:
+            return False
+        return advised_rank > current_rank
+
+    @staticmethod
+    def search_params(index_params: Dict, top_k: int, latency_slo_ms: Optional[int] = None) -> Dict:
+        """
+        按索引类型、召回数量及延迟目标生成检索参数
+        :param index_params: 集合向量字段的索引参数
+        :param top_k: 召回数量
+        :param latency_slo_ms: 延迟目标(毫秒), 为空时使用 storage.milvus.search_latency_slo_ms
+        :return: 检索参数
+        """
+        if latency_slo_ms is None:
+            latency_slo_ms = settings.storage.milvus.search_latency_slo_ms
+        scale = min(max(latency_slo_ms / _BASE_SLO_MS, 0.5), 4)
+        index_type = str(index_params.get("index_type", "")).upper()
+        build_params = index_params.get("params") or {}
+        if index_type == INDEX_HNSW:
+            # Milvus 要求 ef >= top_k
+            ef = min(max(int(top_k * _BASE_EF_FACTOR * scale), 16), _MAX_EF)
+            params = {"ef": max(ef, top_k)}
+        elif index_type == INDEX_DISKANN:
+            params = {"search_list": max(int(top_k * _BASE_EF_FACTOR * scale), top_k, 16)}
+        elif "nlist" in build_params:
+            nlist = int(build_params["nlist"])
+            nprobe = max(int(nlist * _BASE_PROBE_RATIO * scale), _MIN_NPROBE)
+            params = {"nprobe": min(nprobe, nlist)}
+        else:
+            params = {}
+        return {"metric_type": index_params.get("metric_type", "L2"), "params": params}
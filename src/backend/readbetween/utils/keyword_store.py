@@ -0,0 +1,85 @@
+import asyncio
+import threading
+from abc import ABC, abstractmethod
+from typing import Optional
+
+from readbetween.config import settings
+
+KEYWORD_STORE_BACKEND_ES = "es"
+KEYWORD_STORE_BACKEND_LOCAL = "local"
+
+
+class KeywordStore(ABC):
+    """
+    关键词检索存储抽象
+        es: ElasticSearchUtil, Elasticsearch 集群
+        local: LocalKeywordStore, 进程内 BM25 倒排索引, 适用于边缘/小规模部署
+    检索结果格式与 ES 一致: {"id", "score", "index_name", "document": {"text", "metadata"}}
+    """
+
+    @abstractmethod
+    def create_index(self, index_name):
+        ...
+
+    @abstractmethod
+    def save_document(self, save_document, routing=None):
+        ...
+
+    @abstractmethod
+    def delete_index(self, index_name):
+        ...
+
+    @abstractmethod
+    def delete_knowledge_documents(self, index_name, knowledge_id, routing=None):
+        ...
+
+    @abstractmethod
+    def delete_file_documents(self, index_name, file_id, routing=None):
+        ...
+
+    @abstractmethod
+    def reindex(self, source_index, dest_index, routing=None, op_type=None):
+        ...
+
+    @abstractmethod
+    def search_documents(self, index_names, query, size=10, fields=None, knowledge_ids=None,
+                         retrieval_filter=None):
+        ...
+
+    @abstractmethod
+    async def async_search_documents(self, index_names, query, size=10, fields=None, knowledge_ids=None,
+                                     retrieval_filter=None):
+        ...
+
+    async def async_msearch_documents(self, index_names, queries, size=10, fields=None, knowledge_ids=None,
+                                      retrieval_filter=None):
+        """
+        批量检索，返回与 queries 顺序一致的各查询结果，默认逐条检索。
+        """
+        return list(await asyncio.gather(*[
+            self.async_search_documents(index_names, query, size, fields, knowledge_ids, retrieval_filter)
+            for query in queries
+        ]))
+
+
+_keyword_store: Optional[KeywordStore] = None
+_keyword_store_lock = threading.Lock()
+
+
+def get_keyword_store() -> KeywordStore:
+    """
+    按配置 storage.keyword_store.backend 获取关键词检索存储实例(进程内单例)
+    """
+    global _keyword_store
+    with _keyword_store_lock:
+        if _keyword_store is None:
+            backend = settings.storage.keyword_store.backend
+            if backend == KEYWORD_STORE_BACKEND_LOCAL:
+                from readbetween.utils.local_keyword_store import LocalKeywordStore
+                _keyword_store = LocalKeywordStore()
+            elif backend == KEYWORD_STORE_BACKEND_ES:
+                from readbetween.utils.elasticsearch_util import ElasticSearchUtil
+                _keyword_store = ElasticSearchUtil()
+            else:
+                raise ValueError(f"不支持的关键词检索后端: {backend}")
+    return _keyword_store
@@ -0,0 +1,650 @@
+import json
+import math
+import os
+import re
+import shutil
+import threading
+import uuid
+from collections import Counter
+from contextlib import contextmanager
+from typing import Callable, Dict, List, Optional, Tuple
+
+import jieba
+import numpy as np
+
+from readbetween.config import settings
+from readbetween.utils.keyword_store import KeywordStore
+from readbetween.utils.logger_util import logger_util
+
+try:
+    import fcntl
+except ImportError:  # 非 POSIX 系统仅支持单进程写入
+    fcntl = None
+
+SEGMENT_META_FILE_NAME = "meta.json"
+# 无知识库ID的文档写入默认段
+DEFAULT_SEGMENT_NAME = "_default"
+# 增量日志中的新增文档数达到该值时合并为新的只读段文件
+MERGE_THRESHOLD = 2000
+BM25_K1 = 1.2
+BM25_B = 0.75
+# 词频上限 postings 以 uint16 存储
+MAX_TERM_FREQ = np.iinfo(np.uint16).max
+
+_NAME_PATTERN = re.compile(r"^[\w\-]+$")
+_TOKEN_PATTERN = re.compile(r"\w")
+
+
+def tokenize(text: str) -> List[str]:
+    """jieba 搜索引擎模式分词，忽略标点与空白"""
+    return [token for token in jieba.lcut_for_search((text or "").lower()) if _TOKEN_PATTERN.search(token)]
+
+
+def _filter_source(document: Dict, fields) -> Dict:
+    # 与 ES _source 过滤一致 支持 metadata.title 形式的嵌套字段
+    if not fields:
+        return document
+    if isinstance(fields, dict):
+        excludes = set(fields.get("excludes", []))
+        document = {key: value for key, value in document.items() if key not in excludes}
+        if isinstance(document.get("metadata"), dict):
+            document["metadata"] = {key: value for key, value in document["metadata"].items()
+                                    if f"metadata.{key}" not in excludes}
+        return document
+    filtered: Dict = {}
+    for field in fields:
+        parts = field.split(".")
+        value, target = document, filtered
+        for i, part in enumerate(parts):
+            if not isinstance(value, dict) or part not in value:
+                break
+            value = value[part]
+            if i == len(parts) - 1:
+                target[part] = value
+            else:
+                target = target.setdefault(part, {})
+    return filtered
+
+
+class _Segment:
+    """
+    单个知识库在某个索引中的数据段
+        base.{generation}.*: 只读段文件, postings 以 numpy 数组存储并 memmap 读取
+            terms.json(词 -> [起始位置, 文档频率]) / doc_ids.npy / tfs.npy / lengths.npy
+            docs.jsonl + doc_offsets.npy(按序号随机读取原文) / ids.json / files.json(文件ID -> 序号)
+        ops.{generation}.jsonl: 合并后的增量日志(新增/删除), 启动时回放
+    增量文档达到阈值时合并为新一代只读段文件, 其他进程通过 meta.json 修改时间感知
+    """
+
+    def __init__(self, index_name: str, name: str, path: str):
+        self.index_name = index_name
+        self.name = name
+        self.path = path
+        self.lock = threading.RLock()
+        self.generation = None
+        self._meta_mtime = None
+        self._reset()
+
+    def _file(self, name: str, generation: int = None) -> str:
+        generation = self.generation if generation is None else generation
+        return os.path.join(self.path, name.format(generation=generation))
+
+    def _reset(self):
+        self.terms: Dict[str, list] = {}
+        self.doc_ids = np.zeros(0, dtype=np.int32)
+        self.tfs = np.zeros(0, dtype=np.uint16)
+        self.lengths = np.zeros(0, dtype=np.int32)
+        self.doc_offsets = np.zeros(1, dtype=np.int64)
+        self.base_ids: List[str] = []
+        self.base_id_to_ord: Dict[str, int] = {}
+        self.base_files: Dict[str, List[int]] = {}
+        self.base_deleted = np.zeros(0, dtype=bool)
+        # 增量文档 ID -> (文档, 词频, 长度)
+        self.pending: Dict[str, Tuple[Dict, Dict[str, int], int]] = {}
+        # 增量倒排 词 -> {文档ID: 词频}
+        self.pending_terms: Dict[str, Dict[str, int]] = {}
+        self._ops_offset = 0
+
+    @property
+    def base_count(self) -> int:
+        return len(self.base_ids)
+
+    @property
+    def doc_count(self) -> int:
+        return int(self.base_count - self.base_deleted.sum()) + len(self.pending)
+
+    @property
+    def total_length(self) -> int:
+        base_length = int(self.lengths[~self.base_deleted].sum()) if self.base_count else 0
+        return base_length + sum(length for _, _, length in self.pending.values())
+
+    def doc_freq(self, term: str) -> int:
+        # 只读段中已删除文档仍计入文档频率 与 Lucene 一致 合并后修正
+        entry = self.terms.get(term)
+        return (entry[1] if entry else 0) + len(self.pending_terms.get(term, ()))
+
+    def has_document(self, doc_id: str) -> bool:
+        ordinal = self.base_id_to_ord.get(doc_id)
+        return doc_id in self.pending or (ordinal is not None and not self.base_deleted[ordinal])
+
+    def refresh(self):
+        """加载其他进程写入的数据，段已被删除时抛出 FileNotFoundError"""
+        meta_path = os.path.join(self.path, SEGMENT_META_FILE_NAME)
+        mtime = os.stat(meta_path).st_mtime_ns
+        if mtime != self._meta_mtime:
+            with open(meta_path, "r", encoding="utf-8") as f:
+                generation = json.load(f)["generation"]
+            if generation != self.generation:
+                self._reset()
+                self.generation = generation
+                self._load_base()
+            self._meta_mtime = mtime
+
+        ops_path = self._file("ops.{generation}.jsonl")
+        try:
+            ops_size = os.path.getsize(ops_path)
+        except FileNotFoundError:
+            return
+        if ops_size <= self._ops_offset:
+            return
+        with open(ops_path, "rb") as f:
+            f.seek(self._ops_offset)
+            data = f.read(ops_size - self._ops_offset)
+        end = data.rfind(b"\n") + 1
+        self._ops_offset += end
+        for line in data[:end].splitlines():
+            self._apply(json.loads(line))
+
+    def _load_base(self):
+        terms_path = self._file("base.{generation}.terms.json")
+        if not os.path.exists(terms_path):
+            return
+        with open(terms_path, "r", encoding="utf-8") as f:
+            self.terms = json.load(f)
+        with open(self._file("base.{generation}.ids.json"), "r", encoding="utf-8") as f:
+            self.base_ids = json.load(f)
+        with open(self._file("base.{generation}.files.json"), "r", encoding="utf-8") as f:
+            self.base_files = json.load(f)
+        self.base_id_to_ord = {doc_id: ordinal for ordinal, doc_id in enumerate(self.base_ids)}
+        self.base_deleted = np.zeros(len(self.base_ids), dtype=bool)
+        if self.terms:
+            self.doc_ids = np.load(self._file("base.{generation}.doc_ids.npy"), mmap_mode="r")
+            self.tfs = np.load(self._file("base.{generation}.tfs.npy"), mmap_mode="r")
+        if self.base_ids:
+            self.lengths = np.load(self._file("base.{generation}.lengths.npy"), mmap_mode="r")
+            self.doc_offsets = np.load(self._file("base.{generation}.doc_offsets.npy"), mmap_mode="r")
+
+    def _apply(self, op: Dict):
+        if op["op"] == "add":
+            self._delete_ids([op["id"]])
+            term_freqs = op["tf"]
+            self.pending[op["id"]] = (op["doc"], term_freqs, op["len"])
+            for term, tf in term_freqs.items():
+                self.pending_terms.setdefault(term, {})[op["id"]] = tf
+        elif op["op"] == "del":
+            self._delete_ids(op["ids"])
+        elif op["op"] == "del_file":
+            for ordinal in self.base_files.get(op["file_id"], []):
+                self.base_deleted[ordinal] = True
+            self._delete_ids([doc_id for doc_id, (doc, _, _) in self.pending.items()
+                              if (doc.get("metadata") or {}).get("file_id") == op["file_id"]])
+
+    def _delete_ids(self, doc_ids: List[str]):
+        for doc_id in doc_ids:
+            ordinal = self.base_id_to_ord.get(doc_id)
+            if ordinal is not None:
+                self.base_deleted[ordinal] = True
+            pending = self.pending.pop(doc_id, None)
+            if pending is not None:
+                for term in pending[1]:
+                    postings = self.pending_terms.get(term)
+                    if postings is not None:
+                        postings.pop(doc_id, None)
+                        if not postings:
+                            del self.pending_terms[term]
+
+    def has_file(self, file_id: str) -> bool:
+        if any(not self.base_deleted[ordinal] for ordinal in self.base_files.get(file_id, [])):
+            return True
+        return any((doc.get("metadata") or {}).get("file_id") == file_id for doc, _, _ in self.pending.values())
+
+    def append_ops(self, ops: List[Dict]):
+        """追加增量日志，调用方需持有段文件锁"""
+        with open(self._file("ops.{generation}.jsonl"), "ab") as f:
+            f.write("".join(json.dumps(op, ensure_ascii=False) + "\n" for op in ops).encode("utf-8"))
+            f.flush()
+            os.fsync(f.fileno())
+        self.refresh()
+        if len(self.pending) >= MERGE_THRESHOLD:
+            self.merge()
+
+    def read_documents(self, ordinals: List[int]) -> List[Dict]:
+        if not ordinals:
+            return []
+        documents = []
+        with open(self._file("base.{generation}.docs.jsonl"), "rb") as f:
+            for ordinal in ordinals:
+                start, end = int(self.doc_offsets[ordinal]), int(self.doc_offsets[ordinal + 1])
+                f.seek(start)
+                documents.append(json.loads(f.read(end - start)))
+        return documents
+
+    def iter_documents(self):
+        """遍历未删除的文档 (文档ID, 文档)"""
+        live_ordinals = np.flatnonzero(~self.base_deleted).tolist()
+        for start in range(0, len(live_ordinals), 1000):
+            batch = live_ordinals[start:start + 1000]
+            for ordinal, document in zip(batch, self.read_documents(batch)):
+                yield self.base_ids[ordinal], document
+        for doc_id, (document, _, _) in list(self.pending.items()):
+            yield doc_id, document
+
+    def merge(self):
+        """将未删除的只读段文档与增量文档合并为新一代只读段文件，调用方需持有段文件锁"""
+        generation = self.generation + 1
+        live = np.flatnonzero(~self.base_deleted)
+        remap = np.full(self.base_count, -1, dtype=np.int64)
+        remap[live] = np.arange(len(live))
+        pending_items = list(self.pending.items())
+
+        # 只读段 postings 剔除已删除文档并重新编号 增量文档编号接在其后
+        postings: Dict[str, List[Tuple[np.ndarray, np.ndarray]]] = {}
+        for term, (start, count) in self.terms.items():
+            ordinals = np.asarray(self.doc_ids[start:start + count])
+            keep = remap[ordinals] >= 0
+            if keep.any():
+                postings[term] = [(remap[ordinals[keep]], np.asarray(self.tfs[start:start + count])[keep])]
+        pending_postings: Dict[str, Tuple[list, list]] = {}
+        for offset, (_, (_, term_freqs, _)) in enumerate(pending_items):
+            for term, tf in term_freqs.items():
+                ordinals, tfs = pending_postings.setdefault(term, ([], []))
+                ordinals.append(len(live) + offset)
+                tfs.append(min(tf, MAX_TERM_FREQ))
+        for term, (ordinals, tfs) in pending_postings.items():
+            postings.setdefault(term, []).append((np.asarray(ordinals), np.asarray(tfs)))
+
+        terms, doc_id_arrays, tf_arrays, position = {}, [], [], 0
+        for term in sorted(postings):
+            term_doc_ids = np.concatenate([ordinals for ordinals, _ in postings[term]])
+            terms[term] = [position, len(term_doc_ids)]
+            doc_id_arrays.append(term_doc_ids.astype(np.int32))
+            tf_arrays.append(np.concatenate([tfs for _, tfs in postings[term]]).astype(np.uint16))
+            position += len(term_doc_ids)
+
+        ids = [self.base_ids[ordinal] for ordinal in live.tolist()] + [doc_id for doc_id, _ in pending_items]
+        lengths = np.concatenate([np.asarray(self.lengths)[live] if self.base_count else np.zeros(0),
+                                  [length for _, (_, _, length) in pending_items]]).astype(np.int32)
+        files: Dict[str, List[int]] = {}
+        offsets = [0]
+        with open(self._file("base.{generation}.docs.jsonl", generation), "wb") as f:
+            for new_ordinal, (_, document) in enumerate(self.iter_documents()):
+                line = json.dumps(document, ensure_ascii=False).encode("utf-8") + b"\n"
+                f.write(line)
+                offsets.append(offsets[-1] + len(line))
+                file_id = (document.get("metadata") or {}).get("file_id")
+                if file_id is not None:
+                    files.setdefault(str(file_id), []).append(new_ordinal)
+            f.flush()
+            os.fsync(f.fileno())
+
+        np.save(self._file("base.{generation}.doc_ids.npy", generation),
+                np.concatenate(doc_id_arrays) if doc_id_arrays else np.zeros(0, dtype=np.int32))
+        np.save(self._file("base.{generation}.tfs.npy", generation),
+                np.concatenate(tf_arrays) if tf_arrays else np.zeros(0, dtype=np.uint16))
+        np.save(self._file("base.{generation}.lengths.npy", generation), lengths)
+        np.save(self._file("base.{generation}.doc_offsets.npy", generation), np.asarray(offsets, dtype=np.int64))
+        for name, value in (("ids", ids), ("files", files), ("terms", terms)):
+            with open(self._file(f"base.{{generation}}.{name}.json", generation), "w", encoding="utf-8") as f:
+                json.dump(value, f, ensure_ascii=False)
+
+        old_generation = self.generation
+        write_segment_meta(self.path, generation)
+        for file_name in os.listdir(self.path):
+            if file_name.startswith((f"base.{old_generation}.", f"ops.{old_generation}.")):
+                try:
+                    os.remove(os.path.join(self.path, file_name))
+                except OSError:
+                    pass
+        self.refresh()
+        logger_util.info(f"关键词索引 {self.index_name}/{self.name} 合并完成, 文档数 {len(ids)}")
+
+    def search(self, term_idfs: Dict[str, float], avg_length: float, size: int,
+               predicate: Optional[Callable[[Dict], bool]] = None) -> List[Tuple[float, str, Dict]]:
+        """
+        BM25 检索
+        :param term_idfs: 查询词 -> 全局 IDF
+        :param avg_length: 全局平均文档长度
+        :param size: 返回数量
+        :param predicate: 文档过滤条件, 按分数从高到低读取文档直至满足条件的文档达到返回数量
+        :return: [(分数, 文档ID, 文档)]
+        """
+        candidates: List[Tuple[float, str, Optional[int], Optional[Dict]]] = []
+        if self.base_count:
+            scores = np.zeros(self.base_count, dtype=np.float32)
+            for term, idf in term_idfs.items():
+                entry = self.terms.get(term)
+                if not entry:
+                    continue
+                start, count = entry
+                ordinals = np.asarray(self.doc_ids[start:start + count])
+                tfs = np.asarray(self.tfs[start:start + count], dtype=np.float32)
+                norms = BM25_K1 * (1 - BM25_B + BM25_B * np.asarray(self.lengths)[ordinals] / avg_length)
+                scores[ordinals] += idf * tfs * (BM25_K1 + 1) / (tfs + norms)
+            scores[self.base_deleted] = 0
+            if predicate is None:
+                top_n = min(size, self.base_count)
+                top = np.argpartition(-scores, top_n - 1)[:top_n]
+                candidates.extend((float(scores[ordinal]), self.base_ids[ordinal], int(ordinal), None)
+                                  for ordinal in top.tolist() if scores[ordinal] > 0)
+            else:
+                ordinals = np.flatnonzero(scores > 0)
+                ordinals = ordinals[np.argsort(-scores[ordinals], kind="stable")].tolist()
+                matched = 0
+                for start in range(0, len(ordinals), size):
+                    batch = ordinals[start:start + size]
+                    for ordinal, document in zip(batch, self.read_documents(batch)):
+                        if predicate(document):
+                            candidates.append((float(scores[ordinal]), self.base_ids[ordinal], None, document))
+                            matched += 1
+                    if matched >= size:
+                        break
+
+        pending_scores: Dict[str, float] = {}
+        for term, idf in term_idfs.items():
+            for doc_id, tf in self.pending_terms.get(term, {}).items():
+                norm = BM25_K1 * (1 - BM25_B + BM25_B * self.pending[doc_id][2] / avg_length)
+                pending_scores[doc_id] = pending_scores.get(doc_id, 0.0) + idf * tf * (BM25_K1 + 1) / (tf + norm)
+        candidates.extend((score, doc_id, None, self.pending[doc_id][0]) for doc_id, score in pending_scores.items()
+                          if predicate is None or predicate(self.pending[doc_id][0]))
+
+        candidates = sorted(candidates, key=lambda candidate: candidate[0], reverse=True)[:size]
+        base_documents = iter(self.read_documents([ordinal for _, _, ordinal, _ in candidates if ordinal is not None]))
+        return [(score, doc_id, document if document is not None else next(base_documents))
+                for score, doc_id, ordinal, document in candidates]
+
+
+def write_segment_meta(path: str, generation: int):
+    tmp_path = os.path.join(path, f"{SEGMENT_META_FILE_NAME}.tmp")
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump({"generation": generation}, f)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, os.path.join(path, SEGMENT_META_FILE_NAME))
+
+
+class LocalKeywordStore(KeywordStore):
+    """
+    进程内 BM25 关键词检索，接口与 ElasticSearchUtil 一致
+        1. 索引按知识库划分数据段，检索时仅访问相关知识库的数据段
+        2. jieba 分词，BM25 打分，IDF 与平均文档长度按检索的全部数据段统计
+        3. 新增/删除追加写入增量日志，达到阈值后合并为 memmap 读取的只读段文件
+    多进程(Web/Celery)通过文件锁串行写入，读取时增量加载其他进程写入的数据
+    仅支持字符串查询，字典形式的 DSL 查询仅解析 multi_match/match 的查询文本
+    """
+
+    def __init__(self, path: str = None):
+        self.path = os.path.abspath(path or settings.storage.keyword_store.local_path)
+        os.makedirs(self.path, exist_ok=True)
+        self._lock = threading.Lock()
+        self._segments: Dict[Tuple[str, str], _Segment] = {}
+
+    def _index_path(self, index_name: str) -> str:
+        if not _NAME_PATTERN.match(index_name or ""):
+            raise ValueError(f"非法的索引名称: {index_name}")
+        return os.path.join(self.path, index_name)
+
+    @staticmethod
+    def _segment_name(knowledge_id) -> str:
+        if not knowledge_id:
+            return DEFAULT_SEGMENT_NAME
+        if not _NAME_PATTERN.match(str(knowledge_id)):
+            raise ValueError(f"非法的知识库ID: {knowledge_id}")
+        return str(knowledge_id)
+
+    @contextmanager
+    def _file_lock(self, index_name: str, segment_name: str):
+        with open(os.path.join(self._index_path(index_name), f".{segment_name}.lock"), "a") as lock_file:
+            if fcntl is not None:
+                fcntl.flock(lock_file, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                if fcntl is not None:
+                    fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    def _list_segment_names(self, index_name: str) -> List[str]:
+        index_path = self._index_path(index_name)
+        if not os.path.isdir(index_path):
+            return []
+        return [name for name in os.listdir(index_path)
+                if os.path.exists(os.path.join(index_path, name, SEGMENT_META_FILE_NAME))]
+
+    def _get_segment(self, index_name: str, segment_name: str, create: bool = False) -> Optional[_Segment]:
+        path = os.path.join(self._index_path(index_name), segment_name)
+        if create and not os.path.exists(os.path.join(path, SEGMENT_META_FILE_NAME)):
+            os.makedirs(path, exist_ok=True)
+            write_segment_meta(path, 0)
+        key = (index_name, segment_name)
+        with self._lock:
+            segment = self._segments.get(key)
+            if segment is None:
+                if not os.path.exists(os.path.join(path, SEGMENT_META_FILE_NAME)):
+                    return None
+                segment = _Segment(index_name, segment_name, path)
+                self._segments[key] = segment
+        try:
+            with segment.lock:
+                segment.refresh()
+        except FileNotFoundError:
+            # 数据段已被其他进程删除
+            with self._lock:
+                self._segments.pop(key, None)
+            return None
+        return segment
+
+    def _forget(self, index_name: str, segment_name: str = None):
+        with self._lock:
+            for key in list(self._segments):
+                if key[0] == index_name and (segment_name is None or key[1] == segment_name):
+                    del self._segments[key]
+
+    def create_index(self, index_name):
+        """
+        创建索引目录，索引已存在时跳过。
+        :param index_name: 索引名称。
+        """
+        os.makedirs(self._index_path(index_name), exist_ok=True)
+
+    def _add_documents(self, index_name: str, segment_name: str, documents: List[Tuple[str, Dict]]):
+        ops = []
+        for doc_id, document in documents:
+            tokens = tokenize(f"{(document.get('metadata') or {}).get('title', '')}\n{document.get('text', '')}")
+            ops.append({"op": "add", "id": doc_id, "doc": document, "tf": dict(Counter(tokens)), "len": len(tokens)})
+        self.create_index(index_name)
+        with self._file_lock(index_name, segment_name):
+            segment = self._get_segment(index_name, segment_name, create=True)
+            with segment.lock:
+                segment.append_ops(ops)
+
+    def save_document(self, save_document, routing=None):
+        """
+        保存文档，共享索引与独立索引均按知识库划分数据段。
+        :param save_document: 要保存的文档对象。
+        :param routing: 路由值，共享索引模式下为 knowledge_id。
+        """
+        try:
+            document = save_document.to_dict()
+            segment_name = self._segment_name(routing or (document.get("metadata") or {}).get("knowledge_id"))
+            self._add_documents(save_document.index_name, segment_name, [(uuid.uuid4().hex, document)])
+        except Exception as e:
+            logger_util.error(f"保存文档失败: {e}")
+            raise Exception(f"保存文档失败: {e}")
+
+    def delete_index(self, index_name):
+        """
+        删除指定索引。
+        :param index_name: 要删除的索引名称。
+        """
+        index_path = self._index_path(index_name)
+        self._forget(index_name)
+        if os.path.exists(index_path):
+            shutil.rmtree(index_path)
+            logger_util.info(f"索引 {index_name} 已删除。")
+        else:
+            logger_util.warning(f"索引 {index_name} 不存在，无需删除。")
+
+    def delete_knowledge_documents(self, index_name, knowledge_id, routing=None):
+        """
+        删除索引中指定知识库的数据段。
+        :param index_name: 索引名称。
+        :param knowledge_id: 知识库ID。
+        :param routing: 路由值，本地索引已按知识库划分数据段，忽略。
+        :return: 删除结果。
+        """
+        segment_name = self._segment_name(knowledge_id)
+        segment_path = os.path.join(self._index_path(index_name), segment_name)
+        if not os.path.exists(segment_path):
+            return {"deleted_count": 0}
+        with self._file_lock(index_name, segment_name):
+            segment = self._get_segment(index_name, segment_name)
+            deleted_count = segment.doc_count if segment else 0
+            self._forget(index_name, segment_name)
+            shutil.rmtree(segment_path, ignore_errors=True)
+        logger_util.info(f"成功删除 {deleted_count} 条文档。")
+        return {"deleted_count": deleted_count}
+
+    def delete_file_documents(self, index_name, file_id, routing=None):
+        """
+        删除索引中指定文件的全部文档。
+        :param index_name: 索引名称。
+        :param file_id: 文件ID。
+        :param routing: 路由值(knowledge_id)，指定时仅访问该知识库数据段。
+        :return: 删除结果。
+        """
+        segment_names = [self._segment_name(routing)] if routing else self._list_segment_names(index_name)
+        deleted_count = 0
+        for segment_name in segment_names:
+            segment = self._get_segment(index_name, segment_name)
+            if segment is None or not segment.has_file(file_id):
+                continue
+            with self._file_lock(index_name, segment_name):
+                segment = self._get_segment(index_name, segment_name)
+                if segment is None:
+                    continue
+                with segment.lock:
+                    doc_count = segment.doc_count
+                    segment.append_ops([{"op": "del_file", "file_id": file_id}])
+                    deleted_count += doc_count - segment.doc_count
+        logger_util.info(f"成功删除 {deleted_count} 条文档。")
+        return {"deleted_count": deleted_count}
+
+    def reindex(self, source_index, dest_index, routing=None, op_type=None):
+        """
+        将源索引中的文档复制到目标索引。
+        :param source_index: 源索引名称。
+        :param dest_index: 目标索引名称。
+        :param routing: 目标数据段(knowledge_id)，默认与源数据段一致。
+        :param op_type: 写入方式，"create" 时跳过目标索引中已存在的文档，可选。
+        :return: 复制结果统计。
+        """
+        created = 0
+        for segment_name in self._list_segment_names(source_index):
+            source = self._get_segment(source_index, segment_name)
+            if source is None:
+                continue
+            dest_segment_name = self._segment_name(routing) if routing else segment_name
+            with source.lock:
+                documents = list(source.iter_documents())
+            if op_type == "create":
+                dest = self._get_segment(dest_index, dest_segment_name)
+                if dest is not None:
+                    documents = [(doc_id, document) for doc_id, document in documents
+                                 if not dest.has_document(doc_id)]
+            for start in range(0, len(documents), MERGE_THRESHOLD):
+                self._add_documents(dest_index, dest_segment_name, documents[start:start + MERGE_THRESHOLD])
+            created += len(documents)
+        logger_util.info(f"索引 {source_index} -> {dest_index} 复制完成，新增 {created} 条文档。")
+        return {"created": created}
+
+    @staticmethod
+    def _query_text(query) -> str:
+        if isinstance(query, str):
+            return query
+        if isinstance(query, dict):
+            body = query.get("query", query)
+            for clause in ("multi_match", "match"):
+                if clause in body:
+                    value = body[clause]
+                    if "query" in value:
+                        return value["query"]
+                    # match: {"text": "..."} 或 {"text": {"query": "..."}}
+                    inner = next(iter(value.values()), "")
+                    return inner.get("query", "") if isinstance(inner, dict) else inner
+        raise ValueError("本地关键词检索仅支持字符串或 multi_match/match 查询")
+
+    def search_documents(self, index_names, query, size=10, fields=None, knowledge_ids=None,
+                         retrieval_filter=None):
+        """
+        在指定的索引中检索文档，参数与返回格式同 ElasticSearchUtil.search_documents。
+        :return: 查询结果列表。
+        """
+        # 文件及页码范围过滤 在取 top 文档时执行
+        predicate = None if retrieval_filter is None else \
+            (lambda document: retrieval_filter.match(document.get("metadata") or {}))
+
+        try:
+            segments = []
+            for index_name in dict.fromkeys(index_names):
+                segment_names = [self._segment_name(knowledge_id) for knowledge_id in knowledge_ids] \
+                    if knowledge_ids else self._list_segment_names(index_name)
+                segments.extend(segment for segment in (self._get_segment(index_name, name)
+                                                        for name in segment_names) if segment)
+            terms = list(dict.fromkeys(tokenize(self._query_text(query))))
+            if not segments or not terms:
+                return []
+
+            # 去重后按 (索引, 分段) 固定顺序加锁 避免并发检索以不同顺序加锁导致死锁
+            segments = sorted({(segment.index_name, segment.name): segment for segment in segments}.values(),
+                              key=lambda segment: (segment.index_name, segment.name))
+            for segment in segments:
+                segment.lock.acquire()
+            try:
+                # 按检索范围统计全局 IDF 与平均文档长度
+                doc_count = sum(segment.doc_count for segment in segments)
+                if doc_count == 0:
+                    return []
+                avg_length = max(sum(segment.total_length for segment in segments) / doc_count, 1.0)
+                term_idfs = {}
+                for term in terms:
+                    doc_freq = min(sum(segment.doc_freq(term) for segment in segments), doc_count)
+                    if doc_freq:
+                        term_idfs[term] = math.log(1 + (doc_count - doc_freq + 0.5) / (doc_freq + 0.5))
+                hits = []
+                for segment in segments:
+                    segment_hits = segment.search(term_idfs, avg_length, size, predicate)
+                    hits.extend((score, doc_id, document, segment.index_name)
+                                for score, doc_id, document in segment_hits)
+            finally:
+                for segment in segments:
+                    segment.lock.release()
+
+            hits = sorted(hits, key=lambda hit: hit[0], reverse=True)[:size]
+            results = [{
+                "id": doc_id,
+                "score": score,
+                "index_name": index_name,
+                "document": _filter_source(document, fields),
+            } for score, doc_id, document, index_name in hits]
+            logger_util.info(f"本地关键词检索成功，返回结果数量: {len(results)}")
+            return results
+        except Exception as e:
+            logger_util.error(f"在索引 {index_names} 中搜索文档时发生错误: {e}")
+            raise Exception(f"在索引 {index_names} 中搜索文档时发生错误: {e}")
+
+    async def async_search_documents(self, index_names, query, size=10, fields=None, knowledge_ids=None,
+                                     retrieval_filter=None):
+        """
+        进程内检索无网络请求，直接在事件循环中执行，参数同 search_documents。
+        :return: 查询结果列表。
+        """
+        return self.search_documents(index_names, query, size, fields, knowledge_ids, retrieval_filter)
@@ -0,0 +1,139 @@
+import os
+import threading
+import time
+from typing import List, Optional
+
+import numpy as np
+import torch
+from modelscope import snapshot_download
+from modelscope.utils.logger import get_logger
+from transformers import AutoTokenizer, AutoModelForSequenceClassification
+
+try:
+    import onnxruntime as ort
+except ImportError:  # 未安装 onnxruntime 时使用 PyTorch 动态量化模型
+    ort = None
+
+
+class LocalRerankManager:
+    """
+    本地 CPU 交叉编码器重排序模型
+    模型目录包含 ONNX 文件且已安装 onnxruntime 时使用 ONNX 推理, 否则使用 PyTorch int8 动态量化
+    """
+    _instance = None
+    _initialized = False
+
+    # 单例模式
+    def __new__(cls):
+        if not cls._instance:
+            cls._instance = super().__new__(cls)
+        return cls._instance
+
+    def __init__(self):
+        if not self._initialized:
+            self.logger = get_logger()
+            self.tokenizer = None
+            self.model = None
+            self.onnx_session = None
+            self.max_length = 512
+            # 推理串行执行 避免多线程争抢 CPU
+            self._lock = threading.Lock()
+            self._initialized = True
+
+    @property
+    def ready(self) -> bool:
+        return self.tokenizer is not None and (self.model is not None or self.onnx_session is not None)
+
+    def initialize(self, model_name: str, model_dir: str = "models", num_threads: int = 4, max_length: int = 512):
+        """初始化模型（支持依赖注入）"""
+        if self.ready:
+            return
+
+        os.makedirs(model_dir, exist_ok=True)
+        model_path = self._prepare_model(model_name, model_dir)
+        self.max_length = max_length
+
+        try:
+            self.tokenizer = AutoTokenizer.from_pretrained(model_path)
+            onnx_path = self._find_onnx_model(model_path)
+            if ort is not None and onnx_path:
+                session_options = ort.SessionOptions()
+                session_options.intra_op_num_threads = num_threads
+                self.onnx_session = ort.InferenceSession(onnx_path, sess_options=session_options,
+                                                         providers=["CPUExecutionProvider"])
+                self.logger.info(f"重排序模型加载成功(ONNX): {onnx_path}")
+            else:
+                torch.set_num_threads(num_threads)
+                model = AutoModelForSequenceClassification.from_pretrained(model_path)
+                model.eval()
+                self.model = torch.quantization.quantize_dynamic(model, {torch.nn.Linear}, dtype=torch.qint8)
+                self.logger.info("重排序模型加载成功(PyTorch int8 动态量化)")
+        except Exception as e:
+            self.tokenizer = None
+            self.logger.error(f"重排序模型加载失败: {str(e)}")
+            raise RuntimeError(f"重排序模型加载失败: {str(e)}")
+
+    def _prepare_model(self, model_name: str, model_dir: str) -> str:
+        """准备模型文件，返回本地路径"""
+        model_path = os.path.join(model_dir, model_name)
+
+        if not os.path.exists(model_path):
+            self.logger.info(f"开始下载模型: {model_name}")
+            try:
+                model_path = snapshot_download(
+                    model_name,
+                    cache_dir=model_dir,
+                    revision="master"
+                )
+                self.logger.info(f"模型下载完成: {model_path}")
+            except Exception as e:
+                self.logger.error(f"模型下载失败: {str(e)}")
+                raise RuntimeError(f"模型下载失败: {str(e)}")
+        return model_path
+
+    @staticmethod
+    def _find_onnx_model(model_path: str) -> Optional[str]:
+        for candidate in ("model.onnx", os.path.join("onnx", "model.onnx")):
+            onnx_path = os.path.join(model_path, candidate)
+            if os.path.exists(onnx_path):
+                return onnx_path
+        return None
+
+    def score(self, query: str, passages: List[str], batch_size: int = 16,
+              deadline: Optional[float] = None) -> List[Optional[float]]:
+        """
+        计算查询与候选文本的相关性分数
+        :param query: 查询文本
+        :param passages: 候选文本
+        :param batch_size: 每批推理的候选数量
+        :param deadline: 截止时间(time.monotonic)，超时后剩余候选不再打分
+        :return: 与 passages 对应的分数列表，未打分的候选为 None
+        """
+        if not self.ready:
+            raise RuntimeError("重排序模型未初始化")
+
+        scores: List[Optional[float]] = [None] * len(passages)
+        with self._lock:
+            for start in range(0, len(passages), batch_size):
+                if deadline is not None and time.monotonic() >= deadline:
+                    self.logger.warning(f"重排序超出时间预算, 已打分 {start}/{len(passages)}")
+                    break
+                batch = passages[start:start + batch_size]
+                for offset, batch_score in enumerate(self._score_batch(query, batch)):
+                    scores[start + offset] = float(batch_score)
+        return scores
+
+    def _score_batch(self, query: str, passages: List[str]) -> np.ndarray:
+        if self.onnx_session is not None:
+            features = self.tokenizer([query] * len(passages), passages, padding=True, truncation=True,
+                                      max_length=self.max_length, return_tensors="np")
+            input_names = {model_input.name for model_input in self.onnx_session.get_inputs()}
+            logits = self.onnx_session.run(None, {name: value.astype(np.int64)
+                                                  for name, value in features.items() if name in input_names})[0]
+            return logits.reshape(len(passages), -1)[:, 0]
+
+        features = self.tokenizer([query] * len(passages), passages, padding=True, truncation=True,
+                                  max_length=self.max_length, return_tensors="pt")
+        with torch.inference_mode():
+            logits = self.model(**features).logits
+        return logits.view(len(passages), -1)[:, 0].float().numpy()
@@ -0,0 +1,694 @@
+import ast
+import asyncio
+import json
+import operator
+import os
+import re
+import shutil
+import threading
+from contextlib import contextmanager
+from typing import Dict, List, Optional
+
+import numpy as np
+
+from readbetween.config import settings
+from readbetween.services.constant import MILVUS_EMBEDDING_FIELD_NAME
+from readbetween.utils.logger_util import logger_util
+from readbetween.utils.vector_store import VectorStore
+
+try:
+    import fcntl
+except ImportError:  # 非 POSIX 系统仅支持单进程写入
+    fcntl = None
+
+try:
+    import hnswlib
+except ImportError:  # 未安装 hnswlib 时仅使用精确检索
+    hnswlib = None
+
+SCHEMA_FILE_NAME = "schema.json"
+# 建立倒排索引的字段 用于知识库/文件过滤
+INDEXED_FIELDS = ("knowledge_id", "file_id")
+# 已删除行数超过总行数比例且不少于最小行数时压缩数据文件
+COMPACT_RATIO = 0.5
+COMPACT_MIN_ROWS = 1000
+COMPACT_BATCH_SIZE = 10000
+
+_COLLECTION_NAME_PATTERN = re.compile(r"^[\w\-]+$")
+_AND_PATTERN = re.compile(r"\s+and\s+|\s*&&\s*", re.IGNORECASE)
+_CLAUSE_PATTERN = re.compile(r"^\s*(\w+)\s*(==|!=|>=|<=|>|<|not\s+in|in)\s*(.+?)\s*$",
+                             re.IGNORECASE | re.DOTALL)
+_COMPARE_OPS = {">": operator.gt, ">=": operator.ge, "<": operator.lt, "<=": operator.le}
+_HNSW_SPACES = {"L2": "l2", "IP": "ip", "COSINE": "cosine"}
+
+
+def _split_top_level_and(expr: str) -> List[str]:
+    # 在括号与字符串之外按 and 拆分
+    parts, depth, quote, start, i = [], 0, None, 0, 0
+    while i < len(expr):
+        ch = expr[i]
+        if quote:
+            if ch == "\\":
+                i += 2
+                continue
+            if ch == quote:
+                quote = None
+        elif ch in "'\"":
+            quote = ch
+        elif ch in "([":
+            depth += 1
+        elif ch in ")]":
+            depth -= 1
+        elif depth == 0:
+            match = _AND_PATTERN.match(expr, i)
+            if match:
+                parts.append(expr[start:i])
+                start = i = match.end()
+                continue
+        i += 1
+    parts.append(expr[start:])
+    return parts
+
+
+def _is_wrapped(expr: str) -> bool:
+    if not (expr.startswith("(") and expr.endswith(")")):
+        return False
+    depth, quote = 0, None
+    for i, ch in enumerate(expr):
+        if quote:
+            if ch == quote:
+                quote = None
+        elif ch in "'\"":
+            quote = ch
+        elif ch == "(":
+            depth += 1
+        elif ch == ")":
+            depth -= 1
+            if depth == 0:
+                return i == len(expr) - 1
+    return False
+
+
+def parse_expr(expr: str) -> List[tuple]:
+    """
+    解析 Milvus 过滤表达式，仅支持 ==、!=、in、not in、>、>=、<、<= 及 and 组合
+    :param expr: 过滤表达式
+    :return: [(字段, 运算符, 取值集合)]
+    """
+    expr = (expr or "").strip()
+    if not expr:
+        return []
+    parts = _split_top_level_and(expr)
+    if len(parts) > 1:
+        return [clause for part in parts for clause in parse_expr(part)]
+    if _is_wrapped(expr):
+        return parse_expr(expr[1:-1])
+    match = _CLAUSE_PATTERN.match(expr)
+    if match:
+        field, op, raw_value = match.groups()
+        op = " ".join(op.lower().split())
+        try:
+            value = ast.literal_eval(raw_value)
+            values = set(value) if op in ("in", "not in") else {value}
+            return [(field, op, values)]
+        except (ValueError, SyntaxError, TypeError):
+            pass
+    raise ValueError(f"本地向量存储不支持的过滤表达式: {expr}")
+
+
+class _LocalCollection:
+    """
+    单个集合的数据文件
+        schema.json: 字段定义、索引参数、数据文件代数
+        vectors.{generation}.f32: 向量按行顺序存储, 以 memmap 方式读取
+        rows.{generation}.jsonl: 追加写入的操作日志(新增行/删除主键), 启动时回放恢复
+    其他进程写入后通过日志偏移量增量读取, 压缩数据文件时递增代数
+    """
+
+    def __init__(self, name: str, path: str, hnsw_threshold: int):
+        self.name = name
+        self.path = path
+        self.hnsw_threshold = hnsw_threshold
+        self.lock = threading.RLock()
+        self.schema: Dict = {}
+        self._schema_mtime = None
+        self._reset()
+
+    @property
+    def schema_path(self) -> str:
+        return os.path.join(self.path, SCHEMA_FILE_NAME)
+
+    @property
+    def vector_path(self) -> str:
+        return os.path.join(self.path, f"vectors.{self.schema['generation']}.f32")
+
+    @property
+    def log_path(self) -> str:
+        return os.path.join(self.path, f"rows.{self.schema['generation']}.jsonl")
+
+    @property
+    def dim(self) -> int:
+        return self.schema["dim"]
+
+    @property
+    def primary_field(self) -> str:
+        return next(field["name"] for field in self.schema["fields"] if field["is_primary"])
+
+    @property
+    def metric_type(self) -> str:
+        return (self.schema.get("index_params") or {}).get("metric_type", "L2")
+
+    def _reset(self):
+        self.rows: List[Optional[Dict]] = []
+        self.pk_to_slot: Dict = {}
+        self.postings: Dict[str, Dict] = {field: {} for field in INDEXED_FIELDS}
+        self.alive = np.zeros(0, dtype=bool)
+        self.sq_norms = np.zeros(0, dtype=np.float32)
+        self.vectors: Optional[np.memmap] = None
+        self.deleted_cnt = 0
+        self.next_pk = 1
+        self._log_offset = 0
+        self._hnsw = None
+        self._hnsw_space = None
+        self._hnsw_size = 0
+        self._hnsw_pending_deletes: List[int] = []
+
+    def refresh(self):
+        """读取其他进程写入的新日志，集合已被删除时抛出 FileNotFoundError"""
+        mtime = os.stat(self.schema_path).st_mtime_ns
+        if mtime != self._schema_mtime:
+            with open(self.schema_path, "r", encoding="utf-8") as f:
+                schema = json.load(f)
+            if schema.get("generation") != self.schema.get("generation"):
+                self._reset()
+            self.schema = schema
+            self._schema_mtime = mtime
+
+        try:
+            log_size = os.path.getsize(self.log_path)
+        except FileNotFoundError:
+            return
+        if log_size <= self._log_offset:
+            return
+        with open(self.log_path, "rb") as f:
+            f.seek(self._log_offset)
+            data = f.read(log_size - self._log_offset)
+        # 仅处理完整的行 未写完的行留待下次读取
+        end = data.rfind(b"\n") + 1
+        if end == 0:
+            return
+        self._log_offset += end
+
+        alive = list(self.alive)
+        first_new_slot = len(self.rows)
+        for line in data[:end].splitlines():
+            op = json.loads(line)
+            if op["op"] == "add":
+                self._apply_add(op["slot"], op["row"], alive)
+            elif op["op"] == "del":
+                self._apply_delete(op["pks"], alive)
+        self.alive = np.array(alive, dtype=bool)
+
+        if self.rows:
+            self.vectors = np.memmap(self.vector_path, dtype=np.float32, mode="r", shape=(len(self.rows), self.dim))
+            new_vectors = np.asarray(self.vectors[first_new_slot:])
+            self.sq_norms = np.concatenate([self.sq_norms, np.einsum("ij,ij->i", new_vectors, new_vectors)])
+
+    def _apply_add(self, slot: int, row: Dict, alive: List[bool]):
+        if slot != len(self.rows):
+            raise RuntimeError(f"集合 {self.name} 数据日志损坏: 行号 {slot} 不连续")
+        pk = row[self.primary_field]
+        self.rows.append(row)
+        alive.append(True)
+        # 主键重复写入时覆盖旧行
+        if pk in self.pk_to_slot:
+            self._apply_delete([pk], alive)
+        self.pk_to_slot[pk] = slot
+        if isinstance(pk, int):
+            self.next_pk = max(self.next_pk, pk + 1)
+        for field in INDEXED_FIELDS:
+            self.postings[field].setdefault(row.get(field), set()).add(slot)
+
+    def _apply_delete(self, pks: List, alive: List[bool]):
+        for pk in pks:
+            slot = self.pk_to_slot.pop(pk, None)
+            if slot is None:
+                continue
+            alive[slot] = False
+            row = self.rows[slot]
+            for field in INDEXED_FIELDS:
+                slots = self.postings[field].get(row.get(field))
+                if slots is not None:
+                    slots.discard(slot)
+                    if not slots:
+                        del self.postings[field][row.get(field)]
+            self.rows[slot] = None
+            self.deleted_cnt += 1
+            # 尚未加入 HNSW 的行在增量加入时按 alive 标记 此处仅记录已加入的行
+            if self._hnsw is not None and slot < self._hnsw_size:
+                self._hnsw_pending_deletes.append(slot)
+
+    def match(self, expr: Optional[str]) -> np.ndarray:
+        """
+        计算满足过滤表达式的行
+        :return: 行掩码
+        """
+        mask = self.alive.copy()
+        for field, op, values in parse_expr(expr):
+            if field in self.postings and op in ("==", "in"):
+                matched = np.zeros(len(mask), dtype=bool)
+                for value in values:
+                    slots = self.postings[field].get(value)
+                    if slots:
+                        matched[list(slots)] = True
+                mask &= matched
+                continue
+            if op in _COMPARE_OPS:
+                compare, bound = _COMPARE_OPS[op], next(iter(values))
+                for slot in np.flatnonzero(mask):
+                    value = self.rows[slot].get(field)
+                    mask[slot] = value is not None and compare(value, bound)
+                continue
+            negate = op in ("!=", "not in")
+            for slot in np.flatnonzero(mask):
+                mask[slot] = (self.rows[slot].get(field) in values) != negate
+        return mask
+
+    def append(self, rows: List[Dict], vectors: np.ndarray):
+        """追加行，调用方需持有集合文件锁"""
+        slot_start = len(self.rows)
+        row_bytes = self.dim * 4
+        # 按行号写入 覆盖上次写入失败遗留的数据
+        with open(self.vector_path, "r+b" if os.path.exists(self.vector_path) else "wb") as f:
+            f.seek(slot_start * row_bytes)
+            f.write(np.ascontiguousarray(vectors, dtype=np.float32).tobytes())
+            f.flush()
+            os.fsync(f.fileno())
+        self._append_log([{"op": "add", "slot": slot_start + i, "row": row} for i, row in enumerate(rows)])
+
+    def delete(self, pks: List):
+        """删除行，调用方需持有集合文件锁"""
+        if pks:
+            self._append_log([{"op": "del", "pks": pks}])
+
+    def _append_log(self, ops: List[Dict]):
+        with open(self.log_path, "ab") as f:
+            f.write("".join(json.dumps(op, ensure_ascii=False) + "\n" for op in ops).encode("utf-8"))
+            f.flush()
+            os.fsync(f.fileno())
+        self.refresh()
+
+    def need_compact(self) -> bool:
+        return self.deleted_cnt >= COMPACT_MIN_ROWS and self.deleted_cnt > COMPACT_RATIO * len(self.rows)
+
+    def compact(self):
+        """仅保留未删除的行写入新一代数据文件，调用方需持有集合文件锁"""
+        old_vector_path, old_log_path = self.vector_path, self.log_path
+        generation = self.schema["generation"] + 1
+        new_vector_path = os.path.join(self.path, f"vectors.{generation}.f32")
+        new_log_path = os.path.join(self.path, f"rows.{generation}.jsonl")
+        alive_slots = np.flatnonzero(self.alive)
+        with open(new_vector_path, "wb") as vector_file, open(new_log_path, "wb") as log_file:
+            for start in range(0, len(alive_slots), COMPACT_BATCH_SIZE):
+                batch = alive_slots[start:start + COMPACT_BATCH_SIZE]
+                vector_file.write(np.asarray(self.vectors[batch], dtype=np.float32).tobytes())
+                log_file.write("".join(
+                    json.dumps({"op": "add", "slot": start + i, "row": self.rows[slot]}, ensure_ascii=False) + "\n"
+                    for i, slot in enumerate(batch.tolist())
+                ).encode("utf-8"))
+            vector_file.flush()
+            os.fsync(vector_file.fileno())
+            log_file.flush()
+            os.fsync(log_file.fileno())
+        write_schema(self.path, dict(self.schema, generation=generation))
+        for path in (old_vector_path, old_log_path):
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+        self.refresh()
+        logger_util.info(f"集合 {self.name} 压缩完成, 剩余 {len(alive_slots)} 行")
+
+    def search(self, query_vector, top_k: int, mask: np.ndarray, metric_type: str, ef: Optional[int]):
+        """
+        向量检索
+        :return: [(行号, 距离)]，L2 为欧氏距离平方，IP/COSINE 为相似度
+        """
+        candidate_cnt = int(mask.sum())
+        top_k = min(top_k, candidate_cnt)
+        if top_k <= 0:
+            return []
+        query = np.asarray(query_vector, dtype=np.float32)
+        if hnswlib is not None and candidate_cnt >= self.hnsw_threshold and metric_type in _HNSW_SPACES:
+            try:
+                return self._hnsw_search(query, top_k, mask, metric_type, ef)
+            except RuntimeError as e:
+                # 过滤后近邻不足 top_k 时退化为精确检索
+                logger_util.debug(f"集合 {self.name} HNSW 检索失败, 使用精确检索: {e}")
+
+        candidates = np.flatnonzero(mask)
+        products = np.asarray(self.vectors[candidates]) @ query
+        if metric_type == "L2":
+            scores = np.maximum(self.sq_norms[candidates] - 2 * products + float(query @ query), 0)
+        elif metric_type == "IP":
+            scores = -products
+        elif metric_type == "COSINE":
+            scores = -products / np.maximum(np.sqrt(self.sq_norms[candidates]) * np.linalg.norm(query), 1e-12)
+        else:
+            raise ValueError(f"本地向量存储不支持的距离度量: {metric_type}")
+        top = np.argpartition(scores, top_k - 1)[:top_k] if top_k < len(scores) else np.arange(len(scores))
+        top = top[np.argsort(scores[top])]
+        distances = scores[top] if metric_type == "L2" else -scores[top]
+        return list(zip(candidates[top].tolist(), distances.astype(float).tolist()))
+
+    def _hnsw_search(self, query: np.ndarray, top_k: int, mask: np.ndarray, metric_type: str, ef: Optional[int]):
+        space = _HNSW_SPACES[metric_type]
+        if self._hnsw is None or self._hnsw_space != space:
+            index_params = (self.schema.get("index_params") or {}).get("params", {})
+            self._hnsw = hnswlib.Index(space=space, dim=self.dim)
+            self._hnsw.init_index(max_elements=max(len(self.rows) * 2, 1024), M=index_params.get("M", 8),
+                                  ef_construction=index_params.get("efConstruction", 64))
+            self._hnsw_space = space
+            self._hnsw_size = 0
+            self._hnsw_pending_deletes = []
+        # 增量加入新行 标记已删除行
+        if self._hnsw_size < len(self.rows):
+            if len(self.rows) > self._hnsw.get_max_elements():
+                self._hnsw.resize_index(len(self.rows) * 2)
+            new_slots = np.arange(self._hnsw_size, len(self.rows))
+            self._hnsw.add_items(np.asarray(self.vectors[self._hnsw_size:]), new_slots)
+            self._hnsw_pending_deletes.extend(new_slots[~self.alive[self._hnsw_size:]].tolist())
+            self._hnsw_size = len(self.rows)
+        # 先清空待删除队列 单个标记失败不会导致后续检索反复失败
+        pending_deletes, self._hnsw_pending_deletes = set(self._hnsw_pending_deletes), []
+        for slot in pending_deletes:
+            self._hnsw.mark_deleted(slot)
+
+        self._hnsw.set_ef(max(ef or top_k, top_k))
+        filtered = not np.array_equal(mask, self.alive)
+        labels, distances = self._hnsw.knn_query(
+            query, k=top_k, filter=(lambda label: bool(mask[label])) if filtered else None)
+        distances = distances[0] if metric_type == "L2" else 1 - distances[0]
+        return list(zip(labels[0].tolist(), distances.astype(float).tolist()))
+
+    def output(self, slot: int, output_fields: Optional[List[str]], row: Dict = None,
+               vectors: np.memmap = None) -> Dict:
+        row = self.rows[slot] if row is None else row
+        if output_fields is None:
+            return dict(row)
+        entity = {}
+        for field in output_fields:
+            if field == MILVUS_EMBEDDING_FIELD_NAME:
+                entity[field] = np.asarray((self.vectors if vectors is None else vectors)[slot]).tolist()
+            else:
+                entity[field] = row.get(field)
+        return entity
+
+
+def write_schema(path: str, schema: Dict):
+    tmp_path = os.path.join(path, f"{SCHEMA_FILE_NAME}.tmp")
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(schema, f, ensure_ascii=False)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, os.path.join(path, SCHEMA_FILE_NAME))
+
+
+class LocalVectorStore(VectorStore):
+    """
+    进程内向量存储，接口与 MilvusUtil 一致
+        1. 向量以 memmap 方式读取，行数据与删除记录追加写入日志，重启后回放恢复
+        2. knowledge_id/file_id 建立倒排索引用于过滤
+        3. 行数较少时 numpy 精确检索，达到阈值且已安装 hnswlib 时使用 HNSW 近似检索
+    多进程(Web/Celery)通过文件锁串行写入，读取时增量加载其他进程写入的数据
+    """
+
+    def __init__(self, path: str = None, hnsw_threshold: int = None):
+        vector_store_settings = settings.storage.vector_store
+        self.path = os.path.abspath(path or vector_store_settings.local_path)
+        self.hnsw_threshold = vector_store_settings.local_hnsw_threshold if hnsw_threshold is None \
+            else hnsw_threshold
+        os.makedirs(self.path, exist_ok=True)
+        self._lock = threading.Lock()
+        self._collections: Dict[str, _LocalCollection] = {}
+
+    def _collection_path(self, collection_name: str) -> str:
+        if not _COLLECTION_NAME_PATTERN.match(collection_name or ""):
+            raise ValueError(f"非法的集合名称: {collection_name}")
+        return os.path.join(self.path, collection_name)
+
+    @contextmanager
+    def _file_lock(self, collection_name: str):
+        with open(os.path.join(self.path, f".{collection_name}.lock"), "a") as lock_file:
+            if fcntl is not None:
+                fcntl.flock(lock_file, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                if fcntl is not None:
+                    fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    def _get_collection(self, collection_name: str) -> _LocalCollection:
+        path = self._collection_path(collection_name)
+        with self._lock:
+            collection = self._collections.get(collection_name)
+            if collection is None:
+                if not os.path.exists(os.path.join(path, SCHEMA_FILE_NAME)):
+                    raise ValueError(f"集合 {collection_name} 不存在")
+                collection = _LocalCollection(collection_name, path, self.hnsw_threshold)
+                self._collections[collection_name] = collection
+        try:
+            with collection.lock:
+                collection.refresh()
+        except FileNotFoundError:
+            # 集合已被其他进程删除
+            with self._lock:
+                self._collections.pop(collection_name, None)
+            raise ValueError(f"集合 {collection_name} 不存在")
+        return collection
+
+    def check_collection_exists(self, collection_name):
+        """
+        检查指定的集合是否存在。
+
+        :param collection_name: 集合名称。
+        :return: 如果集合存在返回 True，否则返回 False。
+        """
+        return os.path.exists(os.path.join(self._collection_path(collection_name), SCHEMA_FILE_NAME))
+
+    def create_collection(self, collection_name, fields, functions=None):
+        """
+        创建一个新的集合，集合已存在时不做处理。
+
+        :param collection_name: 集合名称。
+        :param fields: 字段定义列表，每个字段为一个 FieldSchema 对象。
+        :param functions: Milvus 函数定义，本地后端不支持，忽略。
+        :return: None
+        """
+        path = self._collection_path(collection_name)
+        with self._file_lock(collection_name):
+            if self.check_collection_exists(collection_name):
+                return
+            field_defs = [{
+                "name": field.name,
+                "dtype": field.dtype.name,
+                "is_primary": bool(field.is_primary),
+                "auto_id": bool(field.auto_id),
+            } for field in fields]
+            dims = [int(field.params["dim"]) for field in fields if field.name == MILVUS_EMBEDDING_FIELD_NAME]
+            if not dims or not any(field["is_primary"] for field in field_defs):
+                raise ValueError(f"创建集合{collection_name}失败: 缺少主键或向量字段")
+            os.makedirs(path, exist_ok=True)
+            write_schema(path, {"fields": field_defs, "dim": dims[0], "index_params": None, "generation": 0})
+        logger_util.info(f"本地集合 {collection_name} 已创建")
+
+    def create_index_on_field(self, collection_name, field_name, index_params):
+        """
+        记录索引参数(距离度量及 HNSW 参数)。
+
+        :param collection_name: 集合名称。
+        :param field_name: 字段名称。
+        :param index_params: 索引参数。
+        :return: None
+        """
+        with self._file_lock(collection_name):
+            collection = self._get_collection(collection_name)
+            with collection.lock:
+                write_schema(collection.path, dict(collection.schema, index_params=index_params))
+                collection.refresh()
+
+    def insert_data(self, collection_name, insert_data: list, ids=None):
+        """
+        向指定集合中插入数据。
+
+        :param collection_name: 集合名称。
+        :param insert_data: 要插入的数据列表，每个元素为一个字典。
+        :param ids: 自定义主键ID列表，可选。
+        :return: 主键列表
+        """
+        if not insert_data:
+            return []
+        with self._file_lock(collection_name):
+            collection = self._get_collection(collection_name)
+            with collection.lock:
+                vectors = np.asarray([row[MILVUS_EMBEDDING_FIELD_NAME] for row in insert_data], dtype=np.float32)
+                if vectors.ndim != 2 or vectors.shape[1] != collection.dim:
+                    raise ValueError(f"向{collection_name}集合插入向量失败: 维度应为{collection.dim}")
+                primary_field = collection.primary_field
+                if ids is None:
+                    ids = [row[primary_field] for row in insert_data] if all(
+                        primary_field in row for row in insert_data) \
+                        else list(range(collection.next_pk, collection.next_pk + len(insert_data)))
+                rows = []
+                for row, pk in zip(insert_data, ids):
+                    row = {field: value for field, value in row.items() if field != MILVUS_EMBEDDING_FIELD_NAME}
+                    row[primary_field] = pk
+                    rows.append(row)
+                collection.append(rows, vectors)
+        return ids
+
+    def delete_collection(self, collection_name):
+        """
+        删除指定的集合。
+
+        :param collection_name: 集合名称。
+        :return: None
+        """
+        with self._file_lock(collection_name):
+            path = self._collection_path(collection_name)
+            with self._lock:
+                self._collections.pop(collection_name, None)
+            if os.path.exists(path):
+                shutil.rmtree(path)
+                logger_util.info(f"集合{collection_name}已删除")
+            else:
+                logger_util.warning(f"集合{collection_name}不存在无需删除")
+
+    def delete_collection_file(self, collection_name: str, expr: str):
+        """
+        根据条件删除指定集合中的数据记录。
+
+        :param collection_name: 集合名称。
+        :param expr: 条件表达式，用于指定要删除的记录。
+        :return: None
+        """
+        if not self.check_collection_exists(collection_name):
+            logger_util.info(f"当前删除集合 {collection_name} 不存在，已被删除")
+            return
+        with self._file_lock(collection_name):
+            collection = self._get_collection(collection_name)
+            with collection.lock:
+                slots = np.flatnonzero(collection.match(expr))
+                collection.delete([collection.rows[slot][collection.primary_field] for slot in slots.tolist()])
+                if collection.need_compact():
+                    collection.compact()
+        logger_util.info(f"从集合 {collection_name} 中删除了 {len(slots)} 条记录，条件为: {expr}")
+
+    def load_collection(self, collection_name: str):
+        """
+        加载集合新写入的数据。
+
+        :param collection_name: 集合名称。
+        :return: None
+        """
+        self._get_collection(collection_name)
+
+    def list_field_names(self, collection_name: str):
+        """
+        获取集合中可写入的标量字段名称（排除自增主键与向量字段）。
+
+        :param collection_name: 集合名称。
+        :return: 字段名称列表。
+        """
+        collection = self._get_collection(collection_name)
+        return [field["name"] for field in collection.schema["fields"]
+                if not field["auto_id"] and field["name"] != MILVUS_EMBEDDING_FIELD_NAME]
+
+    def query(self, collection_name: str, expr: str, output_fields=None, limit=None):
+        """
+        根据条件表达式查询集合中的数据记录。
+
+        :param collection_name: 集合名称。
+        :param expr: 条件过滤表达式。
+        :param output_fields: 指定返回的字段列表，可选。
+        :param limit: 返回记录数量上限，可选。
+        :return: 查询结果列表，每个元素为一个字典。
+        """
+        collection = self._get_collection(collection_name)
+        with collection.lock:
+            slots = np.flatnonzero(collection.match(expr))
+            if limit is not None:
+                slots = slots[:limit]
+            return [self._query_output(collection, slot, output_fields) for slot in slots.tolist()]
+
+    def query_iterator(self, collection_name: str, expr: str, output_fields=None, batch_size: int = 500):
+        """
+        分批遍历集合中符合条件的数据记录。
+
+        :param collection_name: 集合名称。
+        :param expr: 条件过滤表达式。
+        :param output_fields: 指定返回的字段列表，可选。
+        :param batch_size: 每批返回的记录数量，默认为 500。
+        :return: 生成器，每次返回一批记录（字典列表）。
+        """
+        collection = self._get_collection(collection_name)
+        with collection.lock:
+            # 快照行数据与向量文件 遍历期间压缩数据文件不影响结果
+            slots = np.flatnonzero(collection.match(expr)).tolist()
+            rows = [collection.rows[slot] for slot in slots]
+            vectors = collection.vectors
+        for start in range(0, len(slots), batch_size):
+            yield [self._query_output(collection, slot, output_fields, row, vectors)
+                   for slot, row in zip(slots[start:start + batch_size], rows[start:start + batch_size])]
+
+    @staticmethod
+    def _query_output(collection: _LocalCollection, slot: int, output_fields, row=None, vectors=None):
+        # 与 Milvus 一致 查询结果始终包含主键
+        entity = collection.output(slot, output_fields, row, vectors)
+        entity[collection.primary_field] = (row or collection.rows[slot])[collection.primary_field]
+        return entity
+
+    def _search_collection(self, collection_name, query_vector, search_params, top_k, expr, output_fields):
+        collection = self._get_collection(collection_name)
+        metric_type = (search_params.get("metric_type") or collection.metric_type).upper()
+        ef = search_params.get("params", {}).get("ef")
+        with collection.lock:
+            hits = collection.search(query_vector, top_k, collection.match(expr), metric_type, ef)
+            return [{
+                "id": collection.rows[slot][collection.primary_field],
+                "distance": distance,
+                "entity": collection.output(slot, output_fields),
+                "collection_name": collection_name,
+            } for slot, distance in hits]
+
+    def similarity_search(self, query_vector, collection_names, search_params=None, top_k=5, expr=None,
+                          output_fields=None, knowledge_ids=None):
+        """
+        根据向量进行相似性搜索，多个集合检索后合并为全局 top_k，参数同 MilvusUtil.similarity_search。
+
+        :return: 搜索结果。
+        """
+        if search_params is None:
+            search_params = {"metric_type": "L2", "params": {"ef": 10}}
+        try:
+            result_lists = [
+                self._search_collection(
+                    collection_name, query_vector, search_params, top_k,
+                    self.merge_expr(self.knowledge_expr((knowledge_ids or {}).get(collection_name)), expr),
+                    output_fields)
+                for collection_name in dict.fromkeys(collection_names)
+            ]
+            return self.merge_top_k(result_lists, top_k, search_params.get("metric_type", "L2"))
+        except ValueError as e:
+            logger_util.error(f"搜索向量失败：{e}")
+            return []
+
+    async def async_similarity_search(self, query_vector, collection_names, search_params=None, top_k=5,
+                                      expr=None, output_fields=None, knowledge_ids=None):
+        """
+        在线程池中执行检索，避免增量加载数据文件及构建 HNSW 阻塞事件循环，参数同 similarity_search。
+
+        :return: 搜索结果。
+        """
+        return await asyncio.to_thread(self.similarity_search, query_vector, collection_names, search_params,
+                                       top_k, expr, output_fields, knowledge_ids)
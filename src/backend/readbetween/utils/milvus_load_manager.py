@@ -0,0 +1,257 @@
+import threading
+import time
+from collections import OrderedDict
+from typing import Optional
+
+from pymilvus import Collection, MilvusException, utility
+
+from readbetween.config import settings
+from readbetween.services.constant import MILVUS_EMBEDDING_FIELD_NAME, RedisMilvusLastAccessKey, RedisMilvusHotKey
+from readbetween.utils.logger_util import logger_util
+from readbetween.utils.redis_util import RedisUtil
+from readbetween.utils.vector_quantization import detect_vector_storage, vector_bytes
+
+# 单行标量字段(text/title/source/bbox 等)及索引的估算内存占用
+ROW_OVERHEAD_BYTES = 2048
+# 同一集合访问记录写入 Redis 的最小间隔(秒)
+ACCESS_RECORD_INTERVAL = 30
+
+
+class MilvusLoadManager:
+    """
+    Milvus 集合加载管理器
+        1. 缓存本进程已加载的集合 搜索时不再每次调用 load
+        2. 后台巡检线程按 load_sweep_interval 周期释放空闲超过 TTL 或超出内存预算的集合(LRU)
+        3. 访问次数记录在 Redis 有序集合中 启动时预加载热点集合
+    多进程(Web/Celery)共享 Redis 中的最近访问时间, 仅当全局空闲时才释放
+    """
+    _instance = None
+    _initialized = False
+
+    # 单例模式
+    def __new__(cls):
+        if not cls._instance:
+            cls._instance = super().__new__(cls)
+        return cls._instance
+
+    def __init__(self):
+        if not self._initialized:
+            self._lock = threading.RLock()
+            # 集合名称 -> [估算内存字节数, 最近访问时间]
+            self._loaded: "OrderedDict[str, list]" = OrderedDict()
+            # 集合名称 -> 最近一次写入 Redis 的时间
+            self._recorded_at = {}
+            # 集合名称 -> 尚未写入 Redis 的访问次数
+            self._pending_hits = {}
+            self._sweeper: Optional[threading.Thread] = None
+            self._sweeper_stop = threading.Event()
+            self._redis_client: Optional[RedisUtil] = None
+            self.idle_ttl = settings.storage.milvus.load_idle_ttl
+            self.memory_budget = settings.storage.milvus.load_memory_budget_mb * 1024 * 1024
+            self.sweep_interval = settings.storage.milvus.load_sweep_interval
+            self._initialized = True
+
+    @property
+    def redis_client(self) -> RedisUtil:
+        if self._redis_client is None:
+            self._redis_client = RedisUtil()
+        return self._redis_client
+
+    def ensure_loaded(self, collection_name: str):
+        """
+        确保集合已加载, 本进程已加载过的集合直接返回
+
+        :param collection_name: 集合名称。
+        :return: None
+        """
+        now = time.time()
+        with self._lock:
+            entry = self._loaded.get(collection_name)
+            if entry is not None:
+                entry[1] = now
+                self._loaded.move_to_end(collection_name)
+        if entry is None:
+            self._load(collection_name)
+            # 未经应用启动流程的进程(Celery)首次加载集合时启动巡检
+            self.start_sweeper()
+        self._record_access(collection_name, now)
+
+    def invalidate(self, collection_name: str):
+        """
+        集合被其他进程释放时清除本地加载状态, 下次访问重新加载
+
+        :param collection_name: 集合名称。
+        :return: None
+        """
+        with self._lock:
+            self._loaded.pop(collection_name, None)
+
+    def forget(self, collection_name: str):
+        """
+        集合删除后清除本地及 Redis 中的加载与访问记录
+
+        :param collection_name: 集合名称。
+        :return: None
+        """
+        with self._lock:
+            self._loaded.pop(collection_name, None)
+            self._recorded_at.pop(collection_name, None)
+            self._pending_hits.pop(collection_name, None)
+        try:
+            pipe = self.redis_client.pipeline()
+            pipe.zrem(RedisMilvusLastAccessKey, collection_name)
+            pipe.zrem(RedisMilvusHotKey, collection_name)
+            pipe.execute()
+        except Exception as e:
+            logger_util.warning(f"清除集合{collection_name}访问记录失败: {e}")
+
+    def preload(self, top_n: int = None):
+        """
+        按访问次数预加载热点集合
+
+        :param top_n: 预加载集合数量，默认读取配置。
+        :return: None
+        """
+        top_n = settings.storage.milvus.preload_top_n if top_n is None else top_n
+        if top_n <= 0:
+            return
+        hot_collections = [name.decode() if isinstance(name, bytes) else name
+                           for name in self.redis_client.zrevrange(RedisMilvusHotKey, 0, top_n - 1)]
+        for collection_name in hot_collections:
+            if not utility.has_collection(collection_name):
+                self.forget(collection_name)
+                continue
+            try:
+                self.ensure_loaded(collection_name)
+                logger_util.info(f"预加载热点集合 {collection_name}")
+            except MilvusException as e:
+                logger_util.warning(f"预加载集合 {collection_name} 失败: {e}")
+
+    def sweep(self):
+        """
+        释放空闲超过 TTL 的集合, 仍超出内存预算时按最近访问时间释放最久未使用的集合
+
+        :return: None
+        """
+        now = time.time()
+        with self._lock:
+            candidates = list(self._loaded.items())
+        if not candidates:
+            return
+
+        # 以全局最近访问时间为准 避免释放其他进程仍在使用的集合
+        names = [name for name, _ in candidates]
+        try:
+            global_access = self.redis_client.zmscore(RedisMilvusLastAccessKey, names)
+        except Exception as e:
+            logger_util.warning(f"读取集合访问记录失败: {e}")
+            global_access = [None] * len(names)
+        memory = {name: entry[0] for name, entry in candidates}
+        last_access = {
+            name: max(entry[1], score or 0)
+            for (name, entry), score in zip(candidates, global_access)
+        }
+
+        to_release = [name for name in names if now - last_access[name] > self.idle_ttl]
+        remaining = sorted((name for name in names if name not in to_release), key=lambda n: last_access[n])
+        memory_used = sum(memory[name] for name in remaining)
+        # 至少保留最近访问的集合
+        while memory_used > self.memory_budget and len(remaining) > 1:
+            name = remaining.pop(0)
+            memory_used -= memory[name]
+            to_release.append(name)
+
+        for collection_name in to_release:
+            self._release(collection_name)
+
+    def stats(self):
+        """
+        当前进程集合加载状态
+
+        :return: 加载集合列表与估算内存占用。
+        """
+        with self._lock:
+            return {
+                "loaded": list(self._loaded.keys()),
+                "memory_bytes": sum(entry[0] for entry in self._loaded.values()),
+                "memory_budget_bytes": self.memory_budget,
+            }
+
+    def _load(self, collection_name: str):
+        collection = Collection(collection_name)
+        state = utility.load_state(collection_name)
+        if state.name != "Loaded":
+            collection.load()
+            logger_util.info(f"集合 {collection_name} 已加载到内存。")
+        memory_bytes = self._estimate_memory(collection)
+        with self._lock:
+            self._loaded[collection_name] = [memory_bytes, time.time()]
+            self._loaded.move_to_end(collection_name)
+
+    def _release(self, collection_name: str):
+        with self._lock:
+            self._loaded.pop(collection_name, None)
+        try:
+            if utility.has_collection(collection_name):
+                Collection(collection_name).release()
+                logger_util.info(f"集合 {collection_name} 已释放。")
+        except MilvusException as e:
+            logger_util.warning(f"释放集合 {collection_name} 失败: {e}")
+
+    @staticmethod
+    def _estimate_memory(collection: Collection) -> int:
+        # 按向量存储格式估算, binary 向量字段的 dim 为比特数
+        field = next((field for field in collection.schema.fields
+                      if field.name == MILVUS_EMBEDDING_FIELD_NAME), None)
+        if field is None:
+            return collection.num_entities * ROW_OVERHEAD_BYTES
+        index_type = next((dict(index.params).get("index_type") for index in collection.indexes
+                           if index.field_name == MILVUS_EMBEDDING_FIELD_NAME), None)
+        storage = detect_vector_storage(field.dtype, index_type)
+        dim = int(field.params.get("dim", 0))
+        return collection.num_entities * (vector_bytes(storage, dim) + ROW_OVERHEAD_BYTES)
+
+    def _record_access(self, collection_name: str, now: float):
+        # 访问次数本地累加 按间隔节流与最近访问时间一并写入 Redis
+        with self._lock:
+            self._pending_hits[collection_name] = self._pending_hits.get(collection_name, 0) + 1
+            if now - self._recorded_at.get(collection_name, 0) <= ACCESS_RECORD_INTERVAL:
+                return
+            hits = self._pending_hits.pop(collection_name)
+            self._recorded_at[collection_name] = now
+        try:
+            pipe = self.redis_client.pipeline()
+            pipe.zincrby(RedisMilvusHotKey, hits, collection_name)
+            pipe.zadd(RedisMilvusLastAccessKey, {collection_name: now})
+            pipe.execute()
+        except Exception as e:
+            logger_util.warning(f"记录集合{collection_name}访问失败: {e}")
+
+    def start_sweeper(self):
+        """
+        启动后台巡检线程, 按 load_sweep_interval 周期释放集合, 已启动时不重复启动
+
+        :return: None
+        """
+        with self._lock:
+            if self._sweeper is not None and self._sweeper.is_alive():
+                return
+            self._sweeper_stop.clear()
+            self._sweeper = threading.Thread(target=self._sweep_loop, name="milvus-load-sweeper", daemon=True)
+            self._sweeper.start()
+
+    def stop_sweeper(self):
+        """
+        停止后台巡检线程
+
+        :return: None
+        """
+        self._sweeper_stop.set()
+
+    def _sweep_loop(self):
+        # 无搜索请求时同样按周期释放空闲集合
+        while not self._sweeper_stop.wait(self.sweep_interval):
+            try:
+                self.sweep()
+            except Exception as e:
+                logger_util.warning(f"集合释放巡检失败: {e}")
@@ -1,18 +1,47 @@
+import asyncio
+import time
+import warnings
+from concurrent.futures import ThreadPoolExecutor
+from typing import Optional
+
 from sklearn.decomposition import PCA
 import numpy as np
 from pymilvus import (
     connections,
+    utility,
     Collection,
     FieldSchema,
     CollectionSchema,
-    DataType, MilvusException, SearchResult
+    DataType, MilvusException, SearchResult, AsyncMilvusClient, AnnSearchRequest, RRFRanker
 )
 from readbetween.config import settings
+from readbetween.services.constant import MILVUS_EMBEDDING_FIELD_NAME, MILVUS_SPARSE_FIELD_NAME, \
+    MILVUS_CHUNK_PAYLOAD_FIELDS, MILVUS_SPARSE_SEARCH_PARAMS, MILVUS_VECTOR_SCALE_FIELD_NAME, VECTOR_STORAGE_BINARY, VECTOR_STORAGE_FLOAT
+from readbetween.utils.index_advisor import IndexAdvisor
 from readbetween.utils.logger_util import logger_util
+from readbetween.utils.milvus_load_manager import MilvusLoadManager
+from readbetween.utils.vector_store import VectorStore
+from readbetween.utils.vector_quantization import detect_vector_storage, encode_rows, encode_query, \
+    needs_rescore, rescore_hits, storage_search_params
 from readbetween.utils.model_factory import ModelFactory
 
 
-class MilvusUtil:
+class MilvusUtil(VectorStore):
+    # 异步客户端及其绑定的事件循环
+    _async_client: Optional[AsyncMilvusClient] = None
+    _async_client_loop: Optional[asyncio.AbstractEventLoop] = None
+    # 集合名称 -> 是否包含 BM25 稀疏向量字段
+    _hybrid_support = {}
+    # 集合名称 -> 向量存储格式
+    _vector_storage = {}
+    # 集合名称 -> 可写入的标量字段
+    _field_names = {}
+    # 集合名称 -> (向量索引参数, 缓存时间) 其他进程重建索引后过期刷新
+    _index_params = {}
+    _index_params_ttl = 300
+    # 未开启自动索引且调用方未指定时的检索参数
+    _default_search_params = {"metric_type": "L2", "params": {"ef": 10}}
+
     def __init__(self, uri=None):
         """
         初始化 MilvusUtil 实例并建立连接。
@@ -53,12 +82,13 @@ class MilvusUtil:
             return False
 
     @classmethod
-    def create_collection(cls, collection_name, fields):
+    def create_collection(cls, collection_name, fields, functions=None):
         """
         创建一个新的集合。
 
         :param collection_name: 集合名称。
         :param fields: 字段定义列表，每个字段为一个 FieldSchema 对象。
+        :param functions: 函数定义列表(如 BM25 稀疏向量生成函数)，可选。
         :return: None
         """
         try:
@@ -66,7 +96,8 @@ class MilvusUtil:
                 field
                 for field in fields
             ]
-            schema = CollectionSchema(fields=field_schemas, description="Collection for storing vectors")
+            schema = CollectionSchema(fields=field_schemas, description="Collection for storing vectors",
+                                      functions=functions)
             Collection(name=collection_name, schema=schema)
         except MilvusException as e:
             logger_util.error(f"创建集合{collection_name}失败:{e}")
@@ -86,60 +117,269 @@ class MilvusUtil:
             # ids 用于自定义milvus主键
             collection = Collection(collection_name)
             logger_util.debug(f"插入Milvus向量维度{len(insert_data[0]['vector'])}")
+            # 量化存储的集合写入前转换向量格式
+            insert_data = encode_rows(cls.get_vector_storage(collection_name), insert_data)
             collection.insert(insert_data, ids=ids)
             collection.flush()  # 刷新到磁盘
         except MilvusException as e:
             logger_util.error(f"向{collection_name}集合插入向量失败:{e}")
             raise MilvusException(message=f"向{collection_name}集合插入向量失败:{e}")
 
+    @staticmethod
+    def _is_not_loaded_error(e: MilvusException) -> bool:
+        return "not loaded" in str(e).lower()
+
+    @classmethod
+    def get_index_params(cls, collection_name):
+        """
+        获取集合向量字段的索引参数，结果缓存 _index_params_ttl 秒。
+
+        :param collection_name: 集合名称。
+        :return: 索引参数 {"index_type", "metric_type", "params"}，未创建索引时返回 None。
+        """
+        cached = cls._index_params.get(collection_name)
+        if cached is not None and time.monotonic() - cached[1] < cls._index_params_ttl:
+            return cached[0]
+        index_params = next((dict(index.params) for index in Collection(collection_name).indexes
+                             if index.field_name == MILVUS_EMBEDDING_FIELD_NAME), None)
+        if index_params is not None:
+            cls._index_params[collection_name] = (index_params, time.monotonic())
+        return index_params
+
+    @classmethod
+    def get_vector_storage(cls, collection_name):
+        """
+        获取集合的向量存储格式(float/float16/bfloat16/sq8/binary)，由向量字段类型及索引类型推断。
+
+        :param collection_name: 集合名称。
+        :return: 向量存储格式。
+        """
+        if collection_name not in cls._vector_storage:
+            collection = Collection(collection_name)
+            vector_dtype = next(field.dtype for field in collection.schema.fields
+                                if field.name == MILVUS_EMBEDDING_FIELD_NAME)
+            index_type = (cls.get_index_params(collection_name) or {}).get("index_type")
+            storage = detect_vector_storage(vector_dtype, index_type)
+            # 索引未创建时无法区分 sq8 暂不缓存
+            if index_type is None:
+                return storage
+            cls._vector_storage[collection_name] = storage
+        return cls._vector_storage[collection_name]
+
+    @classmethod
+    def _resolve_search_params(cls, collection_name, search_params, limit):
+        """
+        float 存储集合的检索参数：调用方未指定且开启 storage.milvus.auto_index 时，
+        按集合索引类型、召回数量及延迟目标生成(见 IndexAdvisor.search_params)；
+        否则使用调用方参数，HNSW 的 ef 不小于召回数量。
+        """
+        if search_params is None and settings.storage.milvus.auto_index:
+            index_params = cls.get_index_params(collection_name)
+            if index_params:
+                return IndexAdvisor.search_params(index_params, limit)
+        search_params = search_params or cls._default_search_params
+        params = dict(search_params.get("params") or {})
+        if "ef" in params:
+            params["ef"] = max(params["ef"], limit)
+        return dict(search_params, params=params)
+
+    @classmethod
+    def _prepare_search(cls, collection_name, query_vector, search_params, top_k, output_fields):
+        """
+        按集合向量存储格式准备检索请求，量化存储放大召回数量并返回向量字段用于精排。
+
+        :return: (存储格式, 查询数据, 检索参数, 召回数量, 返回字段)
+        """
+        storage = cls.get_vector_storage(collection_name)
+        if not needs_rescore(storage):
+            return (storage, query_vector, cls._resolve_search_params(collection_name, search_params, top_k),
+                    top_k, output_fields)
+        limit = top_k * max(settings.storage.milvus.rescore_factor, 1)
+        rescore_fields = [MILVUS_EMBEDDING_FIELD_NAME]
+        if storage == VECTOR_STORAGE_BINARY:
+            rescore_fields.append(MILVUS_VECTOR_SCALE_FIELD_NAME)
+        return (storage, encode_query(storage, query_vector),
+                storage_search_params(storage, search_params or cls._default_search_params, limit),
+                limit, list(dict.fromkeys(list(output_fields) + rescore_fields)))
+
+    @staticmethod
+    def _rescore(hits, storage, query_vector, search_params, top_k, output_fields):
+        """量化存储的候选按原始度量精排(binary 为近似精排)，并移除调用方未要求返回的向量字段"""
+        if not needs_rescore(storage):
+            return hits
+        hits = rescore_hits(hits, query_vector, storage, (search_params or {}).get("metric_type", "L2"), top_k)
+        for hit in hits:
+            entity = hit.get("entity", {})
+            for field in (MILVUS_EMBEDDING_FIELD_NAME, MILVUS_VECTOR_SCALE_FIELD_NAME):
+                if field not in output_fields:
+                    entity.pop(field, None)
+        return hits
+
+    @classmethod
+    def _search_output_fields(cls, collection_name, output_fields):
+        """
+        检索返回字段，限于集合中存在的字段，未指定时返回全部标量字段。
+        精简集合(切片内容存于 MySQL)不返回切片内容，仅返回 file_id/chunk_index 供检索服务回填。
+        """
+        field_names = cls.list_field_names(collection_name)
+        if not set(MILVUS_CHUNK_PAYLOAD_FIELDS) <= set(field_names):
+            field_names = [name for name in field_names if name not in MILVUS_CHUNK_PAYLOAD_FIELDS]
+            if output_fields is not None:
+                output_fields = list(dict.fromkeys(list(output_fields) + ["file_id", "chunk_index"]))
+        if output_fields is None:
+            return field_names
+        return [name for name in output_fields if name in field_names or name == MILVUS_EMBEDDING_FIELD_NAME]
+
+    @classmethod
+    def _search_collection(cls, collection_name, query_vector, search_params, top_k, expr, output_fields):
+        collection = Collection(collection_name)
+        cls.load_collection(collection_name)  # 加载集合
+        # 如果用户没有指定输出字段，则默认返回所有字段（除了向量字段本身）
+        output_fields = cls._search_output_fields(collection_name, output_fields)
+        storage, data, param, limit, search_fields = cls._prepare_search(
+            collection_name, query_vector, search_params, top_k, output_fields)
+        search_kwargs = dict(
+            data=[data],
+            anns_field=MILVUS_EMBEDDING_FIELD_NAME,
+            param=param,
+            limit=limit,
+            expr=expr,  # 条件过滤表达式
+            output_fields=search_fields,  # 指定返回的字段
+        )
+        result: SearchResult = cls._call_loaded(collection_name, lambda: collection.search(**search_kwargs))
+
+        # 提取结果中的数据
+        results = []
+        for hits in result:
+            # <class 'pymilvus.client.abstract.Hits'>
+            for hit in hits:
+                result_dict = hit.to_dict()
+                # 增加collection_name
+                result_dict["collection_name"] = collection_name
+                results.append(result_dict)
+        return cls._rescore(results, storage, query_vector, search_params, top_k, output_fields)
+
     @classmethod
     def similarity_search(cls, query_vector, collection_names, search_params=None, top_k=5, expr=None,
-                          output_fields=None):
+                          output_fields=None, knowledge_ids=None):
         """
-        根据向量进行相似性搜索。
+        根据向量进行相似性搜索，多个集合并发检索后合并为全局 top_k。
 
         :param query_vector: 查询向量。
         :param collection_names: 要搜索的集合名称列表。
-        :param search_params: 搜索参数，如 {"metric_type": "L2", "params": {"nprobe": 10}}。
+        :param search_params: 搜索参数，如 {"metric_type": "L2", "params": {"nprobe": 10}}，
+            为空时按集合索引自动选择(storage.milvus.auto_index)。
         :param top_k: 返回的最相似结果数量，默认为 5。
         :param expr: 条件过滤表达式，可选。
         :param output_fields: 指定返回的字段列表，可选。
+        :param knowledge_ids: 集合名称到知识库ID列表的映射，指定时按知识库过滤，可选。
         :return: 搜索结果。
         """
+        try:
+            # 共享集合模式下多个知识库对应同一集合 仅搜索一次
+            collection_names = list(dict.fromkeys(collection_names))
+            if not collection_names:
+                return []
+            with ThreadPoolExecutor(max_workers=min(len(collection_names), 8)) as executor:
+                result_lists = list(executor.map(
+                    lambda name: cls._search_collection(
+                        name, query_vector, search_params, top_k,
+                        cls.merge_expr(cls.knowledge_expr((knowledge_ids or {}).get(name)), expr),
+                        output_fields),
+                    collection_names))
+            results = cls.merge_top_k(result_lists, top_k, (search_params or {}).get("metric_type", "L2"))
+
+            logger_util.info(f"Milvus查询成功，返回结果数量: {len(results)}")
+            return results
+        except MilvusException as e:
+            logger_util.error(f"搜索向量失败：{e}")
+            return []
+
+    @classmethod
+    def get_async_client(cls) -> AsyncMilvusClient:
+        """
+        获取当前事件循环的异步客户端，gRPC 异步通道与创建时的事件循环绑定。
+
+        :return: AsyncMilvusClient 实例。
+        """
+        loop = asyncio.get_running_loop()
+        if cls._async_client is None or cls._async_client_loop is not loop:
+            cls._async_client = AsyncMilvusClient(uri=settings.storage.milvus.uri)
+            cls._async_client_loop = loop
+        return cls._async_client
+
+    @classmethod
+    async def _async_search_collection(cls, collection_name, query_vector, search_params, top_k, expr,
+                                       output_fields):
+        client = cls.get_async_client()
+        # 加载状态已缓存时不发起请求
+        await asyncio.to_thread(cls.load_collection, collection_name)
+        output_fields = await asyncio.to_thread(cls._search_output_fields, collection_name, output_fields)
+        storage, data, param, limit, search_fields = await asyncio.to_thread(
+            cls._prepare_search, collection_name, query_vector, search_params, top_k, output_fields)
+        result = await cls._async_call_loaded(collection_name, lambda: client.search(
+            collection_name=collection_name,
+            data=[data],
+            anns_field=MILVUS_EMBEDDING_FIELD_NAME,
+            search_params=param,
+            limit=limit,
+            filter=expr or "",
+            output_fields=search_fields,
+        ))
+        return cls._rescore(cls._flatten_hits(result, collection_name), storage, query_vector, search_params,
+                            top_k, output_fields)
+
+    @classmethod
+    def _call_loaded(cls, collection_name, call):
+        try:
+            return call()
+        except MilvusException as e:
+            if not cls._is_not_loaded_error(e):
+                raise
+            # 集合已被其他进程释放 重新加载后重试
+            MilvusLoadManager().invalidate(collection_name)
+            cls.load_collection(collection_name)
+            return call()
+
+    @classmethod
+    async def _async_call_loaded(cls, collection_name, call):
+        try:
+            return await call()
+        except MilvusException as e:
+            if not cls._is_not_loaded_error(e):
+                raise
+            # 集合已被其他进程释放 重新加载后重试
+            MilvusLoadManager().invalidate(collection_name)
+            await asyncio.to_thread(cls.load_collection, collection_name)
+            return await call()
+
+    @staticmethod
+    def _flatten_hits(result, collection_name):
         results = []
+        for hits in result:
+            for hit in hits:
+                result_dict = dict(hit)
+                result_dict["collection_name"] = collection_name
+                results.append(result_dict)
+        return results
 
-        if search_params is None:
-            search_params = {"metric_type": "L2", "params": {"ef": 10}}
+    @classmethod
+    async def async_similarity_search(cls, query_vector, collection_names, search_params=None, top_k=5, expr=None,
+                                      output_fields=None, knowledge_ids=None):
+        """
+        异步根据向量进行相似性搜索，多个集合并发检索后合并为全局 top_k，参数同 similarity_search。
 
+        :return: 搜索结果。
+        """
         try:
-            for collection_name in collection_names:
-                collection = Collection(collection_name)
-                cls.load_collection(collection_name)  # 加载集合
-                # 如果用户没有指定输出字段，则默认返回所有字段（除了向量字段本身）
-                if output_fields is None:
-                    output_fields = [field.name for field in collection.schema.fields if field.name != "vector"]
-                # TODO 需要修改 MilvusUtil 以支持异步
-                # search_kwargs = {
-                #     "_async": True  # 启用Milvus异步
-                # }
-                result: SearchResult = collection.search(
-                    data=[query_vector],
-                    anns_field="vector",
-                    param=search_params,
-                    limit=top_k,
-                    expr=expr,  # 条件过滤表达式
-                    output_fields=output_fields,  # 指定返回的字段
-                    # **search_kwargs
-                )
-
-                # 提取结果中的数据
-                for hits in result:
-                    # <class 'pymilvus.client.abstract.Hits'>
-                    for hit in hits:
-                        result_dict = hit.to_dict()
-                        # 增加collection_name
-                        result_dict["collection_name"] = collection_name
-                        results.append(result_dict)
+            result_lists = await asyncio.gather(*[
+                cls._async_search_collection(
+                    collection_name, query_vector, search_params, top_k,
+                    cls.merge_expr(cls.knowledge_expr((knowledge_ids or {}).get(collection_name)), expr),
+                    output_fields)
+                for collection_name in dict.fromkeys(collection_names)
+            ])
+            results = cls.merge_top_k(result_lists, top_k, (search_params or {}).get("metric_type", "L2"))
 
             logger_util.info(f"Milvus查询成功，返回结果数量: {len(results)}")
             return results
@@ -147,6 +387,138 @@ class MilvusUtil:
             logger_util.error(f"搜索向量失败：{e}")
             return []
 
+    @classmethod
+    async def _async_batch_search_collection(cls, collection_name, query_vectors, search_params, top_k, expr,
+                                             output_fields):
+        """单个集合一次请求检索多个查询向量，返回各查询的结果列表"""
+        client = cls.get_async_client()
+        await asyncio.to_thread(cls.load_collection, collection_name)
+        output_fields = await asyncio.to_thread(cls._search_output_fields, collection_name, output_fields)
+        storage, _, param, limit, search_fields = await asyncio.to_thread(
+            cls._prepare_search, collection_name, query_vectors[0], search_params, top_k, output_fields)
+        data = [encode_query(storage, query_vector) for query_vector in query_vectors] \
+            if needs_rescore(storage) else list(query_vectors)
+        result = await cls._async_call_loaded(collection_name, lambda: client.search(
+            collection_name=collection_name,
+            data=data,
+            anns_field=MILVUS_EMBEDDING_FIELD_NAME,
+            search_params=param,
+            limit=limit,
+            filter=expr or "",
+            output_fields=search_fields,
+        ))
+        return [cls._rescore(cls._flatten_hits([hits], collection_name), storage, query_vector, search_params,
+                             top_k, output_fields)
+                for hits, query_vector in zip(result, query_vectors)]
+
+    @classmethod
+    async def async_batch_similarity_search(cls, query_vectors, collection_names, search_params=None, top_k=5,
+                                            expr=None, output_fields=None, knowledge_ids=None):
+        """
+        异步批量相似性搜索，每个集合以一次多向量请求检索全部查询，参数同 similarity_search。
+
+        :param query_vectors: 查询向量列表。
+        :return: 与 query_vectors 顺序一致的各查询 top_k 结果。
+        """
+        if not query_vectors:
+            return []
+        try:
+            collection_result_lists = await asyncio.gather(*[
+                cls._async_batch_search_collection(
+                    collection_name, query_vectors, search_params, top_k,
+                    cls.merge_expr(cls.knowledge_expr((knowledge_ids or {}).get(collection_name)), expr),
+                    output_fields)
+                for collection_name in dict.fromkeys(collection_names)
+            ])
+            metric_type = (search_params or {}).get("metric_type", "L2")
+            results = [cls.merge_top_k([result_lists[i] for result_lists in collection_result_lists], top_k,
+                                       metric_type)
+                       for i in range(len(query_vectors))]
+            logger_util.info(f"Milvus批量查询成功，查询数量: {len(query_vectors)}")
+            return results
+        except MilvusException as e:
+            logger_util.error(f"批量搜索向量失败：{e}")
+            return [[] for _ in query_vectors]
+
+    @classmethod
+    def supports_hybrid_search(cls, collection_name):
+        """
+        判断集合是否包含 BM25 稀疏向量字段，可在 Milvus 内完成稠密+稀疏混合检索。
+
+        :param collection_name: 集合名称。
+        :return: 是否支持原生混合检索。
+        """
+        if collection_name not in cls._hybrid_support:
+            try:
+                fields = Collection(collection_name).schema.fields
+                cls._hybrid_support[collection_name] = any(
+                    field.name == MILVUS_SPARSE_FIELD_NAME for field in fields)
+            except MilvusException as e:
+                logger_util.warning(f"获取集合 {collection_name} 结构失败: {e}")
+                return False
+        return cls._hybrid_support[collection_name]
+
+    @classmethod
+    async def _async_hybrid_search_collection(cls, collection_name, query_vector, query_text, search_params, top_k,
+                                              expr, output_fields):
+        client = cls.get_async_client()
+        await asyncio.to_thread(cls.load_collection, collection_name)
+        output_fields = await asyncio.to_thread(cls._search_output_fields, collection_name, output_fields)
+        # 量化存储的集合按存储格式转换查询向量 融合得分不做精排
+        storage = await asyncio.to_thread(cls.get_vector_storage, collection_name)
+        if needs_rescore(storage):
+            query_vector = encode_query(storage, query_vector)
+            search_params = storage_search_params(storage, search_params or cls._default_search_params, top_k)
+        else:
+            search_params = await asyncio.to_thread(cls._resolve_search_params, collection_name, search_params, top_k)
+        requests = [
+            AnnSearchRequest(data=[query_vector], anns_field=MILVUS_EMBEDDING_FIELD_NAME,
+                             param=search_params, limit=top_k, expr=expr or None),
+            AnnSearchRequest(data=[query_text], anns_field=MILVUS_SPARSE_FIELD_NAME,
+                             param=MILVUS_SPARSE_SEARCH_PARAMS, limit=top_k, expr=expr or None),
+        ]
+        result = await cls._async_call_loaded(collection_name, lambda: client.hybrid_search(
+            collection_name=collection_name,
+            reqs=requests,
+            ranker=RRFRanker(settings.retrieval.rrf_k),
+            limit=top_k,
+            output_fields=output_fields,
+        ))
+        return cls._flatten_hits(result, collection_name)
+
+    @classmethod
+    async def async_hybrid_search(cls, query_vector, query_text, collection_names, search_params=None, top_k=5,
+                                  expr=None, output_fields=None, knowledge_ids=None):
+        """
+        异步稠密向量 + BM25 稀疏向量混合检索，由 Milvus 在服务端以 RRF 融合两路结果。
+        集合需包含 BM25 稀疏向量字段（见 supports_hybrid_search）。
+
+        :param query_vector: 查询向量。
+        :param query_text: 查询文本，由 Milvus BM25 函数分词。
+        :param collection_names: 集合名称列表。
+        :param search_params: 稠密向量搜索参数。
+        :param top_k: 返回结果数量。
+        :param expr: 条件过滤表达式。
+        :param output_fields: 需要返回的字段列表。
+        :param knowledge_ids: 集合名称到知识库ID列表的映射。
+        :return: 搜索结果，distance 为 RRF 融合得分（越大越相似）。
+        """
+        try:
+            result_lists = await asyncio.gather(*[
+                cls._async_hybrid_search_collection(
+                    collection_name, query_vector, query_text, search_params, top_k,
+                    cls.merge_expr(cls.knowledge_expr((knowledge_ids or {}).get(collection_name)), expr),
+                    output_fields)
+                for collection_name in dict.fromkeys(collection_names)
+            ])
+            results = cls.merge_top_k(result_lists, top_k, "IP")
+
+            logger_util.info(f"Milvus混合检索成功，返回结果数量: {len(results)}")
+            return results
+        except MilvusException as e:
+            logger_util.error(f"混合检索失败：{e}")
+            return []
+
     @classmethod
     def create_index_on_field(cls, collection_name, field_name, index_params):
         """
@@ -164,6 +536,57 @@ class MilvusUtil:
             logger_util.error(f"在{collection_name}集合上字段{field_name}创建索引失败:{e}")
             raise MilvusException(message=f"在{collection_name}集合上字段{field_name}创建索引失败:{e}")
 
+    @classmethod
+    def count_rows(cls, collection_name):
+        """
+        获取集合已落盘的行数(不含未 flush 的增长段)。
+
+        :param collection_name: 集合名称。
+        :return: 行数。
+        """
+        return Collection(collection_name).num_entities
+
+    @classmethod
+    def advise_index(cls, collection_name):
+        """
+        数据增长后按 IndexAdvisor 判断 float 存储集合是否需要升级索引(FLAT -> HNSW -> IVF_PQ/DISKANN)。
+        仅给出建议，不修改正在服务的集合，升级由后台任务在新集合中建索引后切换完成。
+
+        :param collection_name: 集合名称。
+        :return: 建议的索引参数，无需升级时返回 None。
+        """
+        if not settings.storage.milvus.auto_index:
+            return None
+        try:
+            current_params = cls.get_index_params(collection_name)
+            if current_params is None or cls.get_vector_storage(collection_name) != VECTOR_STORAGE_FLOAT:
+                return None
+            dim = next(int(field.params["dim"]) for field in Collection(collection_name).schema.fields
+                       if field.name == MILVUS_EMBEDDING_FIELD_NAME)
+            advised_params = IndexAdvisor.choose_index(cls.count_rows(collection_name), dim,
+                                                       current_params.get("metric_type", "L2"))
+            if IndexAdvisor.should_rebuild(current_params, advised_params):
+                return advised_params
+        except Exception as e:
+            logger_util.warning(f"集合{collection_name}索引评估失败: {e}")
+        return None
+
+    @classmethod
+    def wait_for_index(cls, collection_name):
+        """
+        等待集合向量索引构建完成并加载集合，用于新集合切换为服务集合之前。
+
+        :param collection_name: 集合名称。
+        :return: None
+        """
+        try:
+            Collection(collection_name).flush()
+            utility.wait_for_index_building_complete(collection_name)
+            cls.load_collection(collection_name)
+        except MilvusException as e:
+            logger_util.error(f"等待集合{collection_name}索引构建失败:{e}")
+            raise MilvusException(message=f"等待集合{collection_name}索引构建失败:{e}")
+
     @classmethod
     def delete_collection(cls, collection_name):
         """
@@ -175,6 +598,11 @@ class MilvusUtil:
         try:
             if cls.check_collection_exists(collection_name):
                 Collection(collection_name).drop()
+                MilvusLoadManager().forget(collection_name)
+                cls._hybrid_support.pop(collection_name, None)
+                cls._vector_storage.pop(collection_name, None)
+                cls._index_params.pop(collection_name, None)
+                cls._field_names.pop(collection_name, None)
                 logger_util.info(f"集合{collection_name}已删除")
             else:
                 logger_util.warning(f"集合{collection_name}不存在无需删除")
@@ -186,14 +614,13 @@ class MilvusUtil:
     def load_collection(cls, collection_name: str):
         """
         检查集合是否已加载，如果未加载则加载集合到内存中。
+        加载状态由 MilvusLoadManager 缓存，已加载的集合不再发起 load 调用。
 
         :param collection_name: 集合名称。
         :return: None
         """
         try:
-            collection = Collection(collection_name)
-            collection.load()
-            logger_util.info(f"集合 {collection_name} 已加载到内存。")
+            MilvusLoadManager().ensure_loaded(collection_name)
         except MilvusException as e:
             logger_util.error(f"加载集合 {collection_name} 失败: {e}")
             raise MilvusException(message=f"加载集合 {collection_name} 失败: {e}")
@@ -227,7 +654,7 @@ class MilvusUtil:
                 cls.load_collection(collection_name)
 
                 collection = Collection(collection_name)
-                collection.delete(expr)  # 删除符合条件的记录
+                cls._call_loaded(collection_name, lambda: collection.delete(expr))  # 删除符合条件的记录
                 collection.flush()  # 刷新集合，确保删除操作生效
                 logger_util.info(f"从集合 {collection_name} 中删除了符合条件的记录，条件为: {expr}")
             else:
@@ -236,9 +663,87 @@ class MilvusUtil:
             logger_util.error(f"删除集合 {collection_name} 中的记录失败，条件为: {expr}，错误信息: {e}")
             raise MilvusException(message=f"删除集合 {collection_name} 中的记录失败，条件为: {expr}，错误信息: {e}")
 
+    @classmethod
+    def list_field_names(cls, collection_name: str):
+        """
+        获取集合中可写入的标量字段名称（排除自增主键、向量字段与函数输出字段）。
+
+        :param collection_name: 集合名称。
+        :return: 字段名称列表。
+        """
+        if collection_name in cls._field_names:
+            return list(cls._field_names[collection_name])
+        try:
+            collection = Collection(collection_name)
+            cls._field_names[collection_name] = [
+                field.name
+                for field in collection.schema.fields
+                if not field.auto_id and field.name != MILVUS_EMBEDDING_FIELD_NAME
+                and not getattr(field, "is_function_output", False)
+            ]
+            return list(cls._field_names[collection_name])
+        except MilvusException as e:
+            logger_util.error(f"获取集合 {collection_name} 字段失败: {e}")
+            raise MilvusException(message=f"获取集合 {collection_name} 字段失败: {e}")
+
+    @classmethod
+    def query(cls, collection_name: str, expr: str, output_fields=None, limit=None):
+        """
+        根据条件表达式查询集合中的数据记录。
+
+        :param collection_name: 集合名称。
+        :param expr: 条件过滤表达式。
+        :param output_fields: 指定返回的字段列表，可选。
+        :param limit: 返回记录数量上限，可选。
+        :return: 查询结果列表，每个元素为一个字典。
+        """
+        try:
+            cls.load_collection(collection_name)
+            collection = Collection(collection_name)
+            query_kwargs = {"limit": limit} if limit is not None else {}
+            return cls._call_loaded(collection_name, lambda: collection.query(
+                expr=expr, output_fields=output_fields, **query_kwargs))
+        except MilvusException as e:
+            logger_util.error(f"查询集合 {collection_name} 失败，条件为: {expr}，错误信息: {e}")
+            raise MilvusException(message=f"查询集合 {collection_name} 失败，条件为: {expr}，错误信息: {e}")
+
+    @classmethod
+    def query_iterator(cls, collection_name: str, expr: str, output_fields=None, batch_size: int = 500):
+        """
+        分批遍历集合中符合条件的数据记录，避免一次性拉取全部数据。
+
+        :param collection_name: 集合名称。
+        :param expr: 条件过滤表达式。
+        :param output_fields: 指定返回的字段列表，可选。
+        :param batch_size: 每批返回的记录数量，默认为 500。
+        :return: 生成器，每次返回一批记录（字典列表）。
+        """
+        try:
+            cls.load_collection(collection_name)
+            collection = Collection(collection_name)
+            iterator = cls._call_loaded(collection_name, lambda: collection.query_iterator(
+                batch_size=batch_size, expr=expr, output_fields=output_fields))
+            try:
+                while True:
+                    batch = iterator.next()
+                    if not batch:
+                        break
+                    yield batch
+            finally:
+                iterator.close()
+        except MilvusException as e:
+            logger_util.error(f"遍历集合 {collection_name} 失败，条件为: {expr}，错误信息: {e}")
+            raise MilvusException(message=f"遍历集合 {collection_name} 失败，条件为: {expr}，错误信息: {e}")
+
     @staticmethod
     def unified_pca(vectors, target_dim=1024):
+        """
+        Deprecated: 每次调用重新拟合 PCA, 单条查询向量无法拟合, 入库与查询也不共享投影。
+        请使用知识库降维投影 readbetween.utils.projection(按集合拟合一次并持久化)。
+        """
         # 调用示例 ::: query_vectors = MilvusUtil.unified_pca([query_vectors], 1024)[0]
+        warnings.warn("MilvusUtil.unified_pca 已废弃, 请使用 readbetween.utils.projection",
+                      DeprecationWarning, stacklevel=2)
         if isinstance(vectors, list):
             vectors = np.array(vectors)
         original_dim = vectors.shape[1]
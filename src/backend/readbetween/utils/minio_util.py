@@ -1,7 +1,11 @@
+import io
 import mimetypes
 import os
 import tempfile
+import threading
+import time
 from datetime import timedelta
+from typing import Dict, Optional
 from readbetween.config import settings
 from readbetween.utils.logger_util import logger_util
 from minio import Minio
@@ -11,6 +15,10 @@ class MinioUtil:
 
     # 默认桶
     default_bucket_name = settings.storage.minio.default_bucket
+    # 预签名链接缓存 (桶, 对象, 有效期) -> (链接, 缓存失效时间) 进程内共享
+    _presigned_cache: Dict[tuple, tuple] = {}
+    _presigned_cache_lock = threading.Lock()
+    _presigned_cache_max_size = 4096
 
     def __init__(self, endpoint=None, access_key=None, secret_key=None, secure=None):
         self.secure = secure or settings.storage.minio.secure
@@ -55,6 +63,40 @@ class MinioUtil:
             logger_util.error(f"上传文件失败:{e}")
             raise S3Error(code=500, message=f"上传文件失败:{e}")
 
+    def put_bytes(self, object_name: str, data: bytes, bucket_name: str = default_bucket_name,
+                  content_type: str = 'application/octet-stream'):
+        """上传二进制数据到 MinIO"""
+        try:
+            if self.bucket_exists(bucket_name) is False:
+                self.create_bucket(bucket_name)
+            self.client.put_object(bucket_name, object_name, io.BytesIO(data), len(data), content_type)
+        except S3Error as e:
+            logger_util.error(f"上传对象失败:{e}")
+            raise S3Error(code=500, message=f"上传对象失败:{e}")
+
+    def get_bytes(self, object_name: str, bucket_name: str = default_bucket_name) -> Optional[bytes]:
+        """读取对象内容，对象不存在时返回 None"""
+        response = None
+        try:
+            response = self.client.get_object(bucket_name, object_name)
+            return response.read()
+        except S3Error as e:
+            if e.code not in ("NoSuchKey", "NoSuchBucket"):
+                logger_util.error(f"读取对象 '{object_name}' 失败: {e}")
+                raise
+            return None
+        finally:
+            if response is not None:
+                response.close()
+                response.release_conn()
+
+    def remove_object(self, object_name: str, bucket_name: str = default_bucket_name):
+        """删除对象"""
+        try:
+            self.client.remove_object(bucket_name, object_name)
+        except S3Error as e:
+            logger_util.error(f"删除对象 '{object_name}' 失败: {e}")
+
     def get_presigned_url(self, object_name: str, expires: int = 3600, bucket_name: str = default_bucket_name) -> str:
         """获取文件的预签名 URL"""
         try:
@@ -63,6 +105,29 @@ class MinioUtil:
             logger_util.error(f"Error generating presigned URL: {e}")
             return ""
 
+    def get_cached_presigned_url(self, object_name: str, expires: int = 3600,
+                                 bucket_name: str = default_bucket_name) -> str:
+        """
+        获取文件的预签名 URL, 同一对象复用已签名的链接
+        缓存在链接过期前失效(提前有效期的 10%, 至少 60 秒), 返回的链接仍有足够的有效期
+        """
+        key = (bucket_name, object_name, expires)
+        now = time.monotonic()
+        with self._presigned_cache_lock:
+            cached = self._presigned_cache.get(key)
+        if cached is not None and cached[1] > now:
+            return cached[0]
+        url = self.get_presigned_url(object_name, expires=expires, bucket_name=bucket_name)
+        ttl = expires - max(expires // 10, 60)
+        if url and ttl > 0:
+            with self._presigned_cache_lock:
+                self._presigned_cache.pop(key, None)
+                # 超出容量时淘汰最早写入的链接
+                while len(self._presigned_cache) >= self._presigned_cache_max_size:
+                    self._presigned_cache.pop(next(iter(self._presigned_cache)))
+                self._presigned_cache[key] = (url, now + ttl)
+        return url
+
     def get_object_md5(self, object_name: str, bucket_name: str = default_bucket_name) -> str:
         """获取桶中对象的 MD5 值"""
         try:
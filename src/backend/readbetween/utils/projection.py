@@ -0,0 +1,246 @@
+import io
+import threading
+import time
+from typing import Dict, Optional
+
+import numpy as np
+
+from readbetween.config import settings
+from readbetween.models.dao.knowledge_chunk import KnowledgeChunkDao
+from readbetween.services.constant import PROJECTION_METHOD_PCA, PROJECTION_METHOD_MATRYOSHKA, \
+    PROJECTION_OBJECT_PREFIX, PrefixRedisProjectionLock
+from readbetween.utils.logger_util import logger_util
+from readbetween.utils.minio_util import MinioUtil
+from readbetween.utils.redis_util import RedisUtil
+
+
+class Projection:
+    """
+    向量降维投影
+        pca: (v - mean) @ components.T, components 为样本协方差前 dim 个主成分
+        matryoshka: 截取前 dim 维后归一化, 需嵌入模型以 Matryoshka 方式训练
+    入库与查询使用同一投影, 保证文档与查询向量处于同一空间
+    """
+
+    def __init__(self, method: str, dim: int, mean: Optional[np.ndarray] = None,
+                 components: Optional[np.ndarray] = None):
+        self.method = method
+        self.dim = dim
+        self.mean = mean
+        # (source_dim, dim) 便于按行批量矩阵乘
+        self.matrix = None if components is None else np.ascontiguousarray(components.T, dtype=np.float32)
+
+    @classmethod
+    def fit(cls, method: str, dim: int, sample: np.ndarray) -> "Projection":
+        """
+        根据样本向量拟合投影，PCA 样本数少于目标维度时拒绝拟合
+        :param method: 投影方式 pca | matryoshka
+        :param dim: 目标维度
+        :param sample: (n, source_dim) 样本向量
+        :return: 投影
+        """
+        sample = np.asarray(sample, dtype=np.float32)
+        if sample.ndim != 2 or dim >= sample.shape[1]:
+            raise ValueError(f"投影目标维度 {dim} 需小于原始维度 {sample.shape[-1]}")
+        if method == PROJECTION_METHOD_PCA and len(sample) < dim:
+            raise ValueError(f"PCA 投影样本数 {len(sample)} 少于目标维度 {dim}, 知识库切片达到目标维度后重新向量化, "
+                             f"或降低投影维度/使用 matryoshka 投影")
+        if method == PROJECTION_METHOD_MATRYOSHKA:
+            return cls(method, dim)
+        if method != PROJECTION_METHOD_PCA:
+            raise ValueError(f"不支持的投影方式: {method}")
+        mean = sample.mean(axis=0)
+        # 经济型 SVD 右奇异向量即主成分方向
+        _, _, vt = np.linalg.svd(sample - mean, full_matrices=False)
+        return cls(method, dim, mean=mean, components=vt[:dim])
+
+    def transform(self, vectors) -> np.ndarray:
+        """
+        批量投影
+        :param vectors: (n, source_dim) 或 (source_dim,) 向量
+        :return: 投影后的 float32 向量，形状与输入对应
+        """
+        vectors = np.asarray(vectors, dtype=np.float32)
+        if self.method == PROJECTION_METHOD_MATRYOSHKA:
+            projected = vectors[..., :self.dim]
+            return projected / np.maximum(np.linalg.norm(projected, axis=-1, keepdims=True), 1e-12)
+        return (vectors - self.mean) @ self.matrix
+
+    def to_bytes(self) -> bytes:
+        buffer = io.BytesIO()
+        arrays = {"method": np.array(self.method), "dim": np.array(self.dim)}
+        if self.matrix is not None:
+            arrays.update(mean=self.mean, components=self.matrix.T)
+        np.savez(buffer, **arrays)
+        return buffer.getvalue()
+
+    @classmethod
+    def from_bytes(cls, data: bytes) -> "Projection":
+        with np.load(io.BytesIO(data)) as arrays:
+            return cls(str(arrays["method"]), int(arrays["dim"]),
+                       mean=arrays["mean"] if "mean" in arrays else None,
+                       components=arrays["components"] if "components" in arrays else None)
+
+
+class ProjectionStore:
+    """
+    投影持久化
+        以集合名称为键保存至 MinIO, 嵌入模型迁移新建集合时重新拟合
+        进程内缓存已加载的投影, 多进程首次拟合通过 Redis 锁互斥
+    """
+
+    def __init__(self, lock_timeout: int = 60):
+        self.lock_timeout = lock_timeout
+        self._lock = threading.Lock()
+        self._cache: Dict[str, Projection] = {}
+        self._minio_client: Optional[MinioUtil] = None
+        self._redis_client: Optional[RedisUtil] = None
+
+    @property
+    def minio_client(self) -> MinioUtil:
+        if self._minio_client is None:
+            self._minio_client = MinioUtil()
+        return self._minio_client
+
+    @property
+    def redis_client(self) -> RedisUtil:
+        if self._redis_client is None:
+            self._redis_client = RedisUtil()
+        return self._redis_client
+
+    @staticmethod
+    def _object_name(collection_name: str) -> str:
+        return f"{PROJECTION_OBJECT_PREFIX}{collection_name}.npz"
+
+    def get(self, collection_name: str) -> Optional[Projection]:
+        """
+        获取集合的投影，尚未拟合时返回 None
+        :param collection_name: 集合名称
+        """
+        with self._lock:
+            projection = self._cache.get(collection_name)
+        if projection is not None:
+            return projection
+        data = self.minio_client.get_bytes(self._object_name(collection_name))
+        if data is None:
+            return None
+        projection = Projection.from_bytes(data)
+        with self._lock:
+            self._cache[collection_name] = projection
+        return projection
+
+    def get_or_fit(self, collection_name: str, method: str, dim: int, sample) -> Projection:
+        """
+        获取集合的投影，不存在时使用样本拟合并持久化
+        :param collection_name: 集合名称
+        :param method: 投影方式
+        :param dim: 目标维度
+        :param sample: 拟合样本向量，最多使用 storage.vector_store.projection_sample_size 条
+        :return: 投影
+        """
+        projection = self.get(collection_name)
+        if projection is not None:
+            return projection
+        lock_key = f"{PrefixRedisProjectionLock}{collection_name}"
+        deadline = time.monotonic() + self.lock_timeout
+        # 锁带过期时间 拟合进程异常退出后自动释放
+        while not self.redis_client.client.set(lock_key, "1", nx=True, ex=self.lock_timeout):
+            # 其他进程正在拟合 等待其写入
+            if time.monotonic() > deadline:
+                raise TimeoutError(f"等待集合 {collection_name} 投影拟合超时")
+            time.sleep(0.5)
+            projection = self.get(collection_name)
+            if projection is not None:
+                return projection
+        try:
+            projection = self.get(collection_name)
+            if projection is not None:
+                return projection
+            sample = np.asarray(sample, dtype=np.float32)[:settings.storage.vector_store.projection_sample_size]
+            projection = Projection.fit(method, dim, sample)
+            self.minio_client.put_bytes(self._object_name(collection_name), projection.to_bytes())
+            logger_util.info(f"集合 {collection_name} 投影拟合完成: {projection.method} "
+                             f"{sample.shape[1]} -> {dim}, 样本 {len(sample)} 条")
+        finally:
+            self.redis_client.delete(lock_key)
+        with self._lock:
+            self._cache[collection_name] = projection
+        return projection
+
+    def copy(self, source_collection_name: str, target_collection_name: str):
+        """
+        复用源集合的投影至目标集合(向量原样复制的新集合需使用相同投影)
+        :param source_collection_name: 源集合名称
+        :param target_collection_name: 目标集合名称
+        """
+        projection = self.get(source_collection_name)
+        if projection is None:
+            return
+        self.minio_client.put_bytes(self._object_name(target_collection_name), projection.to_bytes())
+        with self._lock:
+            self._cache[target_collection_name] = projection
+
+    def delete(self, collection_name: str):
+        """删除集合的投影"""
+        with self._lock:
+            self._cache.pop(collection_name, None)
+        self.minio_client.remove_object(self._object_name(collection_name))
+
+
+projection_store = ProjectionStore()
+
+
+def _knowledge_sample(knowledge, embed_client, vectors, batch_size: int = 64) -> np.ndarray:
+    """
+    拟合样本: 知识库全部文件中随机抽取的切片(已写入 knowledge_chunk 表)重新向量化, 与本批向量合并
+    """
+    sample_size = settings.storage.vector_store.projection_sample_size
+    sample = [np.asarray(vectors, dtype=np.float32).reshape(len(vectors), -1)]
+    if embed_client is not None:
+        # 切片内容为「标题:原文」 入库时向量化内容为原文
+        contents = []
+        for chunk in KnowledgeChunkDao.sample_by_knowledge_id(knowledge.id, sample_size):
+            prefix = f"{chunk.title or ''}:"
+            text = chunk.text or ""
+            contents.append(text[len(prefix):] if text.startswith(prefix) else text)
+        for start in range(0, len(contents), batch_size):
+            sample.append(np.asarray(embed_client.get_embeddings(inputs=contents[start:start + batch_size]),
+                                     dtype=np.float32))
+    return np.concatenate(sample)[:sample_size]
+
+
+def project_for_ingest(knowledge, collection_name: str, vectors, embed_client=None):
+    """
+    入库向量投影，知识库未配置投影时原样返回
+    集合尚未拟合投影时以知识库范围的切片样本拟合, PCA 样本不足目标维度时抛出异常, 不改变投影方式
+    :param knowledge: 知识库
+    :param collection_name: 写入的集合名称
+    :param vectors: (n, source_dim) 向量
+    :param embed_client: 与 vectors 相同嵌入模型的客户端，用于向量化拟合样本
+    :return: 向量列表
+    """
+    if knowledge is None or not knowledge.projection_dim:
+        return vectors
+    projection = projection_store.get(collection_name)
+    if projection is None:
+        projection = projection_store.get_or_fit(collection_name,
+                                                 knowledge.projection_method or PROJECTION_METHOD_PCA,
+                                                 knowledge.projection_dim,
+                                                 _knowledge_sample(knowledge, embed_client, vectors))
+    return projection.transform(vectors).tolist()
+
+
+def project_for_query(knowledge, collection_name: str, query_vector):
+    """
+    查询向量投影，知识库未配置投影时原样返回
+    :param knowledge: 知识库
+    :param collection_name: 检索的集合名称
+    :param query_vector: 查询向量
+    :return: 投影后的查询向量，投影尚未拟合(集合中无数据)时返回 None
+    """
+    if knowledge is None or not knowledge.projection_dim:
+        return query_vector
+    projection = projection_store.get(collection_name)
+    if projection is None:
+        return None
+    return projection.transform(query_vector).tolist()
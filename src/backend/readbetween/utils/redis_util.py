@@ -106,4 +106,80 @@ class RedisUtil:
         """
         return self.client.flushdb()
 
+    def incr(self, key: str, amount: int = 1) -> int:
+        """自增键对应的整数值
+
+        Args:
+            key (str): 键
+            amount (int): 增量（默认为 1）
+
+        Returns:
+            int: 自增后的值
+        """
+        return self.client.incr(key, amount)
+
+    def mget(self, keys: list) -> list:
+        """批量获取键对应的值
+
+        Args:
+            keys (list): 键列表
+
+        Returns:
+            list: 值列表，键不存在时为 None
+        """
+        if not keys:
+            return []
+        return self.client.mget(keys)
+
+    def pipeline(self, transaction: bool = False):
+        """获取管道，批量发送命令减少网络往返
+
+        Args:
+            transaction (bool): 是否以事务方式执行（默认为 False）
+
+        Returns:
+            Pipeline: Redis 管道
+        """
+        return self.client.pipeline(transaction=transaction)
+
+    def zrevrange(self, key: str, start: int, end: int, withscores: bool = False) -> list:
+        """按分数从高到低获取有序集合指定区间的成员
+
+        Args:
+            key (str): 键
+            start (int): 起始下标
+            end (int): 结束下标
+            withscores (bool): 是否同时返回分数
+
+        Returns:
+            list: 成员列表
+        """
+        return self.client.zrevrange(key, start, end, withscores=withscores)
+
+    def zmscore(self, key: str, members: list) -> list:
+        """批量获取有序集合成员的分数
+
+        Args:
+            key (str): 键
+            members (list): 成员列表
+
+        Returns:
+            list: 分数列表，成员不存在时为 None
+        """
+        if not members:
+            return []
+        return self.client.zmscore(key, members)
+
+    def zrem(self, key: str, *members) -> int:
+        """删除有序集合中的成员
+
+        Args:
+            key (str): 键
+            members: 成员
+
+        Returns:
+            int: 被删除的成员数量
+        """
+        return self.client.zrem(key, *members)
+
     # 你可以根据需要添加更多的 Redis 操作方法
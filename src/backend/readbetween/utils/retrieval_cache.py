@@ -0,0 +1,183 @@
+import copy
+import json
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from readbetween.config import settings
+from readbetween.models.schemas.retriever import RetrieverResult
+from readbetween.services.constant import PrefixRedisKnowledgeVersion
+from readbetween.utils.logger_util import logger_util
+from readbetween.utils.redis_util import RedisUtil
+
+# 单条检索结果除文本与元数据外的估算内存占用
+RESULT_OVERHEAD_BYTES = 256
+
+_redis_client: Optional[RedisUtil] = None
+
+
+def _get_redis_client() -> RedisUtil:
+    global _redis_client
+    if _redis_client is None:
+        _redis_client = RedisUtil()
+    return _redis_client
+
+
+def bump_knowledge_version(kb_id: str):
+    """
+    知识库数据变更(入库/删除/迁移)后自增版本号，使相关检索结果缓存失效
+    :param kb_id: 知识库ID
+    """
+    try:
+        _get_redis_client().incr(f"{PrefixRedisKnowledgeVersion}{kb_id}")
+    except Exception as e:
+        logger_util.warning(f"更新知识库{kb_id}版本号失败: {e}")
+
+
+def get_knowledge_versions(kb_ids: Sequence[str]) -> Tuple[int, ...]:
+    """
+    批量获取知识库版本号
+    :param kb_ids: 知识库ID列表
+    :return: 与 kb_ids 对应的版本号
+    """
+    values = _get_redis_client().mget([f"{PrefixRedisKnowledgeVersion}{kb_id}" for kb_id in kb_ids])
+    return tuple(int(value) if value else 0 for value in values)
+
+
+class _CacheEntry:
+    __slots__ = ("scope", "query_vector", "versions", "results", "size", "expire_at")
+
+    def __init__(self, scope, query_vector, versions, results, size, expire_at):
+        self.scope = scope
+        self.query_vector = query_vector
+        self.versions = versions
+        self.results = results
+        self.size = size
+        self.expire_at = expire_at
+
+
+class RetrievalCache:
+    """
+    检索结果语义缓存
+        同一知识库集合与检索参数(scope)下, 查询向量余弦相似度达到阈值即命中
+        条目记录写入时的知识库版本号, 版本号变化后失效
+        按 LRU 淘汰, 总内存不超过上限
+    """
+
+    def __init__(self, threshold: float = None, max_bytes: int = None, ttl: int = None):
+        self.threshold = settings.retrieval.result_cache_threshold if threshold is None else threshold
+        self.max_bytes = settings.retrieval.result_cache_max_mb * 1024 * 1024 if max_bytes is None else max_bytes
+        self.ttl = settings.retrieval.result_cache_ttl if ttl is None else ttl
+        self._lock = threading.Lock()
+        self._entries: "OrderedDict[int, _CacheEntry]" = OrderedDict()
+        # scope -> 条目ID列表
+        self._scopes: Dict[tuple, List[int]] = {}
+        self._next_id = 0
+        self._size = 0
+        self._hits = 0
+        self._misses = 0
+
+    @staticmethod
+    def build_scope(kb_ids: Sequence[str], **params) -> tuple:
+        """
+        缓存作用域：知识库集合 + 检索参数
+        :param kb_ids: 知识库ID列表
+        :param params: 影响检索结果的参数
+        :return: 作用域
+        """
+        return tuple(sorted(set(kb_ids))), json.dumps(params, sort_keys=True, ensure_ascii=False, default=str)
+
+    def get(self, scope: tuple, query_vector: Sequence[float],
+            versions: Tuple[int, ...]) -> Optional[List[RetrieverResult]]:
+        """
+        查找语义相近且知识库版本一致的缓存结果
+        :return: 命中时返回检索结果副本，否则返回 None
+        """
+        query = self._normalize(query_vector)
+        now = time.time()
+        with self._lock:
+            entry_ids = self._scopes.get(scope, [])
+            # 清除过期及版本失效的条目
+            for entry_id in list(entry_ids):
+                entry = self._entries[entry_id]
+                if entry.expire_at < now or entry.versions != versions:
+                    self._remove(entry_id)
+            entry_ids = self._scopes.get(scope, [])
+            if entry_ids:
+                similarities = np.stack([self._entries[entry_id].query_vector for entry_id in entry_ids]) @ query
+                best = int(np.argmax(similarities))
+                if similarities[best] >= self.threshold:
+                    entry_id = entry_ids[best]
+                    self._entries.move_to_end(entry_id)
+                    self._hits += 1
+                    return copy.deepcopy(self._entries[entry_id].results)
+            self._misses += 1
+            return None
+
+    def put(self, scope: tuple, query_vector: Sequence[float], versions: Tuple[int, ...],
+            results: List[RetrieverResult]):
+        """
+        写入检索结果
+        :param scope: 缓存作用域
+        :param query_vector: 查询向量
+        :param versions: 检索前读取的知识库版本号
+        :param results: 检索结果
+        """
+        query = self._normalize(query_vector)
+        results = copy.deepcopy(results)
+        for result in results:
+            # 切片向量供上下文装填 MMR 复用 以 float32 数组缓存
+            if result.vector is not None:
+                result.vector = np.asarray(result.vector, dtype=np.float32)
+        size = query.nbytes + sum(
+            (result.vector.nbytes if result.vector is not None else 0)
+            + len((result.text or "").encode("utf-8"))
+            + len(json.dumps(result.metadata, ensure_ascii=False, default=str).encode("utf-8"))
+            + RESULT_OVERHEAD_BYTES
+            for result in results
+        )
+        if size > self.max_bytes:
+            return
+        with self._lock:
+            entry_id = self._next_id
+            self._next_id += 1
+            self._entries[entry_id] = _CacheEntry(scope, query, versions, results, size, time.time() + self.ttl)
+            self._scopes.setdefault(scope, []).append(entry_id)
+            self._size += size
+            while self._size > self.max_bytes and self._entries:
+                self._remove(next(iter(self._entries)))
+
+    def stats(self):
+        """
+        缓存命中统计
+        :return: 条目数、内存占用、命中次数及命中率
+        """
+        with self._lock:
+            total = self._hits + self._misses
+            return {
+                "entries": len(self._entries),
+                "memory_bytes": self._size,
+                "max_bytes": self.max_bytes,
+                "hits": self._hits,
+                "misses": self._misses,
+                "hit_rate": round(self._hits / total, 4) if total else 0.0,
+            }
+
+    def _remove(self, entry_id: int):
+        entry = self._entries.pop(entry_id)
+        self._size -= entry.size
+        scope_entry_ids = self._scopes.get(entry.scope, [])
+        scope_entry_ids.remove(entry_id)
+        if not scope_entry_ids:
+            self._scopes.pop(entry.scope, None)
+
+    @staticmethod
+    def _normalize(vector: Sequence[float]) -> np.ndarray:
+        vector = np.asarray(vector, dtype=np.float32)
+        return vector / max(float(np.linalg.norm(vector)), 1e-12)
+
+
+retrieval_cache = RetrievalCache()
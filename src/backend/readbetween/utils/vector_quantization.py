@@ -0,0 +1,209 @@
+"""
+向量量化存储
+    float16 / bfloat16: 半精度向量, 向量内存为 float 的 1/2
+    sq8: 原始向量 + IVF_SQ8 索引, 索引内存为 float 的 1/4, 原始向量保留用于精排
+    binary: 按符号位二值化, 向量内存为 float 的 1/32, 另存缩放系数 scale, 以 scale * sign(v) 近似还原
+非 float 存储检索时召回 top_k * rescore_factor 条候选, 以查询向量按原始度量重新计算距离后取 top_k
+    float16 / bfloat16 / sq8 以存储的向量精排, 与 float 检索结果基本一致
+    binary 不保存原始向量, 以 scale * sign(v) 近似精排, 距离为近似值, 召回质量低于其他存储格式
+"""
+from typing import Dict, List, Optional
+
+import numpy as np
+from pymilvus import DataType, FieldSchema
+
+from readbetween.config import settings
+from readbetween.services.constant import MILVUS_EMBEDDING_FIELD_NAME, MILVUS_VECTOR_SCALE_FIELD_NAME, \
+    VECTOR_STORAGE_FLOAT, VECTOR_STORAGE_FLOAT16, VECTOR_STORAGE_BFLOAT16, VECTOR_STORAGE_SQ8, \
+    VECTOR_STORAGE_BINARY, VECTOR_STORAGE_OPTIONS
+
+try:
+    from ml_dtypes import bfloat16
+except ImportError:  # 未安装 ml_dtypes 时不支持 bfloat16 存储
+    bfloat16 = None
+
+
+_STORAGE_DTYPES = {
+    VECTOR_STORAGE_FLOAT: DataType.FLOAT_VECTOR,
+    VECTOR_STORAGE_FLOAT16: DataType.FLOAT16_VECTOR,
+    VECTOR_STORAGE_BFLOAT16: DataType.BFLOAT16_VECTOR,
+    VECTOR_STORAGE_SQ8: DataType.FLOAT_VECTOR,
+    VECTOR_STORAGE_BINARY: DataType.BINARY_VECTOR,
+}
+# 写入与检索时需转换向量格式的存储
+_ENCODED_STORAGES = {VECTOR_STORAGE_FLOAT16, VECTOR_STORAGE_BFLOAT16, VECTOR_STORAGE_BINARY}
+
+
+def check_vector_storage(storage: str):
+    """校验向量存储格式，不支持时抛出 ValueError"""
+    if storage not in VECTOR_STORAGE_OPTIONS:
+        raise ValueError(f"不支持的向量存储格式: {storage}, 可选 {VECTOR_STORAGE_OPTIONS}")
+    if storage == VECTOR_STORAGE_BFLOAT16 and bfloat16 is None:
+        raise ValueError("bfloat16 向量存储需安装 ml_dtypes")
+
+
+def storage_fields(fields: List[FieldSchema], storage: str, dim: Optional[int] = None) -> List[FieldSchema]:
+    """
+    按存储格式替换向量字段类型，binary 额外增加缩放系数字段
+    :param fields: 默认字段定义
+    :param storage: 向量存储格式
+    :param dim: 向量维度(降维投影后的维度)，为空时保持默认维度
+    :return: 字段定义
+    """
+    result = []
+    for field in fields:
+        if field.name == MILVUS_EMBEDDING_FIELD_NAME:
+            field = FieldSchema(name=field.name, dtype=_STORAGE_DTYPES[storage],
+                                dim=dim or int(field.params["dim"]))
+        result.append(field)
+    if storage == VECTOR_STORAGE_BINARY:
+        result.append(FieldSchema(name=MILVUS_VECTOR_SCALE_FIELD_NAME, dtype=DataType.FLOAT))
+    return result
+
+
+def detect_vector_storage(vector_dtype, index_type: Optional[str] = None) -> str:
+    """
+    根据集合向量字段类型及索引类型推断存储格式
+    :param vector_dtype: 向量字段 DataType
+    :param index_type: 向量字段索引类型
+    :return: 向量存储格式
+    """
+    if vector_dtype == DataType.FLOAT16_VECTOR:
+        return VECTOR_STORAGE_FLOAT16
+    if vector_dtype == DataType.BFLOAT16_VECTOR:
+        return VECTOR_STORAGE_BFLOAT16
+    if vector_dtype == DataType.BINARY_VECTOR:
+        return VECTOR_STORAGE_BINARY
+    if index_type and index_type.upper() in ("IVF_SQ8", "HNSW_SQ"):
+        return VECTOR_STORAGE_SQ8
+    return VECTOR_STORAGE_FLOAT
+
+
+def needs_rescore(storage: str) -> bool:
+    return storage != VECTOR_STORAGE_FLOAT
+
+
+def encode_vector(storage: str, vector) -> Dict:
+    """
+    将 float 向量转换为存储格式
+    :return: 写入字段 {"vector": ..., ["vector_scale": ...]}
+    """
+    if storage not in _ENCODED_STORAGES:
+        return {MILVUS_EMBEDDING_FIELD_NAME: vector}
+    vector = np.asarray(vector, dtype=np.float32)
+    if storage == VECTOR_STORAGE_FLOAT16:
+        return {MILVUS_EMBEDDING_FIELD_NAME: vector.astype(np.float16)}
+    if storage == VECTOR_STORAGE_BFLOAT16:
+        check_vector_storage(storage)
+        return {MILVUS_EMBEDDING_FIELD_NAME: vector.astype(bfloat16)}
+    # 缩放系数取绝对值均值 使 scale * sign(v) 与 v 的 L2 误差最小
+    return {MILVUS_EMBEDDING_FIELD_NAME: np.packbits(vector > 0).tobytes(),
+            MILVUS_VECTOR_SCALE_FIELD_NAME: float(np.abs(vector).mean())}
+
+
+def encode_query(storage: str, vector):
+    """将查询向量转换为存储格式"""
+    return encode_vector(storage, vector)[MILVUS_EMBEDDING_FIELD_NAME]
+
+
+def encode_rows(storage: str, rows: List[Dict]) -> List[Dict]:
+    """批量转换写入数据中的向量字段"""
+    if storage not in _ENCODED_STORAGES:
+        return rows
+    return [dict(row, **encode_vector(storage, row[MILVUS_EMBEDDING_FIELD_NAME])) for row in rows]
+
+
+def _unwrap(value):
+    # pymilvus 以单元素列表返回二进制/半精度向量
+    if isinstance(value, (list, tuple)) and len(value) == 1 and isinstance(value[0], (bytes, bytearray)):
+        return value[0]
+    return value
+
+
+def decode_vectors(storage: str, values: List, scales: Optional[List[float]] = None) -> np.ndarray:
+    """
+    将存储格式的向量还原为 float32 矩阵，binary 为 scale * sign(v) 近似还原
+    :param storage: 向量存储格式
+    :param values: 检索返回的向量字段值
+    :param scales: binary 存储的缩放系数
+    :return: (n, dim) float32 矩阵
+    """
+    values = [_unwrap(value) for value in values]
+    if storage == VECTOR_STORAGE_BINARY:
+        bits = np.unpackbits(np.frombuffer(b"".join(bytes(value) for value in values), dtype=np.uint8))
+        signs = bits.reshape(len(values), -1).astype(np.float32) * 2 - 1
+        if scales is not None:
+            signs *= np.asarray([scale or 1.0 for scale in scales], dtype=np.float32)[:, None]
+        return signs
+    if storage == VECTOR_STORAGE_FLOAT16:
+        return np.stack([np.frombuffer(value, dtype=np.float16) if isinstance(value, (bytes, bytearray))
+                         else np.asarray(value) for value in values]).astype(np.float32)
+    if storage == VECTOR_STORAGE_BFLOAT16:
+        # bfloat16 为 float32 的高 16 位
+        return np.stack([(np.frombuffer(value, dtype=np.uint16).astype(np.uint32) << 16).view(np.float32)
+                         if isinstance(value, (bytes, bytearray)) else np.asarray(value, dtype=np.float32)
+                         for value in values])
+    return np.asarray(values, dtype=np.float32)
+
+
+def storage_search_params(storage: str, search_params: Dict, limit: int) -> Dict:
+    """
+    按存储格式调整检索参数
+    :param storage: 向量存储格式
+    :param search_params: 调用方检索参数
+    :param limit: 召回候选数量
+    :return: 检索参数
+    """
+    metric_type = search_params.get("metric_type", "L2")
+    nprobe = settings.storage.milvus.quantized_nprobe
+    if storage == VECTOR_STORAGE_SQ8:
+        return {"metric_type": metric_type, "params": {"nprobe": nprobe}}
+    if storage == VECTOR_STORAGE_BINARY:
+        return {"metric_type": "HAMMING", "params": {"nprobe": nprobe}}
+    params = dict(search_params.get("params") or {})
+    if "ef" in params:
+        params["ef"] = max(params["ef"], limit)
+    return dict(search_params, params=params)
+
+
+def rescore_hits(hits: List[Dict], query_vector, storage: str, metric_type: str, top_k: int) -> List[Dict]:
+    """
+    以查询向量按原始度量重算候选距离并取 top_k，距离尺度与 float 存储一致，可与其他集合结果直接合并
+    binary 存储以 scale * sign(v) 还原的近似向量重算，结果为近似距离而非全精度距离
+    :param hits: 检索结果 entity 中需包含向量字段(binary 另需缩放系数字段)
+    :param query_vector: float 查询向量
+    :param storage: 向量存储格式
+    :param metric_type: 距离度量 L2 | IP | COSINE
+    :param top_k: 返回数量
+    :return: 精排后的检索结果
+    """
+    if not hits:
+        return hits
+    entities = [hit.get("entity", {}) for hit in hits]
+    vectors = decode_vectors(storage,
+                             [entity.get(MILVUS_EMBEDDING_FIELD_NAME) for entity in entities],
+                             [entity.get(MILVUS_VECTOR_SCALE_FIELD_NAME) for entity in entities])
+    query = np.asarray(query_vector, dtype=np.float32)
+    metric_type = metric_type.upper()
+    if metric_type == "L2":
+        distances = ((vectors - query) ** 2).sum(axis=1)
+        order = np.argsort(distances, kind="stable")
+    else:
+        distances = vectors @ query
+        if metric_type == "COSINE":
+            distances /= np.maximum(np.linalg.norm(vectors, axis=1) * np.linalg.norm(query), 1e-12)
+        order = np.argsort(-distances, kind="stable")
+    for hit, distance in zip(hits, distances.tolist()):
+        hit["distance"] = distance
+    return [hits[i] for i in order[:top_k]]
+
+
+def vector_bytes(storage: str, dim: int) -> int:
+    """单条向量在索引中的内存占用(字节)，不含图索引/聚类中心开销"""
+    if storage in (VECTOR_STORAGE_FLOAT16, VECTOR_STORAGE_BFLOAT16):
+        return dim * 2
+    if storage == VECTOR_STORAGE_SQ8:
+        return dim
+    if storage == VECTOR_STORAGE_BINARY:
+        return dim // 8 + 4
+    return dim * 4
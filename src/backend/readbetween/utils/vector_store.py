@@ -0,0 +1,185 @@
+import asyncio
+import heapq
+import json
+import threading
+from abc import ABC, abstractmethod
+from typing import Optional
+
+from readbetween.config import settings
+
+VECTOR_STORE_BACKEND_MILVUS = "milvus"
+VECTOR_STORE_BACKEND_LOCAL = "local"
+
+
+class VectorStore(ABC):
+    """
+    向量存储抽象
+        milvus: MilvusUtil, 独立部署的 Milvus 服务
+        local: LocalVectorStore, 进程内向量索引, 适用于小规模私有化部署
+    结果格式与 Milvus 一致: {"id", "distance", "entity", "collection_name"}
+    过滤表达式使用 Milvus 语法, 本地后端支持 ==、!=、in、not in、比较运算及 and 组合
+    """
+
+    @abstractmethod
+    def check_collection_exists(self, collection_name) -> bool:
+        ...
+
+    @abstractmethod
+    def create_collection(self, collection_name, fields, functions=None):
+        ...
+
+    @abstractmethod
+    def create_index_on_field(self, collection_name, field_name, index_params):
+        ...
+
+    @abstractmethod
+    def insert_data(self, collection_name, insert_data: list, ids=None):
+        ...
+
+    @abstractmethod
+    def delete_collection(self, collection_name):
+        ...
+
+    @abstractmethod
+    def delete_collection_file(self, collection_name: str, expr: str):
+        ...
+
+    @abstractmethod
+    def load_collection(self, collection_name: str):
+        ...
+
+    @abstractmethod
+    def list_field_names(self, collection_name: str):
+        ...
+
+    @abstractmethod
+    def query(self, collection_name: str, expr: str, output_fields=None, limit=None):
+        ...
+
+    @abstractmethod
+    def query_iterator(self, collection_name: str, expr: str, output_fields=None, batch_size: int = 500):
+        ...
+
+    @abstractmethod
+    def similarity_search(self, query_vector, collection_names, search_params=None, top_k=5, expr=None,
+                          output_fields=None, knowledge_ids=None):
+        ...
+
+    @abstractmethod
+    async def async_similarity_search(self, query_vector, collection_names, search_params=None, top_k=5,
+                                      expr=None, output_fields=None, knowledge_ids=None):
+        ...
+
+    async def async_batch_similarity_search(self, query_vectors, collection_names, search_params=None, top_k=5,
+                                            expr=None, output_fields=None, knowledge_ids=None):
+        """
+        批量相似性搜索，返回与 query_vectors 顺序一致的各查询结果，默认逐条检索。
+        """
+        return list(await asyncio.gather(*[
+            self.async_similarity_search(query_vector, collection_names, search_params, top_k, expr,
+                                         output_fields, knowledge_ids)
+            for query_vector in query_vectors
+        ]))
+
+    def advise_index(self, collection_name):
+        """
+        按集合规模给出建议升级的索引参数，无需升级时返回 None，默认不升级。
+        """
+        return None
+
+    def wait_for_index(self, collection_name):
+        """
+        等待集合索引构建完成，新集合切换为服务集合前调用，默认不处理。
+        """
+
+    def supports_hybrid_search(self, collection_name) -> bool:
+        """
+        集合是否支持存储内的稠密+稀疏混合检索，不支持时由调用方回退到向量检索 + 关键词检索。
+        """
+        return False
+
+    async def async_hybrid_search(self, query_vector, query_text, collection_names, search_params=None, top_k=5,
+                                  expr=None, output_fields=None, knowledge_ids=None):
+        raise NotImplementedError(f"{type(self).__name__} 不支持混合检索")
+
+    @staticmethod
+    def merge_expr(*exprs):
+        """
+        使用 and 合并多个条件过滤表达式，忽略空表达式。
+
+        :param exprs: 条件过滤表达式。
+        :return: 合并后的表达式，全部为空时返回 None。
+        """
+        exprs = [expr for expr in exprs if expr]
+        if not exprs:
+            return None
+        return " and ".join(f"({expr})" for expr in exprs)
+
+    @staticmethod
+    def knowledge_expr(knowledge_ids):
+        """
+        构建知识库过滤表达式，共享集合中利用分区键裁剪分区。
+
+        :param knowledge_ids: 知识库ID列表。
+        :return: 条件过滤表达式。
+        """
+        if not knowledge_ids:
+            return None
+        return f"knowledge_id in {json.dumps(list(knowledge_ids))}"
+
+    @staticmethod
+    def metadata_expr(file_ids=None, page_from=None, page_to=None):
+        """
+        构建文件及页码范围过滤表达式。
+
+        :param file_ids: 文件ID列表。
+        :param page_from: 切片起始页码下限(含)。
+        :param page_to: 切片起始页码上限(含)。
+        :return: 条件过滤表达式，无条件时返回 None。
+        """
+        exprs = []
+        if file_ids is not None:
+            exprs.append(f"file_id in {json.dumps(list(file_ids))}")
+        if page_from is not None:
+            exprs.append(f"start_page >= {int(page_from)}")
+        if page_to is not None:
+            exprs.append(f"start_page <= {int(page_to)}")
+        return " and ".join(exprs) or None
+
+    @staticmethod
+    def merge_top_k(result_lists, top_k, metric_type="L2"):
+        """
+        使用堆合并多个集合的检索结果，返回全局 top_k。
+
+        :param result_lists: 各集合的检索结果列表。
+        :param top_k: 返回结果数量。
+        :param metric_type: 距离度量，L2 越小越相似，IP/COSINE 越大越相似。
+        :return: 全局 top_k 结果列表。
+        """
+        hits = [hit for results in result_lists for hit in results]
+        if metric_type.upper() == "L2":
+            return heapq.nsmallest(top_k, hits, key=lambda hit: hit["distance"])
+        return heapq.nlargest(top_k, hits, key=lambda hit: hit["distance"])
+
+
+_vector_store: Optional[VectorStore] = None
+_vector_store_lock = threading.Lock()
+
+
+def get_vector_store() -> VectorStore:
+    """
+    按配置 storage.vector_store.backend 获取向量存储实例(进程内单例)
+    """
+    global _vector_store
+    with _vector_store_lock:
+        if _vector_store is None:
+            backend = settings.storage.vector_store.backend
+            if backend == VECTOR_STORE_BACKEND_LOCAL:
+                from readbetween.utils.local_vector_store import LocalVectorStore
+                _vector_store = LocalVectorStore()
+            elif backend == VECTOR_STORE_BACKEND_MILVUS:
+                from readbetween.utils.milvus_util import MilvusUtil
+                _vector_store = MilvusUtil()
+            else:
+                raise ValueError(f"不支持的向量存储后端: {backend}")
+    return _vector_store
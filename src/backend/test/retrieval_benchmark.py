@@ -0,0 +1,430 @@
+"""
+检索召回率与延迟基准测试
+
+将带标注的查询集与语料加载到进程内替身(向量索引 / BM25 关键词索引)中,
+通过 RetrieverService.retrieve / hybrid_retrieve 执行检索, 输出 recall@k 与 p50/p99 延迟表,
+用于比较检索模式(milvus / es / both / hybrid)、HNSW 索引参数、向量存储格式及 top_k 的效果。
+向量存储格式(float / float16 / bfloat16 / sq8 / binary)按量化后的向量建索引, 输出向量内存估算,
+量化格式分别统计精排前后的召回率。
+
+数据格式(JSONL):
+    语料: {"id": "doc-1", "title": "标题", "text": "正文"}
+    查询: {"query": "查询内容", "relevant": ["doc-1", "doc-7"]}
+未指定数据文件时生成合成数据。
+
+示例:
+    python test/retrieval_benchmark.py --corpus corpus.jsonl --queries queries.jsonl \
+        --modes milvus,es,both,hybrid --top-k 3,5,10 --ef 16,64,128 --embedder local
+    python test/retrieval_benchmark.py --modes milvus --index HNSW --ef 64 \
+        --storage float,float16,bfloat16,sq8,binary --rescore-factor 4
+"""
+import argparse
+import asyncio
+import hashlib
+import json
+import math
+import random
+import re
+import time
+from collections import Counter, defaultdict
+from typing import Dict, List, Optional
+from unittest import mock
+
+import jieba
+import numpy as np
+
+from readbetween.config import settings
+from readbetween.models.dao import Knowledge
+from readbetween.models.v1.model_available_cfg import ModelAvailableCfgInfo
+from readbetween.services.constant import MILVUS_DEFAULT_INDEX_PARAMS, MILVUS_EMBEDDING_FIELD_NAME, \
+    MILVUS_VECTOR_SCALE_FIELD_NAME, VECTOR_STORAGE_FLOAT, VECTOR_STORAGE_SQ8, VECTOR_STORAGE_BINARY
+from readbetween.services.retriever import RetrieverService
+from readbetween.utils.embedding_cache import embedding_cache
+from readbetween.utils.milvus_util import MilvusUtil
+from readbetween.utils.model_factory import ModelFactory
+from readbetween.utils.vector_quantization import check_vector_storage, decode_vectors, encode_vector, \
+    rescore_hits, vector_bytes
+
+try:
+    import hnswlib
+except ImportError:  # 未安装 hnswlib 时 HNSW 退化为精确检索
+    hnswlib = None
+
+BENCH_COLLECTION_NAME = "c_bench"
+BENCH_INDEX_NAME = "i_bench"
+BENCH_KNOWLEDGE_ID = "bench"
+_TOKEN_PATTERN = re.compile(r"\w+", re.UNICODE)
+
+
+def load_jsonl(path: str) -> List[Dict]:
+    with open(path, "r", encoding="utf-8") as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+def synthesize_dataset(num_docs: int = 2000, num_queries: int = 200, seed: int = 42):
+    """生成合成语料: 每篇文档由主题词与随机词组成, 查询取自文档的主题词"""
+    rng = random.Random(seed)
+    vocab = [f"词{i}" for i in range(5000)]
+    num_topics = max(num_docs // 10, 1)
+    topics = [rng.sample(vocab, 8) for _ in range(num_topics)]
+    corpus, doc_topics = [], []
+    for i in range(num_docs):
+        topic = rng.randrange(num_topics)
+        words = rng.sample(topics[topic], 5) + rng.sample(vocab, 30)
+        rng.shuffle(words)
+        corpus.append({"id": f"doc-{i}", "title": f"文档{i}", "text": " ".join(words)})
+        doc_topics.append(topic)
+    topic_docs = defaultdict(list)
+    for doc, topic in zip(corpus, doc_topics):
+        topic_docs[topic].append(doc["id"])
+    queries = []
+    for _ in range(num_queries):
+        topic = rng.randrange(num_topics)
+        if not topic_docs[topic]:
+            continue
+        queries.append({"query": " ".join(rng.sample(topics[topic], 4)), "relevant": topic_docs[topic]})
+    return corpus, queries
+
+
+def tokenize(text: str) -> List[str]:
+    return [token for token in jieba.lcut_for_search(text.lower()) if _TOKEN_PATTERN.fullmatch(token)]
+
+
+class HashingEmbedder:
+    """词袋哈希向量, 无需下载模型即可得到稳定的向量"""
+
+    def __init__(self, dim: int = 1024):
+        self.dim = dim
+
+    def embed(self, inputs: List[str]) -> List[List[float]]:
+        vectors = np.zeros((len(inputs), self.dim), dtype=np.float32)
+        for row, text in enumerate(inputs):
+            for token in tokenize(text):
+                digest = hashlib.md5(token.encode("utf-8")).digest()
+                index = int.from_bytes(digest[:4], "little") % self.dim
+                vectors[row, index] += 1.0 if digest[4] & 1 else -1.0
+        vectors /= np.maximum(np.linalg.norm(vectors, axis=1, keepdims=True), 1e-12)
+        return vectors.tolist()
+
+
+class LocalModelEmbedder:
+    """内置本地嵌入模型"""
+
+    def __init__(self):
+        from readbetween.core.dependencies import get_local_embed_manager
+        self.manager = get_local_embed_manager()
+
+    def embed(self, inputs: List[str]) -> List[List[float]]:
+        return self.manager.embed(inputs=inputs)
+
+
+class InProcessMilvus:
+    """
+    进程内向量索引, 替代 MilvusUtil 的异步检索接口
+    index_type 为 HNSW 且已安装 hnswlib 时使用近似检索, 否则为精确检索(FLAT)
+    距离与 Milvus L2 一致为欧氏距离平方
+    storage 为量化存储时按量化后的向量建索引(sq8 按维度 min/max 量化, binary 为汉明距离精确检索),
+    rescore_factor > 0 时召回 top_k * rescore_factor 条候选后使用 rescore_hits 精排
+    """
+
+    def __init__(self, corpus: List[Dict], vectors: np.ndarray, index_params: Dict,
+                 storage: str = VECTOR_STORAGE_FLOAT):
+        self.corpus = corpus
+        self.storage = storage
+        self.rescore_factor = 0
+        self.raw_vectors = np.ascontiguousarray(vectors, dtype=np.float32)
+        self.stored = [encode_vector(storage, vector) for vector in self.raw_vectors]
+        self.vectors = self._quantized_vectors()
+        self.index_type = index_params.get("index_type", "FLAT")
+        self.hnsw = None
+        if storage == VECTOR_STORAGE_BINARY:
+            self.index_type = "BIN_FLAT"
+            self.codes = np.stack([np.frombuffer(item[MILVUS_EMBEDDING_FIELD_NAME], dtype=np.uint8)
+                                   for item in self.stored])
+        elif self.index_type == "HNSW" and hnswlib is not None:
+            params = index_params.get("params", {})
+            self.hnsw = hnswlib.Index(space="l2", dim=self.vectors.shape[1])
+            self.hnsw.init_index(max_elements=len(self.vectors), M=params.get("M", 8),
+                                 ef_construction=params.get("efConstruction", 64))
+            self.hnsw.add_items(self.vectors, np.arange(len(self.vectors)))
+        elif self.index_type == "HNSW":
+            self.index_type = "FLAT"
+
+    def _quantized_vectors(self) -> np.ndarray:
+        """索引实际使用的向量(量化后还原)"""
+        if self.storage == VECTOR_STORAGE_SQ8:
+            low, high = self.raw_vectors.min(axis=0), self.raw_vectors.max(axis=0)
+            step = np.maximum(high - low, 1e-12) / 255
+            return (np.round((self.raw_vectors - low) / step) * step + low).astype(np.float32)
+        if self.storage == VECTOR_STORAGE_FLOAT:
+            return self.raw_vectors
+        values = [item[MILVUS_EMBEDDING_FIELD_NAME] for item in self.stored]
+        scales = [item.get(MILVUS_VECTOR_SCALE_FIELD_NAME) for item in self.stored]
+        if self.storage != VECTOR_STORAGE_BINARY:
+            values = [value.tobytes() for value in values]
+        return np.ascontiguousarray(decode_vectors(self.storage, values, scales))
+
+    def memory_mb(self, index_params: Dict) -> float:
+        """向量内存估算, HNSW 另计每层 2*M 条邻接"""
+        total = len(self.raw_vectors) * vector_bytes(self.storage, self.raw_vectors.shape[1])
+        if self.hnsw is not None:
+            total += len(self.raw_vectors) * index_params["params"]["M"] * 2 * 4
+        return total / 2 ** 20
+
+    async def async_similarity_search(self, query_vector, collection_names, search_params=None, top_k=5,
+                                      expr=None, output_fields=None, knowledge_ids=None):
+        query = np.asarray(query_vector, dtype=np.float32)
+        limit = top_k * self.rescore_factor if self.rescore_factor else top_k
+        if self.storage == VECTOR_STORAGE_BINARY:
+            query_code = np.frombuffer(encode_vector(self.storage, query)[MILVUS_EMBEDDING_FIELD_NAME],
+                                       dtype=np.uint8)
+            distances = np.unpackbits(self.codes ^ query_code, axis=1).sum(axis=1)
+            top = np.argsort(distances, kind="stable")[:limit]
+            pairs = zip(top.tolist(), distances[top].tolist())
+        elif self.hnsw is not None:
+            ef = (search_params or {}).get("params", {}).get("ef", limit)
+            self.hnsw.set_ef(max(ef, limit))
+            labels, distances = self.hnsw.knn_query(query, k=min(limit, len(self.vectors)))
+            pairs = zip(labels[0].tolist(), distances[0].tolist())
+        else:
+            distances = ((self.vectors - query) ** 2).sum(axis=1)
+            top = np.argsort(distances)[:limit]
+            pairs = zip(top.tolist(), distances[top].tolist())
+        results = []
+        for row, distance in pairs:
+            doc = self.corpus[row]
+            entity = {"text": doc["text"], "title": doc.get("title", ""), "source": doc["id"],
+                      "file_id": doc["id"], "chunk_index": 0}
+            results.append({"id": row, "distance": float(distance), "collection_name": collection_names[0],
+                            "entity": {field: entity.get(field) for field in (output_fields or entity)}})
+        if self.rescore_factor:
+            for result in results:
+                # sq8 精排使用原始向量 其余格式使用存储的量化向量
+                stored = {MILVUS_EMBEDDING_FIELD_NAME: self.raw_vectors[result["id"]]} \
+                    if self.storage == VECTOR_STORAGE_SQ8 else self.stored[result["id"]]
+                result["entity"].update(stored)
+            results = rescore_hits(results, query, self.storage if self.storage != VECTOR_STORAGE_SQ8
+                                   else VECTOR_STORAGE_FLOAT,
+                                   (search_params or {}).get("metric_type", "L2"), top_k)
+        return results
+
+    merge_top_k = staticmethod(MilvusUtil.merge_top_k)
+
+    def supports_hybrid_search(self, collection_name):
+        # 无 BM25 稀疏向量字段 hybrid 模式走 向量 + 关键词检索
+        return False
+
+
+class InProcessES:
+    """进程内 BM25 关键词索引, 替代 ElasticSearchUtil 的异步检索接口"""
+
+    def __init__(self, corpus: List[Dict], k1: float = 1.2, b: float = 0.75):
+        self.corpus = corpus
+        self.k1, self.b = k1, b
+        self.postings: Dict[str, List[tuple]] = defaultdict(list)
+        self.doc_lengths = np.zeros(len(corpus), dtype=np.float32)
+        for row, doc in enumerate(corpus):
+            tokens = tokenize(f"{doc.get('title', '')} {doc['text']}")
+            self.doc_lengths[row] = len(tokens)
+            for token, tf in Counter(tokens).items():
+                self.postings[token].append((row, tf))
+        self.avg_length = float(self.doc_lengths.mean()) if len(corpus) else 0.0
+
+    async def async_search_documents(self, index_names, query, size=10, fields=None, knowledge_ids=None):
+        scores = np.zeros(len(self.corpus), dtype=np.float32)
+        for token in set(tokenize(query)):
+            postings = self.postings.get(token)
+            if not postings:
+                continue
+            idf = math.log(1 + (len(self.corpus) - len(postings) + 0.5) / (len(postings) + 0.5))
+            rows = np.array([row for row, _ in postings])
+            tfs = np.array([tf for _, tf in postings], dtype=np.float32)
+            norm = self.k1 * (1 - self.b + self.b * self.doc_lengths[rows] / self.avg_length)
+            scores[rows] += idf * tfs * (self.k1 + 1) / (tfs + norm)
+        top = [row for row in np.argsort(-scores)[:size].tolist() if scores[row] > 0]
+        return [{
+            "id": self.corpus[row]["id"],
+            "score": float(scores[row]),
+            "index_name": index_names[0],
+            "document": {"text": self.corpus[row]["text"],
+                         "metadata": {"title": self.corpus[row].get("title", ""), "source": self.corpus[row]["id"],
+                                      "file_id": self.corpus[row]["id"], "chunk_index": 0}},
+        } for row in top]
+
+
+class _EmbeddingClient:
+    def __init__(self, embedder):
+        self.embedder = embedder
+
+    def get_embeddings(self, inputs=None, **kwargs):
+        return self.embedder.embed(inputs)
+
+
+def percentile(values: List[float], q: float) -> float:
+    return float(np.percentile(values, q)) if values else 0.0
+
+
+async def run_case(mode: str, queries: List[Dict], top_k: int, search_params: Dict, model_cfg,
+                   knowledge: Knowledge, warmup: int) -> Dict:
+    kwargs = dict(
+        query="",
+        milvus_knowledge_info={model_cfg: [knowledge]},
+        milvus_fields=["text", "title", "source", "file_id", "chunk_index"],
+        milvus_search_params=search_params,
+        es_index_names=[BENCH_INDEX_NAME],
+        es_fields=["text", "metadata.title", "metadata.source", "metadata.file_id", "metadata.chunk_index"],
+    )
+    latencies, recalls = [], []
+    for i, item in enumerate(queries[:warmup] + queries):
+        kwargs["query"] = item["query"]
+        start = time.perf_counter()
+        if mode == "hybrid":
+            results = await RetrieverService.hybrid_retrieve(top_n=top_k, **kwargs)
+        else:
+            results = await RetrieverService.retrieve(mode=mode, top_k=top_k, deduplicate=True, **kwargs)
+        elapsed = (time.perf_counter() - start) * 1000
+        if i < warmup:
+            continue
+        relevant = set(item["relevant"])
+        retrieved = {result.metadata.get("file_id") for result in results}
+        latencies.append(elapsed)
+        recalls.append(len(relevant & retrieved) / min(len(relevant), top_k) if relevant else 0.0)
+    return {
+        "recall": float(np.mean(recalls)) if recalls else 0.0,
+        "p50": percentile(latencies, 50),
+        "p99": percentile(latencies, 99),
+        "qps": 1000 * len(latencies) / sum(latencies) if latencies else 0.0,
+    }
+
+
+def print_table(rows: List[Dict]):
+    headers = ["mode", "index", "storage", "rescore", "memory(MB)", "M", "efConstruction", "ef", "top_k",
+               "recall@k", "p50(ms)", "p99(ms)", "qps"]
+    table = [[str(row[header]) for header in headers] for row in rows]
+    widths = [max(len(header), *(len(line[i]) for line in table)) for i, header in enumerate(headers)]
+    print(" | ".join(header.ljust(width) for header, width in zip(headers, widths)))
+    print("-+-".join("-" * width for width in widths))
+    for line in table:
+        print(" | ".join(value.ljust(width) for value, width in zip(line, widths)))
+
+
+async def main(args):
+    if args.corpus and args.queries:
+        corpus, queries = load_jsonl(args.corpus), load_jsonl(args.queries)
+    else:
+        corpus, queries = synthesize_dataset(args.num_docs, args.num_queries)
+    if args.limit:
+        queries = queries[:args.limit]
+    print(f"语料 {len(corpus)} 条, 查询 {len(queries)} 条")
+
+    embedder = LocalModelEmbedder() if args.embedder == "local" else HashingEmbedder(args.dim)
+    start = time.perf_counter()
+    vectors = []
+    for offset in range(0, len(corpus), args.batch_size):
+        batch = corpus[offset:offset + args.batch_size]
+        vectors.extend(embedder.embed([f"{doc.get('title', '')}\n{doc['text']}" for doc in batch]))
+    print(f"语料向量化耗时 {time.perf_counter() - start:.1f}s")
+
+    model_cfg = ModelAvailableCfgInfo(type="embedding", name=f"bench-{args.embedder}", api_key="",
+                                      base_url="", mark="bench")
+    knowledge = Knowledge(id=BENCH_KNOWLEDGE_ID, name="bench", collection_name=BENCH_COLLECTION_NAME,
+                          index_name=BENCH_INDEX_NAME)
+    es_client = InProcessES(corpus)
+    modes = args.modes.split(",")
+    top_ks = [int(k) for k in args.top_k.split(",")]
+    efs = [int(ef) for ef in args.ef.split(",")]
+    storages = []
+    for storage in args.storage.split(","):
+        try:
+            check_vector_storage(storage)
+            storages.append(storage)
+        except ValueError as e:
+            print(f"跳过存储格式 {storage}: {e}")
+
+    # 默认不缓存查询向量 延迟包含查询向量化耗时
+    embedding_cache.max_size = args.embedding_cache_size
+    embedding_cache.use_redis = False
+    rows = []
+    with mock.patch.object(ModelFactory, "create_client", return_value=_EmbeddingClient(embedder)):
+        for index_type in args.index.split(","):
+            index_params = dict(MILVUS_DEFAULT_INDEX_PARAMS, index_type=index_type)
+            index_params["params"] = dict(MILVUS_DEFAULT_INDEX_PARAMS["params"], M=args.m,
+                                          efConstruction=args.ef_construction)
+            for storage in storages:
+                start = time.perf_counter()
+                milvus_client = InProcessMilvus(corpus, np.asarray(vectors), index_params, storage)
+                memory_mb = milvus_client.memory_mb(index_params)
+                print(f"{milvus_client.index_type}/{storage} 建索引耗时 {time.perf_counter() - start:.1f}s, "
+                      f"向量内存 {memory_mb:.1f}MB")
+                RetrieverService._milvus_client, RetrieverService._es_client = milvus_client, es_client
+
+                for mode in modes:
+                    vector_mode = mode != "es"
+                    for ef in (efs if vector_mode and milvus_client.hnsw else [None]):
+                        search_params = {"metric_type": index_params["metric_type"],
+                                         "params": {"ef": ef} if ef else {}}
+                        rescore_factors = [0, args.rescore_factor] \
+                            if vector_mode and storage != VECTOR_STORAGE_FLOAT and args.rescore_factor else [0]
+                        for rescore_factor in rescore_factors:
+                            milvus_client.rescore_factor = rescore_factor
+                            for top_k in top_ks:
+                                embedding_cache.clear()
+                                metrics = await run_case(mode, queries, top_k, search_params, model_cfg, knowledge,
+                                                         args.warmup)
+                                rows.append({
+                                    "mode": mode,
+                                    "index": milvus_client.index_type if vector_mode else "-",
+                                    "storage": storage if vector_mode else "-",
+                                    "rescore": f"x{rescore_factor}" if rescore_factor else "-",
+                                    "memory(MB)": f"{memory_mb:.1f}" if vector_mode else "-",
+                                    "M": index_params["params"]["M"] if milvus_client.hnsw and vector_mode else "-",
+                                    "efConstruction": index_params["params"]["efConstruction"]
+                                    if milvus_client.hnsw and vector_mode else "-",
+                                    "ef": ef if ef else "-",
+                                    "top_k": top_k,
+                                    "recall@k": f"{metrics['recall']:.4f}",
+                                    "p50(ms)": f"{metrics['p50']:.2f}",
+                                    "p99(ms)": f"{metrics['p99']:.2f}",
+                                    "qps": f"{metrics['qps']:.1f}",
+                                })
+                if "es" in modes:
+                    # ES 结果与向量索引及存储格式无关 只统计一次
+                    modes = [mode for mode in modes if mode != "es"]
+    print_table(rows)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(rows, f, ensure_ascii=False, indent=2)
+        print(f"结果已写入 {args.output}")
+
+
+def parse_args(argv: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(description="检索召回率与延迟基准测试")
+    parser.add_argument("--corpus", help="语料 JSONL 文件")
+    parser.add_argument("--queries", help="标注查询 JSONL 文件")
+    parser.add_argument("--num-docs", type=int, default=2000, help="合成语料数量")
+    parser.add_argument("--num-queries", type=int, default=200, help="合成查询数量")
+    parser.add_argument("--limit", type=int, default=0, help="仅使用前 N 条查询")
+    parser.add_argument("--modes", default="milvus,es,both,hybrid", help="检索模式, 逗号分隔")
+    parser.add_argument("--index", default="HNSW,FLAT", help="向量索引类型, 逗号分隔")
+    parser.add_argument("--m", type=int, default=MILVUS_DEFAULT_INDEX_PARAMS["params"]["M"], help="HNSW M")
+    parser.add_argument("--ef-construction", type=int,
+                        default=MILVUS_DEFAULT_INDEX_PARAMS["params"]["efConstruction"], help="HNSW efConstruction")
+    parser.add_argument("--ef", default="16,64,128", help="HNSW 搜索 ef, 逗号分隔")
+    parser.add_argument("--top-k", default="3,5,10", help="top_k, 逗号分隔")
+    parser.add_argument("--storage", default=VECTOR_STORAGE_FLOAT,
+                        help="向量存储格式 float/float16/bfloat16/sq8/binary, 逗号分隔")
+    parser.add_argument("--rescore-factor", type=int, default=settings.storage.milvus.rescore_factor,
+                        help="量化存储精排候选倍数, 0 表示仅统计精排前召回率")
+    parser.add_argument("--embedder", choices=["hash", "local"], default="hash",
+                        help="hash: 哈希词袋向量; local: 内置本地嵌入模型")
+    parser.add_argument("--dim", type=int, default=1024, help="哈希向量维度")
+    parser.add_argument("--batch-size", type=int, default=32, help="语料向量化批大小")
+    parser.add_argument("--warmup", type=int, default=5, help="预热查询数")
+    parser.add_argument("--embedding-cache-size", type=int, default=0,
+                        help=f"查询向量缓存大小, 线上默认 {settings.retrieval.embedding_cache_size}")
+    parser.add_argument("--output", help="结果输出 JSON 文件")
+    return parser.parse_args(argv)
+
+
+if __name__ == '__main__':
+    asyncio.run(main(parse_args()))
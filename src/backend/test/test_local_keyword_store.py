@@ -0,0 +1,134 @@
+from readbetween.models.v1.retrieval import RetrievalFilter
+from readbetween.utils import local_keyword_store
+from readbetween.utils.local_keyword_store import LocalKeywordStore
+
+INDEX_NAME = "test_local"
+
+
+class Document:
+    """与 SaveDocument 一致 提供 index_name 与 to_dict"""
+
+    def __init__(self, text, file_id="f1", knowledge_id="k1", start_page=1, index_name=INDEX_NAME):
+        self.index_name = index_name
+        self.text = text
+        self.metadata = {"title": f"{file_id}.txt", "file_id": file_id, "knowledge_id": knowledge_id,
+                         "start_page": start_page}
+
+    def to_dict(self):
+        return {"text": self.text, "metadata": dict(self.metadata)}
+
+
+def save(store, *documents, routing=None):
+    for document in documents:
+        store.save_document(document, routing=routing)
+
+
+def texts(results):
+    return [result["document"]["text"] for result in results]
+
+
+def test_save_and_search(tmp_path):
+    store = LocalKeywordStore(path=str(tmp_path))
+    save(store, Document("apple banana"), Document("banana cherry"), Document("durian"))
+
+    results = store.search_documents([INDEX_NAME], "apple banana", size=10)
+    assert texts(results) == ["apple banana", "banana cherry"]
+    assert results[0]["score"] > results[1]["score"]
+    assert results[0]["index_name"] == INDEX_NAME
+
+    results = store.search_documents([INDEX_NAME], {"query": {"match": {"text": "cherry"}}},
+                                     fields=["text", "metadata.file_id"])
+    assert results[0]["document"] == {"text": "banana cherry", "metadata": {"file_id": "f1"}}
+    assert store.search_documents([INDEX_NAME], "mango") == []
+
+
+def test_filter(tmp_path):
+    store = LocalKeywordStore(path=str(tmp_path))
+    save(store, Document("apple one", file_id="f1", start_page=1), Document("apple two", file_id="f2", start_page=5))
+    save(store, Document("apple three", file_id="f3", knowledge_id="k2"))
+
+    results = store.search_documents([INDEX_NAME], "apple", knowledge_ids=["k2"])
+    assert texts(results) == ["apple three"]
+
+    results = store.search_documents([INDEX_NAME], "apple", retrieval_filter=RetrievalFilter(file_ids=["f2"]))
+    assert texts(results) == ["apple two"]
+
+    results = store.search_documents([INDEX_NAME], "apple", knowledge_ids=["k1"],
+                                     retrieval_filter=RetrievalFilter(page_to=3))
+    assert texts(results) == ["apple one"]
+
+    # 重复的索引及知识库只检索一次
+    results = store.search_documents([INDEX_NAME, INDEX_NAME], "apple", knowledge_ids=["k1", "k1", "k2"])
+    assert sorted(texts(results)) == ["apple one", "apple three", "apple two"]
+
+
+def test_delete(tmp_path):
+    store = LocalKeywordStore(path=str(tmp_path))
+    save(store, Document("apple one", file_id="f1"), Document("apple two", file_id="f2"))
+    save(store, Document("apple three", file_id="f3", knowledge_id="k2"))
+
+    assert store.delete_file_documents(INDEX_NAME, "f1") == {"deleted_count": 1}
+    assert sorted(texts(store.search_documents([INDEX_NAME], "apple"))) == ["apple three", "apple two"]
+
+    assert store.delete_knowledge_documents(INDEX_NAME, "k2") == {"deleted_count": 1}
+    assert texts(store.search_documents([INDEX_NAME], "apple")) == ["apple two"]
+
+    store.delete_index(INDEX_NAME)
+    assert store.search_documents([INDEX_NAME], "apple") == []
+
+
+def test_merge(tmp_path, monkeypatch):
+    monkeypatch.setattr(local_keyword_store, "MERGE_THRESHOLD", 2)
+    store = LocalKeywordStore(path=str(tmp_path))
+    save(store, Document("apple one", file_id="f1"), Document("apple two", file_id="f2"))
+
+    segment = store._get_segment(INDEX_NAME, "k1")
+    assert segment.generation == 1
+    assert segment.base_count == 2 and not segment.pending
+
+    # 只读段与增量文档一并检索 删除只读段中的文档
+    save(store, Document("apple cherry", file_id="f3"))
+    assert store.delete_file_documents(INDEX_NAME, "f1") == {"deleted_count": 1}
+    assert sorted(texts(store.search_documents([INDEX_NAME], "apple"))) == ["apple cherry", "apple two"]
+
+    # 再次合并时剔除已删除文档
+    save(store, Document("banana", file_id="f4"))
+    assert segment.generation == 2
+    assert segment.base_count == 3
+    assert sorted(texts(store.search_documents([INDEX_NAME], "apple"))) == ["apple cherry", "apple two"]
+    assert not any(path.name.startswith("base.1.") for path in (tmp_path / INDEX_NAME / "k1").iterdir())
+
+
+def test_reload_from_second_instance(tmp_path, monkeypatch):
+    monkeypatch.setattr(local_keyword_store, "MERGE_THRESHOLD", 3)
+    writer = LocalKeywordStore(path=str(tmp_path))
+    reader = LocalKeywordStore(path=str(tmp_path))
+    save(writer, Document("apple one"))
+
+    # 另一实例增量读取新写入的日志
+    assert texts(reader.search_documents([INDEX_NAME], "apple")) == ["apple one"]
+    save(writer, Document("apple two"), Document("apple three", file_id="f2"))
+    assert len(reader.search_documents([INDEX_NAME], "apple")) == 3
+
+    # 合并后另一实例切换到新一代段文件
+    assert reader._get_segment(INDEX_NAME, "k1").generation == 1
+    writer.delete_file_documents(INDEX_NAME, "f2")
+    assert sorted(texts(reader.search_documents([INDEX_NAME], "apple"))) == ["apple one", "apple two"]
+
+    # 重启后加载只读段并回放增量日志
+    restarted = LocalKeywordStore(path=str(tmp_path))
+    assert sorted(texts(restarted.search_documents([INDEX_NAME], "apple"))) == ["apple one", "apple two"]
+
+    writer.delete_index(INDEX_NAME)
+    assert reader.search_documents([INDEX_NAME], "apple") == []
+
+
+def test_reindex(tmp_path):
+    store = LocalKeywordStore(path=str(tmp_path))
+    save(store, Document("apple one"), Document("apple two", knowledge_id="k2"))
+
+    assert store.reindex(INDEX_NAME, "shared") == {"created": 2}
+    assert len(store.search_documents(["shared"], "apple", knowledge_ids=["k1", "k2"])) == 2
+    # create 模式跳过目标索引中已存在的文档
+    assert store.reindex(INDEX_NAME, "shared", op_type="create") == {"created": 0}
+    assert len(store.search_documents(["shared"], "apple")) == 2
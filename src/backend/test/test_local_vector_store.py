@@ -0,0 +1,160 @@
+import numpy as np
+import pytest
+from pymilvus import DataType, FieldSchema
+
+from readbetween.services.constant import MILVUS_EMBEDDING_FIELD_NAME
+from readbetween.utils import local_vector_store
+from readbetween.utils.local_vector_store import LocalVectorStore
+
+DIM = 8
+COLLECTION_NAME = "test_local"
+FIELDS = [
+    FieldSchema(name="chunk_index", dtype=DataType.INT64),
+    FieldSchema(name="file_id", dtype=DataType.VARCHAR, max_length=255),
+    FieldSchema(name="knowledge_id", dtype=DataType.VARCHAR, max_length=255),
+    FieldSchema(name="pk", dtype=DataType.INT64, is_primary=True, auto_id=True),
+    FieldSchema(name=MILVUS_EMBEDDING_FIELD_NAME, dtype=DataType.FLOAT_VECTOR, dim=DIM),
+]
+INDEX_PARAMS = {"index_type": "HNSW", "metric_type": "L2", "params": {"M": 8, "efConstruction": 64}}
+SEARCH_PARAMS = {"metric_type": "L2", "params": {"ef": 64}}
+
+
+def make_rows(count, file_id="f1", knowledge_id="k1", start=0):
+    # 第 i 行向量为第 i 维的单位向量 便于断言最近邻
+    return [{
+        "chunk_index": start + i,
+        "file_id": file_id,
+        "knowledge_id": knowledge_id,
+        MILVUS_EMBEDDING_FIELD_NAME: np.eye(DIM, dtype=np.float32)[(start + i) % DIM].tolist(),
+    } for i in range(count)]
+
+
+def new_store(path, hnsw_threshold=10 ** 9):
+    store = LocalVectorStore(path=str(path), hnsw_threshold=hnsw_threshold)
+    if not store.check_collection_exists(COLLECTION_NAME):
+        store.create_collection(COLLECTION_NAME, FIELDS)
+        store.create_index_on_field(COLLECTION_NAME, MILVUS_EMBEDDING_FIELD_NAME, INDEX_PARAMS)
+    return store
+
+
+def search(store, vector_index, top_k=3, expr=None):
+    query_vector = np.eye(DIM, dtype=np.float32)[vector_index].tolist()
+    return store.similarity_search(query_vector, [COLLECTION_NAME], SEARCH_PARAMS, top_k, expr,
+                                   output_fields=["chunk_index", "file_id"])
+
+
+def test_insert_and_search(tmp_path):
+    store = new_store(tmp_path)
+    ids = store.insert_data(COLLECTION_NAME, make_rows(DIM))
+
+    assert ids == list(range(1, DIM + 1))
+    hits = search(store, 3)
+    assert hits[0]["entity"]["chunk_index"] == 3
+    assert hits[0]["distance"] == pytest.approx(0.0)
+    assert [hit["distance"] for hit in hits] == sorted(hit["distance"] for hit in hits)
+
+
+def test_insert_rejects_wrong_dim(tmp_path):
+    store = new_store(tmp_path)
+    row = dict(make_rows(1)[0], **{MILVUS_EMBEDDING_FIELD_NAME: [0.0] * (DIM + 1)})
+
+    with pytest.raises(ValueError):
+        store.insert_data(COLLECTION_NAME, [row])
+
+
+def test_filter(tmp_path):
+    store = new_store(tmp_path)
+    store.insert_data(COLLECTION_NAME, make_rows(4, file_id="f1"))
+    store.insert_data(COLLECTION_NAME, make_rows(4, file_id="f2", knowledge_id="k2", start=4))
+
+    hits = search(store, 1, top_k=8, expr="file_id == 'f2'")
+    assert {hit["entity"]["file_id"] for hit in hits} == {"f2"}
+    assert len(hits) == 4
+
+    rows = store.query(COLLECTION_NAME, "knowledge_id in ['k1'] and chunk_index >= 2", output_fields=["chunk_index"])
+    assert sorted(row["chunk_index"] for row in rows) == [2, 3]
+
+    hits = store.similarity_search(np.eye(DIM)[0].tolist(), [COLLECTION_NAME], SEARCH_PARAMS, 8,
+                                   knowledge_ids={COLLECTION_NAME: ["k2"]}, output_fields=["knowledge_id"])
+    assert {hit["entity"]["knowledge_id"] for hit in hits} == {"k2"}
+
+
+def test_delete(tmp_path):
+    store = new_store(tmp_path)
+    store.insert_data(COLLECTION_NAME, make_rows(4, file_id="f1"))
+    store.insert_data(COLLECTION_NAME, make_rows(4, file_id="f2", start=4))
+
+    store.delete_collection_file(COLLECTION_NAME, "file_id == 'f1'")
+
+    assert store.query(COLLECTION_NAME, "file_id == 'f1'") == []
+    hits = search(store, 0, top_k=8)
+    assert len(hits) == 4
+    assert {hit["entity"]["file_id"] for hit in hits} == {"f2"}
+
+
+def test_compact(tmp_path, monkeypatch):
+    monkeypatch.setattr(local_vector_store, "COMPACT_MIN_ROWS", 1)
+    store = new_store(tmp_path)
+    store.insert_data(COLLECTION_NAME, make_rows(6, file_id="f1"))
+    store.insert_data(COLLECTION_NAME, make_rows(2, file_id="f2", start=6))
+
+    store.delete_collection_file(COLLECTION_NAME, "file_id == 'f1'")
+
+    collection = store._get_collection(COLLECTION_NAME)
+    assert collection.schema["generation"] == 1
+    assert len(collection.rows) == 2
+    assert not (tmp_path / COLLECTION_NAME / "vectors.0.f32").exists()
+    hits = search(store, 7, top_k=8)
+    assert [hit["entity"]["chunk_index"] for hit in hits] == [7, 6]
+
+    # 压缩后继续写入 主键不重复
+    ids = store.insert_data(COLLECTION_NAME, make_rows(1, file_id="f3"))
+    assert ids == [DIM + 1]
+
+
+def test_reload_from_second_instance(tmp_path, monkeypatch):
+    monkeypatch.setattr(local_vector_store, "COMPACT_MIN_ROWS", 1)
+    writer = new_store(tmp_path)
+    reader = new_store(tmp_path)
+    writer.insert_data(COLLECTION_NAME, make_rows(4, file_id="f1"))
+
+    # 另一实例增量读取新写入的日志
+    assert search(reader, 2)[0]["entity"]["chunk_index"] == 2
+    writer.insert_data(COLLECTION_NAME, make_rows(4, file_id="f2", start=4))
+    assert search(reader, 6)[0]["entity"]["chunk_index"] == 6
+
+    # 压缩后另一实例切换到新一代数据文件
+    writer.delete_collection_file(COLLECTION_NAME, "file_id == 'f1'")
+    assert {row["file_id"] for row in reader.query(COLLECTION_NAME, "", output_fields=["file_id"])} == {"f2"}
+
+    # 重启后回放日志恢复
+    restarted = LocalVectorStore(path=str(tmp_path))
+    rows = restarted.query(COLLECTION_NAME, "file_id == 'f2'", output_fields=["chunk_index"])
+    assert sorted(row["chunk_index"] for row in rows) == [4, 5, 6, 7]
+
+    writer.delete_collection(COLLECTION_NAME)
+    assert search(reader, 0) == []
+
+
+@pytest.mark.skipif(local_vector_store.hnswlib is None, reason="未安装 hnswlib")
+def test_delete_after_hnsw_build(tmp_path):
+    store = new_store(tmp_path, hnsw_threshold=1)
+    store.insert_data(COLLECTION_NAME, make_rows(DIM, file_id="f1"))
+    assert search(store, 0)[0]["entity"]["chunk_index"] == 0
+    collection = store._get_collection(COLLECTION_NAME)
+    assert collection._hnsw is not None
+
+    # 已加入 HNSW 的行删除后不再返回
+    store.delete_collection_file(COLLECTION_NAME, "chunk_index == 0")
+    assert 0 not in [hit["entity"]["chunk_index"] for hit in search(store, 0, top_k=DIM)]
+
+    # 建立索引后写入且尚未加入 HNSW 的行被删除 下次检索增量加入时不重复标记删除
+    store.insert_data(COLLECTION_NAME, make_rows(DIM, file_id="f2", start=DIM))
+    store.delete_collection_file(COLLECTION_NAME, "file_id == 'f2'")
+    # 直接调用 HNSW 检索 标记删除失败时抛出异常而非退化为精确检索
+    with collection.lock:
+        hits = collection._hnsw_search(np.eye(DIM, dtype=np.float32)[1], DIM - 1, collection.alive.copy(), "L2", 64)
+    assert sorted(slot for slot, _ in hits) == list(range(1, DIM))
+    assert collection._hnsw_size == 2 * DIM
+    assert collection._hnsw_pending_deletes == []
+    assert search(store, 1)[0]["entity"]["chunk_index"] == 1